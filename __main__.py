@@ -7,6 +7,8 @@ import sys
 import asyncio
 import signal
 
+import database as db
+
 intents = discord.Intents.all()
 bot = commands.Bot(command_prefix='!', intents=intents)
 
@@ -95,6 +97,14 @@ async def main():
             await bot.close()
         except Exception:
             pass
+        # Drain queued DB work (async facade, then write-behind buffer) before exit
+        try:
+            await asyncio.to_thread(db.aio.shutdown)
+            flushed = db.shutdown_write_behind()
+            db.close_pool()
+            print(f"[db] 종료 전 대기 중이던 쓰기 {flushed}건을 기록했습니다.")
+        except Exception as e:
+            print(f"[db] 종료 처리 중 오류: {e}")
 
 if __name__ == '__main__':
     asyncio.run(main())
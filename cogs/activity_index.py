@@ -100,19 +100,18 @@ class ActivityIndex(commands.Cog):
         if not self._is_trading(now_kst):
             return
 
-        # ensure today's indices exist per guild
         date_kst = now_kst.strftime("%Y-%m-%d")
         ts = int(time.time())
-        for guild in list(self.bot.guilds):
-            db.ensure_indices_for_day(guild.id, date_kst)
 
-        # compute per guild/category
+        # per-guild minute counters -> day open, scoring and saving for all guilds in one transaction
+        rows: list[tuple[int, int, int, int, float]] = []
         for guild in list(self.bot.guilds):
             g = self._g(guild.id)
             chat = int(g.get('chat_count', 0))
             react = int(g.get('react_count', 0))
             voice_count = int(len(g.get('voice_set', set())))
             avg_gap = (g['gap_sum'] / g['gap_n']) if g.get('gap_n') else 999.0
+            rows.append((guild.id, chat, react, voice_count, avg_gap))
 
             # Reset per-minute counters (voice_set persists)
             g['chat_count'] = 0
@@ -120,143 +119,90 @@ class ActivityIndex(commands.Cog):
             g['gap_sum'] = 0.0
             g['gap_n'] = 0
 
-            # scoring & update for each category
-            metrics = {
-                'chat': (chat, react, voice_count, avg_gap),
-                'react': (chat, react, voice_count, avg_gap),
-                'voice': (chat, react, voice_count, avg_gap),
-            }
-            for cat, _m in metrics.items():
-                chat_c, react_c, voice_c, gap = _m
-                # weights
-                if cat == 'chat':
-                    a, b, c = 1.0, 0.3, 0.3
-                elif cat == 'react':
-                    a, b, c = 0.3, 1.0, 0.3
-                else:  # voice
-                    a, b, c = 0.3, 0.3, 1.0
-
-                # gap bonus: faster chats -> extra score
-                gap_bonus = 0.0
-                if gap < 60.0:
-                    gap_bonus = (60.0 - gap) / 60.0  # 0..1
-
-                # Normalize activity to targets so that
-                # - ~1000 msgs/hour (~17/min) → full scale
-                # - 8 people in voice → full scale
-                CHAT_MAX, REACT_MAX, VOICE_MAX = 17.0, 30.0, 8.0
-                x_chat = min(chat_c / CHAT_MAX, 1.0)
-                x_react = min(react_c / REACT_MAX, 1.0)
-                x_voice = min(voice_c / VOICE_MAX, 1.0)
-
-                # Category scaling so full activity tends to reach the ±1%/min clamp
-                if cat == 'voice':
-                    W = 0.11  # voice has no gap bonus typically → slightly higher
-                else:
-                    W = 0.073
-
-                base_score = 1.0 + W * (a * x_chat + b * x_react + c * x_voice + 0.5 * gap_bonus)
-
-                # relative boost vs one hour ago (5-min window sums)
-                REL_WIN = 300
-                REL_GAP = 3600
-                REL_BETA = 0.8  # 높인 상승 가중 민감도(기존 0.5)
-                cur_s = db.get_activity_totals(guild.id, cat, ts - REL_WIN, ts)
-                prev_s = db.get_activity_totals(guild.id, cat, ts - REL_GAP - REL_WIN, ts - REL_GAP)
-                cur_w = a * cur_s[0] + b * cur_s[1] + c * cur_s[2]
-                prev_w = a * prev_s[0] + b * prev_s[1] + c * prev_s[2]
-                ratio = (cur_w + 1.0) / (prev_w + 1.0)
-                rel_factor = 1.0 + REL_BETA * (ratio - 1.0)
-                # 상향 여지 확대(최대 +30%), 하향은 동일(최소 -20%)
-                rel_factor = max(0.8, min(1.3, rel_factor))
-
-                # baseline 1.0 -> neutral; scale factor S tunes volatility
-                S = 10.0
-                DECAY = 0.001  # 0.1% downward drift per minute
-                change_raw = (base_score - 1.0) / S
-                change_raw *= rel_factor
-                change_raw -= DECAY
-                change_pct = max(-0.01, min(0.01, change_raw))
-
-                # fetch snapshot
-                try:
-                    current, lower, upper, prev_high, prev_low, open_idx = db.get_index_info(guild.id, date_kst, cat)
-                except Exception:
-                    # ensure and retry once
-                    db.ensure_indices_for_day(guild.id, date_kst)
-                    current, lower, upper, prev_high, prev_low, open_idx = db.get_index_info(guild.id, date_kst, cat)
-
-                new_val = current * (1.0 + change_pct)
-                if new_val < lower:
-                    new_val = lower
-                if new_val > upper:
-                    new_val = upper
-
-                db.update_activity_tick(
-                    guild_id=guild.id,
-                    ts=ts,
-                    category=cat,
-                    idx_value=new_val,
-                    delta=new_val - current,
-                    chat_count=chat_c,
-                    react_count=react_c,
-                    voice_count=voice_c,
-                    date_kst=date_kst,
-                )
-
-                # alerts: spike and new high
-                pct = (new_val - current) / current if current > 0 else 0.0
-                to_send: list[tuple[str, str, int]] = []  # (type, desc, color)
-                if pct >= self.SPIKE_UP:
-                    to_send.append(("spike_up", f"{cat.upper()} 지수가 분 단위로 +{pct*100:.2f}% 상승", 0x2ecc71))
-                elif pct <= self.SPIKE_DOWN:
-                    to_send.append(("spike_down", f"{cat.upper()} 지수가 분 단위로 {pct*100:.2f}% 하락", 0xe74c3c))
-
-                if prev_high is None or new_val > prev_high * (1.0 + self.NEW_HIGH_STEP):
-                    to_send.append(("new_high", f"{cat.upper()} 지수 신고점 경신: {new_val:.2f}", 0xf1c40f))
-
-                if to_send:
-                    # server-level switch: send only if enabled
-                    if not db.get_index_alerts_enabled(guild.id):
-                        continue
-                    # suppress alerts during warm-up window after bot start
-                    if time.time() < getattr(self, '_alerts_enabled_at', 0.0):
-                        continue
-                    ch_id = db.get_notify_channel(guild.id)
-                    if ch_id:
-                        ch = self.bot.get_channel(ch_id)
-                        if isinstance(ch, (discord.TextChannel, discord.Thread)):
-                            for ev_type, desc, color in to_send:
-                                key = (guild.id, cat, ev_type)
-                                last = self._last_alert.get(key, 0.0)
-                                now = time.time()
-                                if ev_type == "new_high":
-                                    # lighter cooldown for new_high
-                                    cooldown = self.ALERT_COOLDOWN / 2
-                                else:
-                                    cooldown = self.ALERT_COOLDOWN
-                                if now - last < cooldown:
-                                    continue
-                                self._last_alert[key] = now
-                                try:
-                                    embed = discord.Embed(title="📣 활동 지수 알림", description=desc, color=color)
-                                    embed.add_field(name="지수", value=f"{new_val:.2f}")
-                                    embed.add_field(name="개장가", value=f"{open_idx:.2f}")
-                                    embed.add_field(name="변동", value=f"{(new_val-open_idx)/open_idx*100:.2f}%")
-                                    embed.set_footer(text=f"카테고리: {cat} • {date_kst}")
-                                    await ch.send(embed=embed)
-                                except Exception:
-                                    pass
+        results = await db.aio.apply_minute_batch(ts, rows, date_kst)
+        guilds = {guild.id: guild for guild in self.bot.guilds}
+        for guild_id, cat, current, new_val, prev_high, open_idx in results:
+            guild = guilds.get(guild_id)
+            if guild is None:
+                continue
+            # alerts: spike and new high
+            pct = (new_val - current) / current if current > 0 else 0.0
+            to_send: list[tuple[str, str, int]] = []  # (type, desc, color)
+            if pct >= self.SPIKE_UP:
+                to_send.append(("spike_up", f"{cat.upper()} 지수가 분 단위로 +{pct*100:.2f}% 상승", 0x2ecc71))
+            elif pct <= self.SPIKE_DOWN:
+                to_send.append(("spike_down", f"{cat.upper()} 지수가 분 단위로 {pct*100:.2f}% 하락", 0xe74c3c))
+
+            if prev_high is None or new_val > prev_high * (1.0 + self.NEW_HIGH_STEP):
+                to_send.append(("new_high", f"{cat.upper()} 지수 신고점 경신: {new_val:.2f}", 0xf1c40f))
+
+            if to_send:
+                # server-level switch: send only if enabled
+                settings = db.peek_guild_settings(guild.id) or await db.aio.get_guild_settings(guild.id)
+                if not settings.index_alerts_enabled:
+                    continue
+                # suppress alerts during warm-up window after bot start
+                if time.time() < getattr(self, '_alerts_enabled_at', 0.0):
+                    continue
+                ch_id = settings.notify_channel_id
+                if ch_id:
+                    ch = self.bot.get_channel(ch_id)
+                    if isinstance(ch, (discord.TextChannel, discord.Thread)):
+                        for ev_type, desc, color in to_send:
+                            key = (guild.id, cat, ev_type)
+                            last = self._last_alert.get(key, 0.0)
+                            now = time.time()
+                            if ev_type == "new_high":
+                                # lighter cooldown for new_high
+                                cooldown = self.ALERT_COOLDOWN / 2
+                            else:
+                                cooldown = self.ALERT_COOLDOWN
+                            if now - last < cooldown:
+                                continue
+                            self._last_alert[key] = now
+                            try:
+                                embed = discord.Embed(title="📣 활동 지수 알림", description=desc, color=color)
+                                embed.add_field(name="지수", value=f"{new_val:.2f}")
+                                embed.add_field(name="개장가", value=f"{open_idx:.2f}")
+                                embed.add_field(name="변동", value=f"{(new_val-open_idx)/open_idx*100:.2f}%")
+                                embed.set_footer(text=f"카테고리: {cat} • {date_kst}")
+                                await ch.send(embed=embed)
+                            except Exception:
+                                pass
 
     @minute_tick.before_loop
     async def before_minute_tick(self):
         if not self.bot.is_ready():
             await self.bot.wait_until_ready()
 
+    # ---------- tick rollup/retention (runs once per closed trading day) ----------
+    @tasks.loop(minutes=5)
+    async def tick_maintenance(self):
+        try:
+            res = await db.aio.run_tick_maintenance()
+        except Exception as e:
+            print(f"[activity_index] tick maintenance error: {e}")
+            return
+        if res['rolled']:
+            print(f"[activity_index] rolled={','.join(res['rolled'])} pruned={res['pruned']} vacuumed={res['vacuumed']}")
+
+    @tick_maintenance.before_loop
+    async def before_tick_maintenance(self):
+        if not self.bot.is_ready():
+            await self.bot.wait_until_ready()
+
     @commands.Cog.listener()
     async def on_ready(self):
+        # rolling 5-minute windows for the relative boost, before the first tick
+        await db.aio.warm_activity_windows([g.id for g in self.bot.guilds])
+        # open today's indices for every guild in one go so quotes skip the day-open check
+        now_kst = self._now_kst()
+        if self._is_trading(now_kst):
+            await db.aio.open_index_days([g.id for g in self.bot.guilds], now_kst.strftime("%Y-%m-%d"))
         if not self.minute_tick.is_running():
             self.minute_tick.start()
+        if not self.tick_maintenance.is_running():
+            self.tick_maintenance.start()
         # enable alerts 120s after boot
         self._alerts_enabled_at = time.time() + 120.0
 
@@ -270,14 +216,14 @@ class ActivityIndex(commands.Cog):
             return
         date_kst = self._today_kst_str()
         try:
-            cur_chat, _, _, _, _, open_chat = db.get_index_info(interaction.guild.id, date_kst, 'chat')
-            cur_voice, _, _, _, _, open_voice = db.get_index_info(interaction.guild.id, date_kst, 'voice')
-            cur_react, _, _, _, _, open_react = db.get_index_info(interaction.guild.id, date_kst, 'react')
+            cur_chat, _, _, _, _, open_chat = await db.aio.get_index_info(interaction.guild.id, date_kst, 'chat')
+            cur_voice, _, _, _, _, open_voice = await db.aio.get_index_info(interaction.guild.id, date_kst, 'voice')
+            cur_react, _, _, _, _, open_react = await db.aio.get_index_info(interaction.guild.id, date_kst, 'react')
         except Exception:
-            db.ensure_indices_for_day(interaction.guild.id, date_kst)
-            cur_chat, _, _, _, _, open_chat = db.get_index_info(interaction.guild.id, date_kst, 'chat')
-            cur_voice, _, _, _, _, open_voice = db.get_index_info(interaction.guild.id, date_kst, 'voice')
-            cur_react, _, _, _, _, open_react = db.get_index_info(interaction.guild.id, date_kst, 'react')
+            await db.aio.ensure_indices_for_day(interaction.guild.id, date_kst)
+            cur_chat, _, _, _, _, open_chat = await db.aio.get_index_info(interaction.guild.id, date_kst, 'chat')
+            cur_voice, _, _, _, _, open_voice = await db.aio.get_index_info(interaction.guild.id, date_kst, 'voice')
+            cur_react, _, _, _, _, open_react = await db.aio.get_index_info(interaction.guild.id, date_kst, 'react')
 
         def pct(cur, open_):
             try:
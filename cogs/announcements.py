@@ -20,7 +20,7 @@ class Announcements(commands.Cog):
         if not interaction.guild:
             await interaction.response.send_message("서버 내에서만 사용 가능합니다.", ephemeral=True)
             return
-        db.set_main_chat_channel(interaction.guild.id, 채널.id if 채널 else None)
+        await db.aio.set_main_chat_channel(interaction.guild.id, 채널.id if 채널 else None)
         if 채널:
             await interaction.response.send_message(f"메인 채팅 채널을 {채널.mention}(으)로 설정했습니다.", ephemeral=True)
         else:
@@ -33,7 +33,7 @@ class Announcements(commands.Cog):
         if not interaction.guild:
             await interaction.response.send_message("서버 내에서만 사용 가능합니다.", ephemeral=True)
             return
-        db.set_announce_channel(interaction.guild.id, 채널.id if 채널 else None)
+        await db.aio.set_announce_channel(interaction.guild.id, 채널.id if 채널 else None)
         if 채널:
             await interaction.response.send_message(f"공지 채널을 {채널.mention}(으)로 설정했습니다.", ephemeral=True)
         else:
@@ -47,7 +47,7 @@ class Announcements(commands.Cog):
         if not interaction.guild:
             await interaction.response.send_message("서버 내에서만 사용 가능합니다.", ephemeral=True)
             return
-        nid = db.add_announcement(interaction.guild.id, 내용)
+        nid = await db.aio.add_announcement(interaction.guild.id, 내용)
         await interaction.response.send_message(f"공지 등록 완료: #{nid}", ephemeral=True)
 
     @group.command(name="목록", description="등록된 공지사항 목록을 확인합니다.")
@@ -56,7 +56,7 @@ class Announcements(commands.Cog):
         if not interaction.guild:
             await interaction.response.send_message("서버 내에서만 사용 가능합니다.", ephemeral=True)
             return
-        rows = db.list_announcements(interaction.guild.id)
+        rows = await db.aio.list_announcements(interaction.guild.id)
         if not rows:
             await interaction.response.send_message("등록된 공지사항이 없습니다.", ephemeral=True)
             return
@@ -70,7 +70,7 @@ class Announcements(commands.Cog):
         if not interaction.guild:
             await interaction.response.send_message("서버 내에서만 사용 가능합니다.", ephemeral=True)
             return
-        ok = db.remove_announcement(interaction.guild.id, 번호)
+        ok = await db.aio.remove_announcement(interaction.guild.id, 번호)
         if not ok:
             await interaction.response.send_message("해당 번호의 공지가 없습니다.", ephemeral=True)
             return
@@ -82,7 +82,7 @@ class Announcements(commands.Cog):
         if not interaction.guild:
             await interaction.response.send_message("서버 내에서만 사용 가능합니다.", ephemeral=True)
             return
-        db.clear_announcements(interaction.guild.id)
+        await db.aio.clear_announcements(interaction.guild.id)
         await interaction.response.send_message("모든 공지를 삭제했습니다.", ephemeral=True)
 
     # 메세지 카운터 및 로테이션 송출
@@ -90,20 +90,21 @@ class Announcements(commands.Cog):
     async def on_message(self, message: discord.Message):
         if message.author.bot or not message.guild:
             return
-        main_ch = db.get_main_chat_channel(message.guild.id)
+        settings = db.peek_guild_settings(message.guild.id) or await db.aio.get_guild_settings(message.guild.id)
+        main_ch = settings.main_chat_channel_id
         if not main_ch or message.channel.id != main_ch:
             return
-        if not db.has_announcements(message.guild.id):
+        if not settings.has_announcements:
             return
-        count = db.incr_message_count(message.guild.id, message.channel.id)
+        count = await db.aio.incr_message_count(message.guild.id, message.channel.id)
         if count % 50 != 0:
             return
         index = (count // 50) - 1
-        content = db.next_announcement(message.guild.id, index)
+        content = await db.aio.next_announcement(message.guild.id, index)
         if not content:
             return
         # Announce channel override
-        dest_id = db.get_announce_channel(message.guild.id) or message.channel.id
+        dest_id = settings.announce_channel_id or message.channel.id
         dest = self.bot.get_channel(dest_id)
         if isinstance(dest, (discord.TextChannel, discord.Thread)):
             try:
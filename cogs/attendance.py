@@ -26,13 +26,13 @@ class Attendance(commands.Cog):
             try:
                 if self._last_alert_date_by_guild.get(guild.id) == today:
                     continue
-                uids = db.attendance_yesterday_not_today(guild.id)
+                uids = await db.aio.attendance_yesterday_not_today(guild.id)
                 mentions = []
                 for uid in uids:
                     m = guild.get_member(uid)
                     if m and not m.bot:
                         mentions.append(m.mention)
-                ch_id = db.get_notify_channel(guild.id)
+                ch_id = (db.peek_guild_settings(guild.id) or await db.aio.get_guild_settings(guild.id)).notify_channel_id
                 if ch_id and mentions:
                     ch = self.bot.get_channel(ch_id)
                     if isinstance(ch, (discord.TextChannel, discord.Thread)):
@@ -59,7 +59,7 @@ class Attendance(commands.Cog):
         if not interaction.guild:
             await interaction.response.send_message("서버에서만 사용 가능합니다.", ephemeral=True)
             return
-        already, streak, reward, maxs = db.attendance_check_in(interaction.guild.id, interaction.user.id)
+        already, streak, reward, maxs = await db.aio.attendance_check_in(interaction.guild.id, interaction.user.id)
         if already:
             await interaction.response.send_message(f"오늘은 이미 출석했습니다. 현재 연속 {streak}일!", ephemeral=False)
             return
@@ -73,7 +73,7 @@ class Attendance(commands.Cog):
         if not interaction.guild:
             await interaction.response.send_message("서버에서만 사용 가능합니다.", ephemeral=True)
             return
-        checked, not_checked = db.attendance_today(interaction.guild.id)
+        checked, not_checked = await db.aio.attendance_today(interaction.guild.id)
         topn = max(1, min(int(상위), 50))
         def resolve(uids):
             out = []
@@ -100,7 +100,7 @@ class Attendance(commands.Cog):
             await interaction.response.send_message("서버에서만 사용 가능합니다.", ephemeral=True)
             return
         topn = max(1, min(int(상위), 50))
-        rows = db.attendance_max_streak_leaderboard(interaction.guild.id, topn * 2)
+        rows = await db.aio.attendance_max_streak_leaderboard(interaction.guild.id, topn * 2)
         if not rows:
             await interaction.response.send_message("아직 출석 기록이 없습니다.", ephemeral=True)
             return
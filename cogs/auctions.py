@@ -76,7 +76,7 @@ class Auctions(commands.Cog):
         try:
             if db.is_patent_item_name(name) and interaction.guild:
                 word = name.split(":", 1)[1] if ":" in name else name
-                p = db.get_patent_price(interaction.guild.id, word)
+                p = await db.aio.get_patent_price(interaction.guild.id, word)
                 if p is not None:
                     시작가 = int(p)
         except Exception:
@@ -84,7 +84,7 @@ class Auctions(commands.Cog):
 
         await interaction.response.defer(ephemeral=True)
         try:
-            auction_id = db.create_auction(
+            auction_id = await db.aio.create_auction(
                 seller_id=interaction.user.id,
                 name=name,
                 emoji=emoji,
@@ -111,7 +111,7 @@ class Auctions(commands.Cog):
         # 설정된 '알림 채널'로 새 경매 알림 전송
         if interaction.guild:
             # use generic notify channel (back-compat alias to same storage)
-            ch_id = db.get_notify_channel(interaction.guild.id)
+            ch_id = await db.aio.get_notify_channel(interaction.guild.id)
             if ch_id:
                 ch = self.bot.get_channel(ch_id)
                 if isinstance(ch, (discord.TextChannel, discord.Thread)):
@@ -142,7 +142,7 @@ class Auctions(commands.Cog):
             return
         # 서버 일치 검사
         try:
-            gid, end_at, status = db.get_auction_guild(경매id)
+            gid, end_at, status = await db.aio.get_auction_guild(경매id)
         except ValueError as e:
             await interaction.response.send_message(str(e), ephemeral=True)
             return
@@ -151,7 +151,7 @@ class Auctions(commands.Cog):
             return
         await interaction.response.defer(ephemeral=True)
         try:
-            new_bid, top_bidder, prev_bidder, prev_amount = db.place_bid(경매id, interaction.user.id, 금액)
+            new_bid, top_bidder, prev_bidder, prev_amount = await db.aio.place_bid(경매id, interaction.user.id, 금액)
         except ValueError as e:
             await interaction.followup.send(str(e), ephemeral=True)
             return
@@ -165,13 +165,13 @@ class Auctions(commands.Cog):
 
         # 알림 채널로 호가 알림 전송 + 이전 최고가 부른 사람 멘션
         if interaction.guild:
-            ch_id = db.get_notify_channel(interaction.guild.id)
+            ch_id = await db.aio.get_notify_channel(interaction.guild.id)
             if ch_id:
                 ch = self.bot.get_channel(ch_id)
                 if isinstance(ch, (discord.TextChannel, discord.Thread)):
                     try:
                         # 경매 정보 조회
-                        row = db.get_auction(경매id)
+                        row = await db.aio.get_auction(경매id)
                         # row columns depend on schema; extract safely
                         # expected order: id, seller_id, name, emoji, qty, start_price, current_bid, current_bidder_id, created_at, end_at, status, winner_id, winning_bid, guild_id
                         name = row[2] if row and len(row) > 2 else "아이템"
@@ -197,12 +197,12 @@ class Auctions(commands.Cog):
     async def list_auctions(self, interaction: discord.Interaction, 검색: str | None = None, 페이지크기: int = 10):
         per_page = max(1, min(int(페이지크기), 25))
         gid = interaction.guild.id if interaction.guild else None
-        total = db.count_open_auctions(검색 or None, guild_id=gid)
+        total = await db.aio.count_open_auctions(검색 or None, guild_id=gid)
         total_pages = max(1, (total + per_page - 1) // per_page)
 
-        def build_embed(page: int) -> discord.Embed:
+        async def build_embed(page: int) -> discord.Embed:
             offset = (page - 1) * per_page
-            rows = db.list_open_auctions(offset, per_page, 검색 or None, guild_id=gid)
+            rows = await db.aio.list_open_auctions(offset, per_page, 검색 or None, guild_id=gid)
             lines = []
             for (aid, seller_id, name, emoji, qty, start_price, current_bid, current_bidder_id, end_at) in rows:
                 price = current_bid if current_bid is not None else start_price
@@ -216,7 +216,7 @@ class Auctions(commands.Cog):
             embed.set_footer(text=f"페이지 {page}/{total_pages} • ⬅️ ➡️ • 1분 후 만료")
             return embed
 
-        await interaction.response.send_message(embed=build_embed(1))
+        await interaction.response.send_message(embed=await build_embed(1))
         msg = await interaction.original_response()
         if total == 0:
             return
@@ -239,7 +239,7 @@ class Auctions(commands.Cog):
 
     @list_item.autocomplete("아이템")
     async def _ac_item(self, interaction: discord.Interaction, current: str):
-        rows = db.list_inventory(interaction.user.id, query=current or None)
+        rows = await db.aio.list_inventory(interaction.user.id, query=current or None)
         choices = []
         for (emoji, name, qty) in rows[:25]:
             try:
@@ -279,7 +279,7 @@ class Auctions(commands.Cog):
         ctx["page"] = page
         # rebuild
         offset = (page - 1) * per_page
-        rows = db.list_open_auctions(offset, per_page, search or None, guild_id=ctx.get("guild_id"))
+        rows = await db.aio.list_open_auctions(offset, per_page, search or None, guild_id=ctx.get("guild_id"))
         lines = []
         for (aid, seller_id, name, emoji, qty, start_price, current_bid, current_bidder_id, end_at) in rows:
             price = current_bid if current_bid is not None else start_price
@@ -290,7 +290,7 @@ class Auctions(commands.Cog):
             )
         desc = "\n".join(lines) if lines else "진행중인 경매가 없습니다."
         embed = discord.Embed(title="🏷️ 진행중인 경매", description=desc, color=discord.Color.blurple())
-        total = db.count_open_auctions(search or None, guild_id=ctx.get("guild_id"))
+        total = await db.aio.count_open_auctions(search or None, guild_id=ctx.get("guild_id"))
         total_pages = max(1, (total + per_page - 1) // per_page)
         ctx["total_pages"] = total_pages
         embed.set_footer(text=f"페이지 {page}/{total_pages} • ⬅️ ➡️ • 1분 후 만료")
@@ -312,7 +312,7 @@ class Auctions(commands.Cog):
         per_page = ctx["per_page"]
         search = ctx["search"]
         offset = (page - 1) * per_page
-        rows = db.list_open_auctions(offset, per_page, search or None, guild_id=ctx.get("guild_id"))
+        rows = await db.aio.list_open_auctions(offset, per_page, search or None, guild_id=ctx.get("guild_id"))
         lines = []
         for (aid, seller_id, name, emoji, qty, start_price, current_bid, current_bidder_id, end_at) in rows:
             price = current_bid if current_bid is not None else start_price
@@ -323,7 +323,7 @@ class Auctions(commands.Cog):
             )
         desc = "\n".join(lines) if lines else "진행중인 경매가 없습니다."
         embed = discord.Embed(title="🏷️ 진행중인 경매", description=desc, color=discord.Color.blurple())
-        total = db.count_open_auctions(search or None, guild_id=ctx.get("guild_id"))
+        total = await db.aio.count_open_auctions(search or None, guild_id=ctx.get("guild_id"))
         total_pages = max(1, (total + per_page - 1) // per_page)
         embed.set_footer(text=f"페이지 {page}/{total_pages} • 만료됨")
         try:
@@ -340,7 +340,7 @@ class Auctions(commands.Cog):
     async def on_member_remove(self, member: discord.Member):
         # Auto-auction all items of a member who left (max duration, start price 1)
         try:
-            items = db.list_inventory(member.id)
+            items = await db.aio.list_inventory(member.id)
         except Exception:
             items = []
         if not items:
@@ -353,12 +353,12 @@ class Auctions(commands.Cog):
                 try:
                     if db.is_patent_item_name(name):
                         w = name.split(":", 1)[1] if ":" in name else name
-                        pp = db.get_patent_price(member.guild.id, w) if member.guild else None
+                        pp = await db.aio.get_patent_price(member.guild.id, w) if member.guild else None
                         if pp is not None:
                             sp = int(pp)
                 except Exception:
                     pass
-                db.create_auction(
+                await db.aio.create_auction(
                     seller_id=member.id,
                     name=name,
                     emoji=emoji,
@@ -376,12 +376,12 @@ class Auctions(commands.Cog):
         try:
             # 0) Expired patents -> create auctions (max duration)
             try:
-                expired = db.list_expired_unauctioned_patents(50)
+                expired = await db.aio.list_expired_unauctioned_patents(50)
             except Exception:
                 expired = []
             for (pid, gid, owner_id, word, price, cts) in expired:
                 try:
-                    db.create_auction(
+                    await db.aio.create_auction(
                         seller_id=owner_id,
                         name=f"특허:{word}",
                         emoji="📜",
@@ -390,12 +390,12 @@ class Auctions(commands.Cog):
                         duration_seconds=30 * 24 * 3600,
                         guild_id=gid,
                     )
-                    db.mark_patent_auctioned(pid)
+                    await db.aio.mark_patent_auctioned(pid)
                 except Exception:
                     # keep trying next loop if failed
                     continue
             # 1) 서버에서 판매자가 없는 유찰 경매 파기
-            due = db.list_due_unsold_auctions(50)
+            due = await db.aio.list_due_unsold_auctions(50)
             discarded = 0
             discarded_msgs = []
             for (aid, guild_id, seller_id, name, emoji, qty) in due:
@@ -403,7 +403,7 @@ class Auctions(commands.Cog):
                 seller_present = bool(guild and guild.get_member(seller_id))
                 if not seller_present:
                     try:
-                        db.discard_unsold_auction(aid)
+                        await db.aio.discard_unsold_auction(aid)
                         discarded += 1
                         discarded_msgs.append({
                             'id': aid,
@@ -418,7 +418,7 @@ class Auctions(commands.Cog):
                         pass
 
             # 2) 나머지 경매 일반 규칙으로 정산(낙찰/유찰 반납)
-            details = db.finalize_due_auctions_details(50)
+            details = await db.aio.finalize_due_auctions_details(50)
             if discarded or details:
                 print(f"[auctions] finalized={len(details)} discarded={discarded}")
 
@@ -429,7 +429,7 @@ class Auctions(commands.Cog):
                 if gid:
                     notif_groups.setdefault(gid, []).append(d)
             for gid, items in notif_groups.items():
-                ch_id = db.get_notify_channel(gid)
+                ch_id = (db.peek_guild_settings(gid) or await db.aio.get_guild_settings(gid)).notify_channel_id
                 if not ch_id:
                     continue
                 ch = self.bot.get_channel(ch_id)
@@ -43,7 +43,7 @@ class AutoTransfer(commands.Cog):
             await interaction.response.send_message("시작일 형식이 올바르지 않습니다. YYYY-MM-DD", ephemeral=True)
             return
         try:
-            auto_id = db.create_auto_transfer(interaction.guild.id, interaction.user.id, 대상.id, 금액, 주기일, sdate)
+            auto_id = await db.aio.create_auto_transfer(interaction.guild.id, interaction.user.id, 대상.id, 금액, 주기일, sdate)
         except ValueError as e:
             await interaction.response.send_message(str(e), ephemeral=True)
             return
@@ -54,7 +54,7 @@ class AutoTransfer(commands.Cog):
         if not interaction.guild:
             await interaction.response.send_message("서버에서만 사용 가능합니다.", ephemeral=True)
             return
-        rows = db.list_user_auto_transfers(interaction.guild.id, interaction.user.id)
+        rows = await db.aio.list_user_auto_transfers(interaction.guild.id, interaction.user.id)
         if not rows:
             await interaction.response.send_message("등록된 자동이체가 없습니다.", ephemeral=True)
             return
@@ -84,7 +84,7 @@ class AutoTransfer(commands.Cog):
         if not interaction.guild:
             await interaction.response.send_message("서버에서만 사용 가능합니다.", ephemeral=True)
             return
-        ok = db.cancel_auto_transfer(interaction.guild.id, interaction.user.id, 번호)
+        ok = await db.aio.cancel_auto_transfer(interaction.guild.id, interaction.user.id, 번호)
         if not ok:
             await interaction.response.send_message("취소할 수 없거나 이미 취소된 항목입니다.", ephemeral=True)
             return
@@ -95,16 +95,16 @@ class AutoTransfer(commands.Cog):
     async def runner(self):
         today = datetime.now(KST).strftime("%Y-%m-%d")
         try:
-            due = db.list_due_auto_transfers(today)
+            due = await db.aio.list_due_auto_transfers(today)
         except Exception:
             due = []
         for auto_id, gid, frm, to, amount in due:
             # 송금 시도
             try:
-                db.transfer(frm, to, amount)
-                db.mark_auto_transfer_run(auto_id, True, None, today)
+                await db.aio.transfer(frm, to, amount)
+                await db.aio.mark_auto_transfer_run(auto_id, True, None, today)
             except Exception as e:
-                db.mark_auto_transfer_run(auto_id, False, str(e), None)
+                await db.aio.mark_auto_transfer_run(auto_id, False, str(e), None)
                 # 실패 알림: 보낸 사람에게 DM, 실패 시 알림 채널로
                 try:
                     guild = self.bot.get_guild(gid)
@@ -119,7 +119,7 @@ class AutoTransfer(commands.Cog):
                         except Exception:
                             pass
                     # DM 실패 시 알림 채널로
-                    ch_id = db.get_notify_channel(gid)
+                    ch_id = await db.aio.get_notify_channel(gid)
                     if ch_id:
                         ch = self.bot.get_channel(ch_id)
                         if isinstance(ch, (discord.TextChannel, discord.Thread)):
@@ -15,10 +15,14 @@ class Economy(commands.Cog):
         # message_id -> pagination context for ranking
         self._rank_pages: dict[int, dict] = {}
 
+    async def cog_load(self):
+        # 순위 인덱스를 미리 만들어 첫 /돈 순위가 기다리지 않게 합니다(이벤트 루프 밖에서 읽음).
+        await db.aio.reload_rank_index()
+
     # 앱 커맨드는 Cog에 정의되면 자동으로 트리에 등록됩니다.
 
-    def get_balance(self, user_id: int) -> int:
-        return db.get_balance(user_id)
+    async def get_balance(self, user_id: int) -> int:
+        return await db.aio.get_balance(user_id)
 
     @commands.Cog.listener()
     async def on_ready(self):
@@ -31,7 +35,7 @@ class Economy(commands.Cog):
     @money.command(name="확인", description="자신의 소지금을 확인합니다.")
     async def money_check(self, interaction: discord.Interaction):
         user_id = interaction.user.id
-        balance = self.get_balance(user_id)
+        balance = await self.get_balance(user_id)
 
         embed = discord.Embed(
             title=f"{interaction.user.display_name}님의 지갑",
@@ -71,7 +75,7 @@ class Economy(commands.Cog):
 
         # 송금 진행 (SQLite, 원자적 트랜잭션)
         try:
-            new_sender, new_receiver = db.transfer(sender_id, receiver_id, 금액)
+            new_sender, new_receiver = await db.aio.transfer(sender_id, receiver_id, 금액)
         except ValueError as e:
             await interaction.followup.send(str(e))
             return
@@ -91,12 +95,14 @@ class Economy(commands.Cog):
         per_page = max(1, min(int(상위), 25))
 
         # 첫 페이지 계산
-        total = db.count_users()
+        total = await db.aio.count_users()
         total_pages = max(1, (total + per_page - 1) // per_page)
+        shown: list[tuple[int, int]] = []
 
-        def build_embed(page: int) -> discord.Embed:
+        async def build_embed(page: int) -> discord.Embed:
             offset = (page - 1) * per_page
-            rows = db.rank_page(offset, per_page)
+            rows = await db.aio.rank_page(offset, per_page)
+            shown[:] = rows
             lines = []
             for i, (uid, bal) in enumerate(rows, start=1):
                 member = None
@@ -109,7 +115,7 @@ class Economy(commands.Cog):
                 )
                 lines.append(f"**{offset + i}.** {name} — **{bal:,}원**")
 
-            rank, my_balance, _ = db.get_rank(interaction.user.id)
+            rank, my_balance, _ = await db.aio.get_rank(interaction.user.id)
             embed = discord.Embed(
                 title="🏆 소지금 순위",
                 description="\n".join(lines) if lines else "데이터가 없습니다.",
@@ -119,7 +125,7 @@ class Economy(commands.Cog):
             embed.set_footer(text=footer)
             return embed
 
-        await interaction.response.send_message(embed=build_embed(1))
+        await interaction.response.send_message(embed=await build_embed(1))
         msg = await interaction.original_response()
 
         if total == 0:
@@ -132,6 +138,9 @@ class Economy(commands.Cog):
             "page": 1,
             "total_pages": total_pages,
             "expires_at": time.monotonic() + 60,
+            # 화면의 첫/마지막 행 (user_id, balance): 페이지 이동은 이 기준으로 이어서 조회
+            "first": shown[0] if shown else None,
+            "last": shown[-1] if shown else None,
         }
 
         # 반응 추가
@@ -174,18 +183,30 @@ class Economy(commands.Cog):
             page += 1
         else:
             return
+        forward = page > ctx["page"]
 
         ctx["page"] = page
         per_page = ctx["per_page"]
 
         # embed 재구성
-        total = db.count_users()
+        total = await db.aio.count_users()
         total_pages = max(1, (total + per_page - 1) // per_page)
         ctx["total_pages"] = total_pages
 
-        def build_embed(page: int) -> discord.Embed:
+        async def build_embed(page: int) -> discord.Embed:
             offset = (page - 1) * per_page
-            rows = db.rank_page(offset, per_page)
+            # 키셋 페이지: 보던 페이지의 경계 행 바로 다음/이전부터 조회
+            edge = ctx.get("last") if forward else ctx.get("first")
+            rows = []
+            if edge:
+                uid0, bal0 = edge
+                if forward:
+                    rows = await db.aio.rank_page_after(bal0, uid0, per_page)
+                else:
+                    rows = await db.aio.rank_page_before(bal0, uid0, per_page)
+            if not rows:
+                rows = await db.aio.rank_page(offset, per_page)
+            ctx["first"], ctx["last"] = (rows[0], rows[-1]) if rows else (None, None)
             lines = []
             for i, (uid, bal) in enumerate(rows, start=1):
                 member = msg.guild.get_member(uid) if msg.guild else None
@@ -195,13 +216,13 @@ class Economy(commands.Cog):
                     else (user_obj.name if isinstance(user_obj, discord.User) else f"<@{uid}>")
                 )
                 lines.append(f"**{offset + i}.** {name} — **{bal:,}원**")
-            rank, my_balance, _ = db.get_rank(user.id)
+            rank, my_balance, _ = await db.aio.get_rank(user.id)
             embed = discord.Embed(title="🏆 소지금 순위", description="\n".join(lines) if lines else "데이터가 없습니다.", color=discord.Color.purple())
             embed.set_footer(text=f"당신의 순위: {rank} (보유 {my_balance:,}원) • 페이지 {page}/{total_pages} • ⬅️ ➡️ • 1분 후 만료")
             return embed
 
         try:
-            await msg.edit(embed=build_embed(page))
+            await msg.edit(embed=await build_embed(page))
         except Exception:
             pass
         try:
@@ -217,10 +238,10 @@ class Economy(commands.Cog):
         # 현재 페이지 기준으로 임베드 만료 표기
         page = ctx["page"]
         per_page = ctx["per_page"]
-        total = db.count_users()
+        total = await db.aio.count_users()
         total_pages = max(1, (total + per_page - 1) // per_page)
         offset = (page - 1) * per_page
-        rows = db.rank_page(offset, per_page)
+        rows = await db.aio.rank_page(offset, per_page)
         lines = []
         for i, (uid, bal) in enumerate(rows, start=1):
             member = msg.guild.get_member(uid) if msg.guild else None
@@ -230,7 +251,7 @@ class Economy(commands.Cog):
                 else (user_obj.name if isinstance(user_obj, discord.User) else f"<@{uid}>")
             )
             lines.append(f"**{offset + i}.** {name} — **{bal:,}원**")
-        rank, my_balance, _ = db.get_rank(ctx["owner_id"])
+        rank, my_balance, _ = await db.aio.get_rank(ctx["owner_id"])
         embed = discord.Embed(title="🏆 소지금 순위", description="\n".join(lines) if lines else "데이터가 없습니다.", color=discord.Color.purple())
         embed.set_footer(text=f"당신의 순위: {rank} (보유 {my_balance:,}원) • 페이지 {page}/{total_pages} • 만료됨")
         try:
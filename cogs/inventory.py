@@ -24,7 +24,7 @@ class Inventory(commands.Cog):
     @app_commands.describe(유저="확인할 대상 (기본: 본인)", 검색="아이템 이름 또는 이모지 일부")
     async def inventory(self, interaction: discord.Interaction, 유저: discord.Member | None = None, 검색: str | None = None):
         target = 유저 or interaction.user
-        rows = db.list_inventory(target.id, query=검색)
+        rows = await db.aio.list_inventory(target.id, query=검색)
 
         # 페이지네이션 설정
         per_page = 10
@@ -85,7 +85,7 @@ class Inventory(commands.Cog):
             return
         await interaction.response.defer(ephemeral=True)
         member_ids = [m.id for m in interaction.guild.members if not m.bot]
-        rows = db.list_items_for_users(member_ids)
+        rows = await db.aio.list_items_for_users(member_ids)
         # 검색 필터(선택)
         if 검색:
             q = 검색.lower()
@@ -166,12 +166,12 @@ class Inventory(commands.Cog):
                 await interaction.followup.send("특허 아이템은 1개 단위로만 이전할 수 있습니다.")
                 return
             word = name.split(":", 1)[1] if ":" in name else name
-            ok = db.transfer_patent(interaction.guild.id, interaction.user.id, 받는사람.id, word)
+            ok = await db.aio.transfer_patent(interaction.guild.id, interaction.user.id, 받는사람.id, word)
             if not ok:
                 await interaction.followup.send("특허 소유권 이전에 실패했습니다(소유자 아님).")
                 return
         try:
-            sender_qty, receiver_qty = db.transfer_item(
+            sender_qty, receiver_qty = await db.aio.transfer_item(
                 sender_id=interaction.user.id,
                 receiver_id=받는사람.id,
                 name=name,
@@ -236,13 +236,13 @@ class Inventory(commands.Cog):
                 await interaction.followup.send("특허 아이템은 1개 단위로만 폐기(취소)할 수 있습니다.", ephemeral=True)
                 return
             word = name.split(":", 1)[1] if ":" in name else name
-            ok = db.cancel_patent(interaction.guild.id, interaction.user.id, word)
+            ok = await db.aio.cancel_patent(interaction.guild.id, interaction.user.id, word)
             if not ok:
                 await interaction.followup.send("해당 특허가 없거나 취소할 수 없습니다.", ephemeral=True)
                 return
             # 남은 수량 조회
             rem = 0
-            for e, n, q in db.list_inventory(interaction.user.id):
+            for e, n, q in await db.aio.list_inventory(interaction.user.id):
                 if n == name and e == emo:
                     rem = q
                     break
@@ -256,7 +256,7 @@ class Inventory(commands.Cog):
             return
 
         try:
-            remaining = db.discard_item(interaction.user.id, name, emo, 수량)
+            remaining = await db.aio.discard_item(interaction.user.id, name, emo, 수량)
         except ValueError as e:
             await interaction.followup.send(str(e), ephemeral=True)
             return
@@ -273,7 +273,7 @@ class Inventory(commands.Cog):
     @give_item.autocomplete("아이템")
     async def _autocomplete_give_item(self, interaction: discord.Interaction, current: str):
         user_id = interaction.user.id
-        rows = db.list_inventory(user_id, query=current or None)
+        rows = await db.aio.list_inventory(user_id, query=current or None)
         # 최대 25개 제한
         choices = []
         for (emoji, name, qty) in rows[:25]:
@@ -291,7 +291,7 @@ class Inventory(commands.Cog):
     @discard.autocomplete("아이템")
     async def _autocomplete_discard_item(self, interaction: discord.Interaction, current: str):
         user_id = interaction.user.id
-        rows = db.list_inventory(user_id, query=current or None)
+        rows = await db.aio.list_inventory(user_id, query=current or None)
         choices = []
         for (emoji, name, qty) in rows[:25]:
             # 투자 종목 아이템만 숨김
@@ -340,7 +340,7 @@ class Inventory(commands.Cog):
         await interaction.response.defer(ephemeral=True)
 
         try:
-            new_qty = db.grant_item(대상.id, 이름, 이모지, 수량)
+            new_qty = await db.aio.grant_item(대상.id, 이름, 이모지, 수량)
         except ValueError as e:
             await interaction.followup.send(str(e), ephemeral=True)
             return
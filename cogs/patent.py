@@ -1,5 +1,5 @@
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 from discord import app_commands
 
 import database as db
@@ -9,6 +9,18 @@ class Patent(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
         db.init_db()
+        self.royalty_payout.change_interval(minutes=db.royalties.SETTLE_MINUTES)
+
+    async def cog_load(self):
+        # 특허 캐시와 사용료 보류액은 전체 테이블을 읽으므로 이벤트 루프 밖에서 불러옵니다.
+        await db.aio.reload_patent_cache()
+        await db.aio.load_royalty_holds()
+
+    def cog_unload(self):
+        try:
+            self.royalty_payout.cancel()
+        except Exception:
+            pass
 
     group = app_commands.Group(name="특허", description="특허 미니게임")
 
@@ -17,7 +29,7 @@ class Patent(commands.Cog):
         if not interaction.guild:
             await interaction.response.send_message("서버에서만 사용 가능합니다.", ephemeral=True)
             return
-        db.join_patent_game(interaction.guild.id, interaction.user.id)
+        await db.aio.join_patent_game(interaction.guild.id, interaction.user.id)
         await interaction.response.send_message("특허 게임에 참가했습니다.", ephemeral=True)
 
     @group.command(name="하차", description="특허 게임에서 하차합니다.")
@@ -25,7 +37,7 @@ class Patent(commands.Cog):
         if not interaction.guild:
             await interaction.response.send_message("서버에서만 사용 가능합니다.", ephemeral=True)
             return
-        db.leave_patent_game(interaction.guild.id, interaction.user.id)
+        await db.aio.leave_patent_game(interaction.guild.id, interaction.user.id)
         await interaction.response.send_message("특허 게임에서 하차했습니다.", ephemeral=True)
 
     @group.command(name="출원", description="단어에 대한 특허를 출원합니다.")
@@ -43,7 +55,7 @@ class Patent(commands.Cog):
             await interaction.response.send_message(f"해당 단어의 최소 출원가: {minp:,}원", ephemeral=True)
             return
         try:
-            pid = db.add_patent(interaction.guild.id, interaction.user.id, w, 가격)
+            pid = await db.aio.add_patent(interaction.guild.id, interaction.user.id, w, 가격)
         except ValueError as e:
             await interaction.response.send_message(str(e), ephemeral=True)
             return
@@ -54,7 +66,7 @@ class Patent(commands.Cog):
         if not interaction.guild:
             await interaction.response.send_message("서버에서만 사용 가능합니다.", ephemeral=True)
             return
-        rows = db.list_patents(interaction.guild.id)
+        rows = await db.aio.list_patents(interaction.guild.id)
         if not rows:
             await interaction.response.send_message("등록된 특허가 없습니다.", ephemeral=True)
             return
@@ -72,7 +84,7 @@ class Patent(commands.Cog):
         if not interaction.guild:
             await interaction.response.send_message("서버에서만 사용 가능합니다.", ephemeral=True)
             return
-        ok = db.cancel_patent(interaction.guild.id, interaction.user.id, 단어)
+        ok = await db.aio.cancel_patent(interaction.guild.id, interaction.user.id, 단어)
         if not ok:
             await interaction.response.send_message("해당 단어의 내 특허가 없습니다.", ephemeral=True)
             return
@@ -83,10 +95,14 @@ class Patent(commands.Cog):
         # Only in guilds, non-bot, and participants
         if message.author.bot or not message.guild:
             return
-        if not db.is_patent_participant(message.guild.id, message.author.id):
+        joined = db.peek_patent_participant(message.guild.id, message.author.id)
+        if joined is None:
+            joined = await db.aio.is_patent_participant(message.guild.id, message.author.id)
+        if not joined:
             return
         content = message.content or ""
-        hits = db.find_patent_hits(message.guild.id, content)
+        scan = await db.aio.scan_patent_message(message.guild.id, content)
+        hits = scan.hits
         if not hits:
             return
         # Aggregate charges per owner, skip self-owned words
@@ -101,29 +117,22 @@ class Patent(commands.Cog):
         if not charges:
             return
         total = sum(charges.values())
-        bal = db.get_balance(message.author.id)
-        if bal >= total:
-            # Pay all owners quietly (no reactions/messages)
-            for owner_id, amount in charges.items():
-                try:
-                    db.transfer(message.author.id, owner_id, amount)
-                except Exception:
-                    pass
-            try:
-                db.log_patent_detection(
-                    guild_id=message.guild.id,
-                    user_id=message.author.id,
-                    channel_id=message.channel.id,
-                    message_id=message.id,
-                    words=words,
-                    total_fee=total,
-                    censored=False,
-                )
-            except Exception:
-                pass
+        settle = db.aio.accrue_patent_royalties if db.royalties_deferred() else db.aio.settle_patent_usage
+        try:
+            paid = await settle(
+                message.guild.id,
+                message.author.id,
+                charges,
+                words,
+                channel_id=message.channel.id,
+                message_id=message.id,
+            )
+        except Exception:
+            return
+        if paid:
             return
         # Not enough funds: censor
-        censored = db.censor_words(content, words)
+        censored = scan.censor(words)
         info = (
             "이 메시지는 특허 미니게임 규칙에 따라 검열되었습니다.\n"
             "- 메시지에 등록된 특허 단어가 포함되고 잔액이 부족하면 단어가 스포일러로 숨겨집니다.\n"
@@ -149,7 +158,7 @@ class Patent(commands.Cog):
                 pass
         # log censored event
         try:
-            db.log_patent_detection(
+            await db.aio.log_patent_detection(
                 guild_id=message.guild.id,
                 user_id=message.author.id,
                 channel_id=message.channel.id,
@@ -169,9 +178,9 @@ class Patent(commands.Cog):
             return
         limit = max(1, min(int(상위), 50))
         if 유저:
-            rows = db.get_user_patent_logs(interaction.guild.id, 유저.id, limit)
+            rows = await db.aio.get_user_patent_logs(interaction.guild.id, 유저.id, limit)
         else:
-            rows = db.get_recent_patent_logs(interaction.guild.id, limit)
+            rows = await db.aio.get_recent_patent_logs(interaction.guild.id, limit)
         if not rows:
             await interaction.response.send_message("최근 검출 내역이 없습니다.", ephemeral=True)
             return
@@ -186,6 +195,31 @@ class Patent(commands.Cog):
         embed = discord.Embed(title="🧾 특허 검출 내역", description="\n".join(lines), color=discord.Color.dark_teal())
         await interaction.response.send_message(embed=embed, ephemeral=True)
 
+    # deferred royalties (PATENT_ROYALTIES=deferred): netted payout every few minutes
+    @tasks.loop(minutes=5)
+    async def royalty_payout(self):
+        try:
+            await db.aio.settle_patent_royalties()
+        except Exception as e:
+            print(f"[patent] royalty payout error: {e}")
+
+    @royalty_payout.before_loop
+    async def before_royalty_payout(self):
+        if not self.bot.is_ready():
+            await self.bot.wait_until_ready()
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        if db.royalties_deferred():
+            if not self.royalty_payout.is_running():
+                self.royalty_payout.start()
+        else:
+            # accruals left over from a run in deferred mode
+            try:
+                await db.aio.settle_patent_royalties()
+            except Exception as e:
+                print(f"[patent] royalty payout error: {e}")
+
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(Patent(bot))
@@ -1,3 +1,7 @@
+import os
+import tempfile
+import time
+
 import discord
 from discord.ext import commands
 from discord import app_commands
@@ -20,7 +24,7 @@ class Settings(commands.Cog):
             await interaction.response.send_message("서버 내에서만 사용할 수 있습니다.", ephemeral=True)
             return
         try:
-            db.set_notify_channel(interaction.guild.id, 채널.id if 채널 else None)
+            await db.aio.set_notify_channel(interaction.guild.id, 채널.id if 채널 else None)
         except Exception as e:
             await interaction.response.send_message(f"설정 중 오류: {e}", ephemeral=True)
             return
@@ -37,12 +41,68 @@ class Settings(commands.Cog):
             await interaction.response.send_message("서버 내에서만 사용할 수 있습니다.", ephemeral=True)
             return
         try:
-            db.set_index_alerts_enabled(interaction.guild.id, 상태)
+            await db.aio.set_index_alerts_enabled(interaction.guild.id, 상태)
         except Exception as e:
             await interaction.response.send_message(f"설정 중 오류: {e}", ephemeral=True)
             return
         await interaction.response.send_message(f"활동 지수 알림이 {'켜짐' if 상태 else '꺼짐'}으로 설정되었습니다.", ephemeral=True)
 
+    @group.command(name="db통계", description="DB 호출 계측을 켜고 끄거나 결과를 확인합니다.")
+    @app_commands.describe(동작="보기/켜기/끄기/초기화/내보내기(JSON 파일)")
+    @app_commands.choices(동작=[
+        app_commands.Choice(name="보기", value="show"),
+        app_commands.Choice(name="켜기", value="on"),
+        app_commands.Choice(name="끄기", value="off"),
+        app_commands.Choice(name="초기화", value="reset"),
+        app_commands.Choice(name="내보내기", value="dump"),
+    ])
+    @app_commands.default_permissions(administrator=True)
+    async def db_stats(self, interaction: discord.Interaction, 동작: app_commands.Choice[str]):
+        action = 동작.value
+        if action == "on":
+            n = db.enable_profiling()
+            await interaction.response.send_message(f"DB 계측을 켰습니다. (함수 {n}개)", ephemeral=True)
+            return
+        if action == "off":
+            db.disable_profiling()
+            await interaction.response.send_message("DB 계측을 껐습니다. 수집된 결과는 유지됩니다.", ephemeral=True)
+            return
+        if action == "reset":
+            db.reset_profile()
+            await interaction.response.send_message("DB 계측 결과를 초기화했습니다.", ephemeral=True)
+            return
+        if action == "dump":
+            path = os.path.join(tempfile.gettempdir(), f"db-profile-{int(time.time())}.json")
+            db.dump_profile(path)
+            try:
+                await interaction.response.send_message(file=discord.File(path, filename="db-profile.json"), ephemeral=True)
+            finally:
+                try:
+                    os.remove(path)
+                except Exception:
+                    pass
+            return
+
+        p = db.get_profile()
+        funcs = sorted(p["functions"].items(), key=lambda kv: kv[1]["total_ms"], reverse=True)[:10]
+        lines = [f"상태: {'켜짐' if p['enabled'] else '꺼짐'} · 느린 쿼리 기준 {p['slow_query_ms']:.0f}ms"]
+        if funcs:
+            lines.append("```")
+            lines.append(f"{'함수':<26}{'호출':>7}{'p50':>8}{'p99':>8}{'합계':>9}")
+            for name, m in funcs:
+                lines.append(f"{name[:26]:<26}{m['calls']:>7}{m['p50_ms']:>8.1f}{m['p99_ms']:>8.1f}{m['total_ms']:>9.0f}")
+            lines.append("```")
+        lw, cm = p["lock_wait"], p["commit"]
+        lines.append(f"락 대기(BEGIN): {lw['calls']}회, p99 {lw['p99_ms']:.1f}ms · 커밋: {cm['calls']}회, p99 {cm['p99_ms']:.1f}ms")
+        slow = p["slow_queries"][-5:]
+        if slow:
+            lines.append("최근 느린 쿼리:")
+            for q in reversed(slow):
+                lines.append(f"- {q['ms']:.0f}ms `{q['function'] or '-'}` {q['sql'][:120]} {q['params']}")
+        if not funcs and not slow:
+            lines.append("수집된 데이터가 없습니다.")
+        await interaction.response.send_message("\n".join(lines)[:1900], ephemeral=True)
+
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(Settings(bot))
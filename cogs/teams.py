@@ -37,12 +37,12 @@ class Teams(commands.Cog):
         # 이전 팀 저장(이동 후 비는 팀 정리용)
         prev_team_id = None
         try:
-            prev_team_id = db.get_user_team_id(interaction.guild.id, 대상.id)
+            prev_team_id = await db.aio.get_user_team_id(interaction.guild.id, 대상.id)
         except Exception:
             pass
         try:
-            team_id = db.ensure_team_path(interaction.guild.id, 경로)
-            db.set_user_team(interaction.guild.id, 대상.id, team_id)
+            team_id = await db.aio.ensure_team_path(interaction.guild.id, 경로)
+            await db.aio.set_user_team(interaction.guild.id, 대상.id, team_id)
         except ValueError as e:
             await interaction.response.send_message(str(e), ephemeral=True)
             return
@@ -60,7 +60,7 @@ class Teams(commands.Cog):
         except Exception:
             pass
         # DB-based: build from teams table
-        rows = db.list_teams(interaction.guild.id)
+        rows = await db.aio.list_teams(interaction.guild.id)
         if not rows:
             await interaction.followup.send("등록된 팀이 없습니다.", ephemeral=True)
             return
@@ -76,10 +76,10 @@ class Teams(commands.Cog):
                 root_id = tid
                 break
         lines: list[str] = []
-        def dfs(tid: int, name: str, depth: int):
+        async def dfs(tid: int, name: str, depth: int):
             if name != db.TEAM_ROOT_NAME:
-                members = db.list_team_members(interaction.guild.id, tid)
-                total_cnt = db.count_team_subtree_members(interaction.guild.id, tid)
+                members = await db.aio.list_team_members(interaction.guild.id, tid)
+                total_cnt = await db.aio.count_team_subtree_members(interaction.guild.id, tid)
                 children = by_parent.get(tid, [])
                 # skip showing nodes that are completely empty and have no children
                 if total_cnt == 0 and not children:
@@ -99,12 +99,12 @@ class Teams(commands.Cog):
                 else:
                     lines.append(f"{indent}• {name} — 총 {total_cnt}명")
             for child_id, child_name in by_parent.get(tid, []):
-                dfs(child_id, child_name, depth + (0 if name == db.TEAM_ROOT_NAME else 1))
+                await dfs(child_id, child_name, depth + (0 if name == db.TEAM_ROOT_NAME else 1))
         if root_id is not None:
-            dfs(root_id, db.TEAM_ROOT_NAME, 0)
+            await dfs(root_id, db.TEAM_ROOT_NAME, 0)
         else:
             for tid, name in by_parent.get(None, []):
-                dfs(tid, name, 0)
+                await dfs(tid, name, 0)
 
         embed = discord.Embed(title="👥 팀 목록", description="\n".join(lines) if lines else "(표시할 팀이 없습니다)", color=discord.Color.purple())
         await interaction.followup.send(embed=embed)
@@ -126,11 +126,11 @@ class Teams(commands.Cog):
             await interaction.followup.send("팀 경로가 비어 있습니다.", ephemeral=True)
             return
         path_norm = " ".join(tokens)
-        team_id = db.find_team_by_path(interaction.guild.id, path_norm)
+        team_id = await db.aio.find_team_by_path(interaction.guild.id, path_norm)
         if team_id is None:
             await interaction.followup.send("해당 경로의 팀이 존재하지 않습니다.", ephemeral=True)
             return
-        cleared, removed = db.delete_team_path_atomic(interaction.guild.id, path_norm)
+        cleared, removed = await db.aio.delete_team_path_atomic(interaction.guild.id, path_norm)
         extra = f", 팀 노드 {removed}개 삭제" if removed > 0 else ""
         await interaction.followup.send(f"삭제 완료: 소속 해제 {cleared}명 (팀 '{path_norm}' 및 하위){extra}", ephemeral=True)
 
@@ -149,12 +149,12 @@ class Teams(commands.Cog):
         if not is_self and not (perms and (perms.manage_guild or perms.administrator)):
             await interaction.response.send_message("다른 사용자의 팀 나가기는 관리자만 가능합니다.", ephemeral=True)
             return
-        prev_team_id = db.get_user_team_id(interaction.guild.id, member.id)
+        prev_team_id = await db.aio.get_user_team_id(interaction.guild.id, member.id)
         if prev_team_id is None:
             await interaction.response.send_message("이미 팀에 소속되어 있지 않습니다.", ephemeral=True)
             return
         # 팀 소속 해제 (DB)
-        db.clear_user_team(interaction.guild.id, member.id)
+        await db.aio.clear_user_team(interaction.guild.id, member.id)
         # 닉네임 변경 기능 제거됨
         # 빈 팀 정리
         target_note = f" {member.mention}" if not is_self else ""
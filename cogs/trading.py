@@ -31,6 +31,7 @@ SYMBOLS = [
 class Trading(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        self._auction_days: dict[int, str] = {}  # guild -> 개장 일괄 체결을 확인한 날짜 (DB 조회 생략용)
         db.init_db()
         db.ensure_instruments()
         # start background recording after ready
@@ -42,17 +43,22 @@ class Trading(commands.Cog):
         t = now.time()
         return (t >= datetime.strptime("09:00", "%H:%M").time()) and (t < datetime.strptime("21:00", "%H:%M").time())
 
+    async def _price(self, guild_id: int, symbol: str) -> float:
+        # minute snapshot from memory; the database only on a miss
+        px = db.peek_symbol_price(guild_id, symbol)
+        return px if px is not None else await db.aio.get_symbol_price(guild_id, symbol)
+
     async def _quote_embed(self, guild_id: int) -> discord.Embed:
         date = datetime.now(KST).strftime("%Y-%m-%d")
         # Ensure today's indices exist so 시세가 "없음"으로 뜨지 않도록 초기화
         try:
-            db.ensure_indices_for_day(guild_id, date)
+            await db.aio.ensure_indices_for_day(guild_id, date)
         except Exception:
             pass
         rows = []
         for sym, name in SYMBOLS:
             try:
-                px = db.get_symbol_price(guild_id, sym)
+                px = await self._price(guild_id, sym)
             except Exception:
                 px = None
             rows.append((sym, name, px))
@@ -67,14 +73,16 @@ class Trading(commands.Cog):
         return embed
 
     def _aggregate_candles(self, rows, timeframe: str, count: int):
-        # rows: list[(ts, price)] UTC ts; align on KST boundaries
+        # rows: list[(ts, price)] or list[(ts, open, high, low, close)] UTC ts; align on KST boundaries
         from datetime import datetime, timedelta
         from zoneinfo import ZoneInfo
         KST = ZoneInfo("Asia/Seoul")
         tf = timeframe
         buckets = {}
         order = []
-        for ts, px in rows:
+        for row in rows:
+            ts = row[0]
+            ohlc = tuple(row[1:5]) if len(row) >= 5 else (row[1],) * 4
             dt = datetime.fromtimestamp(ts, KST)
             if tf == '분':
                 key = dt.replace(second=0, microsecond=0)
@@ -88,17 +96,16 @@ class Trading(commands.Cog):
             if key not in buckets:
                 buckets[key] = []
                 order.append(key)
-            buckets[key].append((ts, px))
+            buckets[key].append((ts, ohlc))
         # Build candles in order
         candles = []
         for key in order:
             arr = buckets[key]
             arr.sort(key=lambda x: x[0])
-            prices = [p for _, p in arr]
-            o = prices[0]
-            h = max(prices)
-            l = min(prices)
-            c = prices[-1]
+            o = arr[0][1][0]
+            h = max(x[1][1] for x in arr)
+            l = min(x[1][2] for x in arr)
+            c = arr[-1][1][3]
             candles.append((key, o, h, l, c))
         # limit to most recent 'count'
         return candles[-count:]
@@ -151,7 +158,7 @@ class Trading(commands.Cog):
         if not interaction.guild:
             await interaction.response.send_message("서버에서만 사용 가능합니다.", ephemeral=True)
             return
-        pos = db.list_instrument_holdings(interaction.user.id)
+        pos = await db.aio.list_instrument_holdings(interaction.user.id)
         if not pos:
             await interaction.response.send_message("보유 종목이 없습니다.", ephemeral=True)
             return
@@ -159,7 +166,7 @@ class Trading(commands.Cog):
         total = 0
         for sym, qty in pos:
             try:
-                px = db.get_symbol_price(interaction.guild.id, sym)
+                px = await self._price(interaction.guild.id, sym)
             except Exception:
                 px = 0.0
             val = int(round(px * qty))
@@ -186,14 +193,14 @@ class Trading(commands.Cog):
         # 마감 시에는 자동으로 개장시 시장가 예약주문 생성
         if not self._is_market_open():
             try:
-                oid = db.create_order_market_open(interaction.guild.id, interaction.user.id, 종목, 'BUY', 수량)
+                oid = await db.aio.create_order_market_open(interaction.guild.id, interaction.user.id, 종목, 'BUY', 수량)
             except ValueError as e:
                 await interaction.response.send_message(str(e), ephemeral=True)
                 return
             await interaction.response.send_message(f"시장 마감 중입니다. 개장 시 시장가 매수 예약이 접수되었습니다. (주문번호 {oid})", ephemeral=True)
             return
         try:
-            new_qty, price, notional, new_bal = db.trade_buy(interaction.guild.id, interaction.user.id, 종목, 수량)
+            new_qty, price, notional, new_bal = await db.aio.trade_buy(interaction.guild.id, interaction.user.id, 종목, 수량)
         except ValueError as e:
             await interaction.response.send_message(str(e), ephemeral=True)
             return
@@ -217,14 +224,14 @@ class Trading(commands.Cog):
             return
         if not self._is_market_open():
             try:
-                oid = db.create_order_market_open(interaction.guild.id, interaction.user.id, 종목, 'SELL', 수량)
+                oid = await db.aio.create_order_market_open(interaction.guild.id, interaction.user.id, 종목, 'SELL', 수량)
             except ValueError as e:
                 await interaction.response.send_message(str(e), ephemeral=True)
                 return
             await interaction.response.send_message(f"시장 마감 중입니다. 개장 시 시장가 매도 예약이 접수되었습니다. (주문번호 {oid})", ephemeral=True)
             return
         try:
-            new_qty, price, proceeds, new_bal = db.trade_sell(interaction.guild.id, interaction.user.id, 종목, 수량)
+            new_qty, price, proceeds, new_bal = await db.aio.trade_sell(interaction.guild.id, interaction.user.id, 종목, 수량)
         except ValueError as e:
             await interaction.response.send_message(str(e), ephemeral=True)
             return
@@ -248,7 +255,7 @@ class Trading(commands.Cog):
             await interaction.response.send_message("서버에서만 사용 가능합니다.", ephemeral=True)
             return
         try:
-            oid = db.create_order_limit(interaction.guild.id, interaction.user.id, 종목, 'BUY', 수량, 지정가)
+            oid = await db.aio.create_order_limit(interaction.guild.id, interaction.user.id, 종목, 'BUY', 수량, 지정가)
         except ValueError as e:
             await interaction.response.send_message(str(e), ephemeral=True)
             return
@@ -265,7 +272,7 @@ class Trading(commands.Cog):
             await interaction.response.send_message("서버에서만 사용 가능합니다.", ephemeral=True)
             return
         try:
-            oid = db.create_order_limit(interaction.guild.id, interaction.user.id, 종목, 'SELL', 수량, 지정가)
+            oid = await db.aio.create_order_limit(interaction.guild.id, interaction.user.id, 종목, 'SELL', 수량, 지정가)
         except ValueError as e:
             await interaction.response.send_message(str(e), ephemeral=True)
             return
@@ -280,7 +287,7 @@ class Trading(commands.Cog):
         if not interaction.guild:
             await interaction.response.send_message("서버에서만 사용 가능합니다.", ephemeral=True)
             return
-        rows = db.list_user_orders(interaction.guild.id, interaction.user.id, status='OPEN')
+        rows = await db.aio.list_user_orders(interaction.guild.id, interaction.user.id, status='OPEN')
         if not rows:
             await interaction.response.send_message("열려있는 예약 주문이 없습니다.", ephemeral=True)
             return
@@ -317,7 +324,9 @@ class Trading(commands.Cog):
                 "IDX_REACT": "ETF_REACT",
             }
             종목 = mapping.get(종목.upper(), 종목)
-        rows = db.get_etf_ticks_since(interaction.guild.id, 종목, since)
+        # 분봉은 원본 틱, 시간봉은 시간 롤업, 일/주봉은 일 롤업에서 읽습니다(미집계 구간은 원본 틱으로 보충).
+        tf = {"분": "minute", "시간": "hour", "일": "day", "주": "day"}[단위]
+        rows = await db.aio.get_etf_candles(interaction.guild.id, 종목, tf, since)
         if not rows:
             await interaction.followup.send("차트 데이터가 부족합니다.", ephemeral=True)
             return
@@ -348,7 +357,7 @@ class Trading(commands.Cog):
         if not interaction.guild:
             await interaction.response.send_message("서버에서만 사용 가능합니다.", ephemeral=True)
             return
-        ok = db.cancel_order(interaction.guild.id, interaction.user.id, 주문번호)
+        ok = await db.aio.cancel_order(interaction.guild.id, interaction.user.id, 주문번호)
         if not ok:
             await interaction.response.send_message("취소할 수 없는 주문입니다.", ephemeral=True)
             return
@@ -360,50 +369,76 @@ class Trading(commands.Cog):
         if not self._is_market_open():
             return
         ts = int(time.time())
+        now = datetime.now(KST)
+        today = now.strftime("%Y-%m-%d")
         for guild in list(self.bot.guilds):
+            # 그날 장이 열린 뒤 첫 틱에서 개장 일괄 체결; 실행한 날짜는 DB에 남아 재시작해도 다시 돌지 않음
+            if self._auction_days.get(guild.id) != today:
+                if await self._run_opening_auction(guild.id, ts, today):
+                    self._auction_days[guild.id] = today
             for sym, _ in SYMBOLS:
                 try:
-                    px = db.get_symbol_price(guild.id, sym)
+                    px = await self._price(guild.id, sym)
                 except Exception:
                     continue
-                prev = db.get_last_etf_price(guild.id, sym) or px
+                prev = await db.aio.get_last_etf_price(guild.id, sym) or px
                 delta = px - prev
                 try:
-                    db.record_etf_tick(guild.id, ts, sym, px, delta)
+                    await db.aio.record_etf_tick(guild.id, ts, sym, px, delta)
                 except Exception:
                     pass
             # 주문 처리
             await self._process_orders_for_guild(guild.id, ts)
 
     async def _process_orders_for_guild(self, guild_id: int, ts: int):
-        rows = db.list_open_orders_for_guild(guild_id)
-        for (oid, user_id, symbol, side, qty, otype, lpx) in rows:
+        prices = {}
+        for sym, _ in SYMBOLS:
             try:
-                px = db.get_symbol_price(guild_id, symbol)
+                prices[sym] = await self._price(guild_id, sym)
             except Exception:
                 continue
-            try_exec = False
-            if otype == 'MARKET_OPEN':
-                try_exec = True
-            elif otype == 'LIMIT':
-                if side == 'BUY' and px <= float(lpx):
-                    try_exec = True
-                if side == 'SELL' and px >= float(lpx):
-                    try_exec = True
-            if not try_exec:
-                continue
-            # Attempt execution
+        # 가격이 지정가를 넘은 주문만 호가창에서 꺼냄
+        rows = await db.aio.take_crossing_orders(guild_id, prices)
+        if rows:
+            # 체결된 주문은 한 트랜잭션으로 기록, 자금/보유량 부족 등으로 미체결된 주문은 보류 유지
             try:
-                if side == 'BUY':
-                    new_qty, price, notional, new_bal = db.trade_buy(guild_id, user_id, symbol, qty)
-                    exec_price = price
-                else:
-                    rem_qty, price, proceeds, new_bal = db.trade_sell(guild_id, user_id, symbol, qty)
-                    exec_price = price
-                db.mark_order_filled(oid, ts, exec_price)
-            except ValueError:
-                # 조건 충족했지만 자금/보유량 부족 등으로 미체결 -> 보류 유지
+                await db.aio.fill_orders(guild_id, rows, ts)
+            except Exception as e:
+                # 주문은 호가창에 되돌려졌으므로 다음 틱에 다시 시도; 루프는 멈추지 않음
+                print(f"[trading] order fill error (guild {guild_id}): {e}")
+
+    async def _run_opening_auction(self, guild_id: int, ts: int, date: str) -> bool:
+        # 장 마감 중 쌓인 개장 시장가 주문과 가격이 넘은 지정가 주문을 개장 가격으로 한 번에 체결
+        # 오늘 이미 실행했거나 방금 실행했으면 True, 실패하면 False (다음 틱에 재시도)
+        prices = {}
+        for sym, _ in SYMBOLS:
+            try:
+                prices[sym] = await self._price(guild_id, sym)
+            except Exception:
                 continue
+        try:
+            results = await db.aio.run_opening_auction(guild_id, prices, ts, date)
+        except Exception as e:
+            print(f"[trading] opening batch error (guild {guild_id}): {e}")
+            return False
+        if not results:
+            return True
+        guild = self.bot.get_guild(guild_id)
+        for (oid, user_id, symbol, side, qty, otype, lpx), price, res in results:
+            if isinstance(res, ValueError):
+                if otype != 'MARKET_OPEN':
+                    continue  # 지정가 주문은 조용히 보류 유지
+                msg = f"개장 일괄 체결 실패: 주문 #{oid} {symbol} {'매수' if side == 'BUY' else '매도'} {qty}주\n사유: {res}\n주문은 보류되어 다음 틱에 다시 시도합니다."
+            else:
+                _qty, _px, amount, new_bal = res
+                msg = f"개장 일괄 체결: 주문 #{oid} {symbol} {'매수' if side == 'BUY' else '매도'} {qty}주 @ {price:.2f}원 (금액 {amount:,}원, 잔액 {new_bal:,}원)"
+            member = guild.get_member(user_id) if guild else None
+            if member:
+                try:
+                    await member.send(msg)
+                except Exception:
+                    pass
+        return True
 
     @etf_minute_tick.before_loop
     async def before_etf_minute_tick(self):
@@ -6,14 +6,31 @@ and keep using the same function names.
 """
 
 from .core import *  # noqa: F401,F403
+from .shards import *  # noqa: F401,F403
+from .leaderboard import *  # noqa: F401,F403
 from .economy import *  # noqa: F401,F403
 from .inventory import *  # noqa: F401,F403
 from .auctions import *  # noqa: F401,F403
+from .activity_window import *  # noqa: F401,F403
 from .activity import *  # noqa: F401,F403
+from .index_engine import *  # noqa: F401,F403
+from .patent_cache import *  # noqa: F401,F403
 from .patents import *  # noqa: F401,F403
+from .royalties import *  # noqa: F401,F403
+from .price_cache import *  # noqa: F401,F403
 from .trading import *  # noqa: F401,F403
 from .attendance import *  # noqa: F401,F403
 from .auto_transfer import *  # noqa: F401,F403
+from .orders import *  # noqa: F401,F403
+from .guild_settings import *  # noqa: F401,F403
 from .announcements import *  # noqa: F401,F403
 from .teams import *  # noqa: F401,F403
+from .writebehind import *  # noqa: F401,F403
+from .rollups import *  # noqa: F401,F403
+from .profiling import *  # noqa: F401,F403
 
+from . import aio  # noqa: F401  (await db.aio.<fn>(...) from the event loop)
+
+import os as _os
+if _os.environ.get("DB_PROFILE") == "1":
+    enable_profiling()  # noqa: F405
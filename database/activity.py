@@ -1,4 +1,12 @@
+import json
+import threading
+
+from . import core
+from .activity_window import activity_windows
 from .core import get_conn, KST
+from .index_engine import CATEGORIES, REL_GAP, REL_WIN, score_minute
+from .price_cache import drop_prices, publish_prices
+from .writebehind import enqueue_write, flush_if_pending
 import time as _time
 from datetime import datetime
 
@@ -8,40 +16,84 @@ def _today_kst(ts: int | None = None) -> str:
     return dt.strftime("%Y-%m-%d")
 
 
-def ensure_indices_for_day(guild_id: int, date_kst: str | None = None) -> None:
+def _by_file(guild_ids) -> dict[int | None, list[int]]:
+    """Group guild ids by the file that holds them (one group when unsharded)."""
+    groups: dict[int | None, list[int]] = {}
+    for gid in guild_ids:
+        groups.setdefault(int(gid) if core.SHARDING else None, []).append(int(gid))
+    return groups
+
+
+_OPEN_DAYS_SQL = """
+    INSERT OR IGNORE INTO activity_indices(guild_id, date, category, open_idx, current_idx, lower_bound, upper_bound, opened_at, high_idx, low_idx)
+    SELECT g, ?, c, p, p, p * 0.5, p * 2.0, ?, p, p FROM (
+        SELECT CAST(j.value AS INTEGER) AS g, k.value AS c,
+               COALESCE((SELECT current_idx FROM activity_indices WHERE guild_id=j.value AND category=k.value ORDER BY date DESC LIMIT 1), 100.0) AS p
+        FROM json_each(?) j, json_each(?) k
+        WHERE NOT EXISTS (SELECT 1 FROM activity_indices WHERE guild_id=j.value AND date=? AND category=k.value)
+    )
+"""
+
+
+# Guilds whose indices for _opened_day are known to exist. Only the newest day
+# is kept, so the set empties itself at the KST day boundary.
+_opened: set[int] = set()
+_opened_day: tuple[str, str] | None = None  # (DB_PATH, date)
+_opened_lock = threading.Lock()
+
+
+def _unopened(guild_ids, date_kst: str) -> list[int]:
+    with _opened_lock:
+        if _opened_day != (core.DB_PATH, date_kst):
+            return [int(g) for g in guild_ids]
+        return [int(g) for g in guild_ids if int(g) not in _opened]
+
+
+def _mark_opened(guild_ids, date_kst: str) -> None:
+    global _opened_day
+    with _opened_lock:
+        if _opened_day is None or _opened_day[0] != core.DB_PATH or _opened_day[1] < date_kst:
+            _opened.clear()
+            _opened_day = (core.DB_PATH, date_kst)
+        if _opened_day[1] == date_kst:
+            _opened.update(int(g) for g in guild_ids)
+
+
+def _open_days(conn, guild_ids: list[int], date_kst: str) -> None:
+    conn.execute(_OPEN_DAYS_SQL, (date_kst, int(_time.time()), json.dumps(guild_ids), json.dumps(CATEGORIES), date_kst))
+
+
+def open_index_days(guild_ids, date_kst: str | None = None) -> None:
+    """Open the day's indices (at the previous close) for every guild that lacks them.
+
+    One statement per file; guilds already opened this day in this process are
+    skipped without touching the database. Called at startup to prime the memo.
+    """
     date_kst = date_kst or _today_kst()
-    cats = ("chat", "voice", "react")
-    now = int(_time.time())
-    with get_conn() as conn:
-        for c in cats:
-            cur = conn.execute("SELECT 1 FROM activity_indices WHERE guild_id=? AND date=? AND category=?", (guild_id, date_kst, c))
-            if cur.fetchone():
-                continue
-            # previous close
-            curp = conn.execute("SELECT current_idx FROM activity_indices WHERE guild_id=? AND category=? ORDER BY date DESC LIMIT 1", (guild_id, c))
-            row = curp.fetchone()
-            open_idx = float(row[0]) if row else 100.0
-            lower = open_idx * 0.5
-            upper = open_idx * 2.0
-            conn.execute(
-                """
-                INSERT INTO activity_indices(guild_id, date, category, open_idx, current_idx, lower_bound, upper_bound, opened_at, high_idx, low_idx)
-                VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                (guild_id, date_kst, c, open_idx, open_idx, lower, upper, now, open_idx, open_idx),
-            )
+    todo = _unopened(guild_ids, date_kst)
+    for scope, gids in _by_file(todo).items():
+        with get_conn(scope) as conn:
+            _open_days(conn, gids, date_kst)
+        _mark_opened(gids, date_kst)
+
+
+def ensure_indices_for_day(guild_id: int, date_kst: str | None = None) -> None:
+    open_index_days([guild_id], date_kst)
 
 
 def update_activity_tick(guild_id: int, ts: int, category: str, idx_value: float, delta: float, chat_count: int, react_count: int, voice_count: int, date_kst: str | None = None) -> None:
     date_kst = date_kst or _today_kst(ts)
-    with get_conn() as conn:
-        conn.execute(
-            """
-            INSERT OR REPLACE INTO activity_ticks(guild_id, ts, date, category, idx_value, delta, chat_count, react_count, voice_count)
-            VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (guild_id, ts, date_kst, category, idx_value, delta, chat_count, react_count, voice_count),
-        )
+    # The tick row is an append, group-committed by the write-behind queue;
+    # the index itself is read back for prices, so it commits right away.
+    enqueue_write(
+        """
+        INSERT OR REPLACE INTO activity_ticks(guild_id, ts, date, category, idx_value, delta, chat_count, react_count, voice_count)
+        VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        (guild_id, ts, date_kst, category, idx_value, delta, chat_count, react_count, voice_count),
+        guild_id=guild_id,
+    )
+    with get_conn(guild_id) as conn:
         conn.execute(
             """
             UPDATE activity_indices
@@ -52,10 +104,119 @@ def update_activity_tick(guild_id: int, ts: int, category: str, idx_value: float
             """,
             (idx_value, idx_value, idx_value, idx_value, idx_value, guild_id, date_kst, category),
         )
+    drop_prices(guild_id)
+    windows = activity_windows()
+    if windows is not None:
+        windows.record(guild_id, category, ts, (int(chat_count), int(react_count), int(voice_count)))
+
+
+def get_index_snapshots(guild_ids, date_kst: str) -> dict[tuple[int, str], tuple]:
+    """(guild_id, category) -> get_index_info's tuple, for every initialised index of ``guild_ids``."""
+    flush_if_pending()
+    out: dict[tuple[int, str], tuple] = {}
+    for scope, gids in _by_file(guild_ids).items():
+        with get_conn(scope) as conn:
+            out.update(_read_snapshots(conn, gids, date_kst))
+    return out
+
+
+def _read_snapshots(conn, guild_ids: list[int], date_kst: str) -> dict[tuple[int, str], tuple]:
+    rows = conn.execute(
+        """
+        SELECT a.guild_id, a.category, a.current_idx, a.lower_bound, a.upper_bound, a.high_idx, a.low_idx, a.open_idx
+        FROM json_each(?) j JOIN activity_indices a ON a.guild_id = j.value AND a.date = ?
+        """,
+        (json.dumps(guild_ids), date_kst),
+    ).fetchall()
+    return {
+        (int(gid), cat): (
+            float(current), float(lower), float(upper),
+            (float(high) if high is not None else None), (float(low) if low is not None else None), float(open_idx),
+        )
+        for gid, cat, current, lower, upper, high, low, open_idx in rows
+    }
+
+
+def apply_minute_batch(ts: int, rows, date_kst: str | None = None) -> list[tuple]:
+    """Score, record and close one index minute for many guilds.
+
+    ``rows`` are (guild_id, chat_count, react_count, voice_count, avg_gap).
+    Opening today's indices where missing, reading the snapshot, inserting the
+    ticks and updating the indices share one ``BEGIN IMMEDIATE`` (one per file
+    when sharding). Returns (guild_id, category, previous, new_value,
+    previous_high, open_idx) per guild and category for the alert checks.
+    """
+    date_kst = date_kst or _today_kst(ts)
+    counters = {int(r[0]): (int(r[1]), int(r[2]), int(r[3]), float(r[4])) for r in rows}
+    if not counters:
+        return []
+    flush_if_pending()
+    # windows first: a ring miss falls back to SQL, which must not run inside our write lock
+    windows = {
+        g: ([get_activity_totals(g, cat, ts - REL_WIN, ts) for cat in CATEGORIES],
+            [get_activity_totals(g, cat, ts - REL_GAP - REL_WIN, ts - REL_GAP) for cat in CATEGORIES])
+        for g in counters
+    }
+    todo = set(_unopened(counters, date_kst))
+    results: list[tuple] = []
+    ticks: list[tuple] = []
+    for scope, gids in _by_file(counters).items():
+        with get_conn(scope) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            closed = [g for g in gids if g in todo]
+            if closed:
+                _open_days(conn, closed, date_kst)
+            snaps = _read_snapshots(conn, gids, date_kst)
+            new_vals = score_minute(
+                [counters[g][:3] for g in gids],
+                [counters[g][3] for g in gids],
+                [windows[g][0] for g in gids],
+                [windows[g][1] for g in gids],
+                [[snaps[(g, cat)][0] for cat in CATEGORIES] for g in gids],
+                [[snaps[(g, cat)][1] for cat in CATEGORIES] for g in gids],
+                [[snaps[(g, cat)][2] for cat in CATEGORIES] for g in gids],
+            )
+            part = []
+            for g, vals in zip(gids, new_vals):
+                c, r, vc = counters[g][:3]
+                for cat, v in zip(CATEGORIES, vals):
+                    current, _, _, high, _, open_idx = snaps[(g, cat)]
+                    part.append((g, cat, v, v - current, c, r, vc))
+                    results.append((g, cat, current, v, high, open_idx))
+            conn.executemany(
+                """
+                INSERT OR REPLACE INTO activity_ticks(guild_id, ts, date, category, idx_value, delta, chat_count, react_count, voice_count)
+                VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                [(g, ts, date_kst, cat, v, d, c, r, vc) for g, cat, v, d, c, r, vc in part],
+            )
+            conn.executemany(
+                """
+                UPDATE activity_indices
+                SET current_idx=?,
+                    high_idx=CASE WHEN high_idx IS NULL OR ? > high_idx THEN ? ELSE high_idx END,
+                    low_idx=CASE WHEN low_idx IS NULL OR ? < low_idx THEN ? ELSE low_idx END
+                WHERE guild_id=? AND date=? AND category=?
+                """,
+                [(v, v, v, v, v, g, date_kst, cat) for g, cat, v, *_ in part],
+            )
+        _mark_opened(gids, date_kst)
+        currents: dict[int, dict[str, float]] = {}
+        for g, cat, v, *_ in part:
+            currents.setdefault(g, {})[cat] = v
+        for g, by_cat in currents.items():
+            publish_prices(g, date_kst, ts, by_cat)
+        ticks.extend(part)
+    ring = activity_windows()
+    if ring is not None:
+        for g, cat, _, _, c, r, vc in ticks:
+            ring.record(g, cat, ts, (c, r, vc))
+    return results
 
 
 def get_index_bounds(guild_id: int, date_kst: str, category: str) -> tuple[float, float, float]:
-    with get_conn() as conn:
+    flush_if_pending()
+    with get_conn(guild_id) as conn:
         cur = conn.execute("SELECT open_idx, lower_bound, upper_bound, current_idx FROM activity_indices WHERE guild_id=? AND date=? AND category=?", (guild_id, date_kst, category))
         row = cur.fetchone()
         if not row:
@@ -65,7 +226,8 @@ def get_index_bounds(guild_id: int, date_kst: str, category: str) -> tuple[float
 
 
 def get_index_info(guild_id: int, date_kst: str, category: str):
-    with get_conn() as conn:
+    flush_if_pending()
+    with get_conn(guild_id) as conn:
         cur = conn.execute("SELECT current_idx, lower_bound, upper_bound, high_idx, low_idx, open_idx FROM activity_indices WHERE guild_id=? AND date=? AND category=?", (guild_id, date_kst, category))
         row = cur.fetchone()
         if not row:
@@ -75,13 +237,15 @@ def get_index_info(guild_id: int, date_kst: str, category: str):
 
 
 def get_etf_ticks_since(guild_id: int, symbol: str, since_ts: int):
-    with get_conn() as conn:
+    flush_if_pending()
+    with get_conn(guild_id) as conn:
         cur = conn.execute("SELECT ts, price FROM etf_ticks WHERE guild_id=? AND symbol=? AND ts>=? ORDER BY ts ASC", (guild_id, symbol, since_ts))
         return [(int(ts), float(px)) for (ts, px) in cur.fetchall()]
 
 
 def get_index_ticks_since(guild_id: int, category: str, since_ts: int):
-    with get_conn() as conn:
+    flush_if_pending()
+    with get_conn(guild_id) as conn:
         cur = conn.execute(
             "SELECT ts, idx_value FROM activity_ticks WHERE guild_id=? AND category=? AND ts>=? ORDER BY ts ASC",
             (guild_id, category, since_ts),
@@ -90,7 +254,13 @@ def get_index_ticks_since(guild_id: int, category: str, since_ts: int):
 
 
 def get_activity_totals(guild_id: int, category: str, start_ts: int, end_ts: int) -> tuple[int, int, int]:
-    with get_conn() as conn:
+    windows = activity_windows()
+    if windows is not None:
+        found = windows.totals(guild_id, category, start_ts, end_ts)
+        if found is not None:
+            return found
+    flush_if_pending()
+    with get_conn(guild_id) as conn:
         cur = conn.execute(
             """
             SELECT COALESCE(SUM(chat_count),0), COALESCE(SUM(react_count),0), COALESCE(SUM(voice_count),0)
@@ -102,5 +272,6 @@ def get_activity_totals(guild_id: int, category: str, start_ts: int, end_ts: int
         return int(row[0]), int(row[1]), int(row[2])
 
 __all__ = [
-    'ensure_indices_for_day','update_activity_tick','get_index_bounds','get_index_info','get_etf_ticks_since','get_index_ticks_since','get_activity_totals'
+    'open_index_days','ensure_indices_for_day','update_activity_tick','get_index_bounds','get_index_info','get_etf_ticks_since','get_index_ticks_since','get_activity_totals',
+    'get_index_snapshots','apply_minute_batch'
 ]
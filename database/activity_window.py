@@ -0,0 +1,132 @@
+"""In-memory rolling windows over the per-minute activity counts.
+
+The index loop asks every minute, per guild and category, for the chat,
+reaction and voice totals of the last five minutes and of the same five
+minutes an hour ago. Answering that with a ``SUM`` over ``activity_ticks``
+was six range aggregates per guild per minute. This keeps a ring of
+``RING_MINUTES`` one-minute slots per guild and category instead; a window
+touches at most one slot per minute it spans, so both lookups are O(1).
+
+A guild's ring is warmed with one read of its recent ticks (at startup via
+``warm_activity_windows`` or lazily on first use) and then fed by
+``update_activity_tick`` as it queues the normal tick write. Ranges older
+than the ring, or guilds written by another process, fall back to SQL.
+``DB_ACTIVITY_WINDOW=0`` turns the rings off.
+"""
+
+import os
+import threading
+import time as _time
+
+from . import core
+from .core import get_conn
+from .writebehind import flush_if_pending
+
+ENABLED = os.environ.get("DB_ACTIVITY_WINDOW", "1") == "1"
+RING_MINUTES = 70  # the relative boost reaches back 65 minutes
+
+
+class _GuildWindow:
+    """Per-category rings of (minute, [(ts, chat, react, voice), ...]) for one guild."""
+
+    def __init__(self, since: int):
+        self.since = since  # ticks at or after this ts are all in the rings
+        self.rings: dict[str, list] = {}
+
+    def add(self, category: str, ts: int, counts: tuple[int, int, int]) -> None:
+        ring = self.rings.get(category)
+        if ring is None:
+            ring = self.rings[category] = [None] * RING_MINUTES
+        minute = ts // 60
+        i = minute % RING_MINUTES
+        slot = ring[i]
+        if slot is None or slot[0] != minute:
+            slot = ring[i] = (minute, [])
+        ticks = slot[1]
+        for j, (t, *_) in enumerate(ticks):
+            if t == ts:  # INSERT OR REPLACE on the same tick
+                ticks[j] = (ts, *counts)
+                return
+        ticks.append((ts, *counts))
+
+    def totals(self, category: str, start_ts: int, end_ts: int, now_minute: int) -> tuple[int, int, int] | None:
+        first, last = start_ts // 60, end_ts // 60
+        if start_ts < self.since or first <= now_minute - RING_MINUTES or last - first >= RING_MINUTES:
+            return None
+        ring = self.rings.get(category)
+        c = r = v = 0
+        if ring is None:
+            return c, r, v
+        for minute in range(first, last + 1):
+            slot = ring[minute % RING_MINUTES]
+            if slot is None or slot[0] != minute:
+                continue
+            for ts, dc, dr, dv in slot[1]:
+                if start_ts <= ts <= end_ts:
+                    c += dc
+                    r += dr
+                    v += dv
+        return c, r, v
+
+
+class ActivityWindows:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded_for: str | None = None
+        self._guilds: dict[int, _GuildWindow] = {}
+
+    def _check_path(self) -> None:
+        if self._loaded_for != core.DB_PATH:
+            self._guilds = {}
+            self._loaded_for = core.DB_PATH
+
+    def warm(self, guild_id: int) -> _GuildWindow:
+        """(Re)load one guild's rings from its recent ticks."""
+        flush_if_pending()
+        since = int(_time.time()) - RING_MINUTES * 60
+        with get_conn(guild_id) as conn:
+            rows = conn.execute(
+                "SELECT category, ts, chat_count, react_count, voice_count FROM activity_ticks WHERE guild_id=? AND ts >= ?",
+                (guild_id, since),
+            ).fetchall()
+        gw = _GuildWindow(since)
+        for cat, ts, c, r, v in rows:
+            gw.add(cat, int(ts), (int(c), int(r), int(v)))
+        with self._lock:
+            self._check_path()
+            self._guilds[int(guild_id)] = gw
+        return gw
+
+    def record(self, guild_id: int, category: str, ts: int, counts: tuple[int, int, int]) -> None:
+        with self._lock:
+            self._check_path()
+            gw = self._guilds.get(int(guild_id))
+            if gw is not None:  # a cold guild reads the row back when it warms
+                gw.add(category, int(ts), counts)
+
+    def totals(self, guild_id: int, category: str, start_ts: int, end_ts: int) -> tuple[int, int, int] | None:
+        with self._lock:
+            self._check_path()
+            gw = self._guilds.get(int(guild_id))
+        if gw is None:
+            gw = self.warm(guild_id)
+        with self._lock:
+            return gw.totals(category, int(start_ts), int(end_ts), int(_time.time()) // 60)
+
+
+_windows = ActivityWindows()
+
+
+def activity_windows() -> ActivityWindows | None:
+    """The rings, or None when ``DB_ACTIVITY_WINDOW=0``."""
+    return _windows if ENABLED else None
+
+
+def warm_activity_windows(guild_ids) -> None:
+    """Load the recent ticks of ``guild_ids`` (bot startup, or after another process wrote ticks)."""
+    if ENABLED:
+        for gid in guild_ids:
+            _windows.warm(int(gid))
+
+
+__all__ = ['warm_activity_windows']
@@ -0,0 +1,168 @@
+"""Awaitable facade over the synchronous database functions.
+
+``await db.aio.transfer(a, b, 100)`` runs ``db.transfer`` off the event loop:
+writes go to a single dedicated writer thread (SQLite has one writer anyway,
+so queueing them avoids busy-lock retries), reads go to a small reader pool.
+With sharding each file has its own writer lock, so writes that take a
+``guild_id`` go to one of ``SHARD_WRITER_THREADS`` writers picked by guild
+and only core-file writes share the original writer.
+Every call records its queue wait and execution time; see ``get_stats()``.
+"""
+
+import asyncio
+import functools
+import inspect
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import core
+
+READER_THREADS = int(os.environ.get("DB_READER_THREADS", "4"))
+SHARD_WRITER_THREADS = int(os.environ.get("DB_SHARD_WRITERS", "4"))
+
+# Functions that never write. Anything not listed here runs on the writer thread
+# (including getters such as get_balance/get_symbol_price that may lazily insert).
+READ_ONLY = frozenset({
+    'get_index_bounds', 'get_index_info', 'get_etf_ticks_since', 'get_index_ticks_since', 'get_activity_totals',
+    'warm_activity_windows', 'get_index_snapshots',
+    'get_last_etf_price', 'get_etf_candles', 'top_balances', 'count_users', 'rank_page',
+    'rank_page_after', 'rank_page_before',
+    'list_inventory', 'list_items_for_users',
+    'get_auction', 'list_open_auctions', 'count_open_auctions', 'list_due_unsold_auctions', 'get_auction_guild',
+    'is_patent_participant', 'list_patents', 'find_patent_hits', 'scan_patent_message', 'get_recent_patent_logs', 'get_user_patent_logs',
+    'list_expired_unauctioned_patents', 'get_patent_price',
+    'attendance_today', 'attendance_max_streak_leaderboard', 'attendance_yesterday_not_today',
+    'list_user_auto_transfers', 'list_due_auto_transfers',
+    'list_user_orders', 'list_instrument_holdings', 'reload_rank_index', 'reload_patent_cache',
+    'get_main_chat_channel', 'get_announce_channel', 'get_notify_channel', 'get_index_alerts_enabled',
+    'list_announcements', 'has_announcements', 'next_announcement', 'get_guild_settings',
+    'list_teams', 'list_team_members', 'count_team_members', 'count_team_subtree_members',
+    'get_user_team_id', 'get_team_path_names', 'get_rank_roles', 'find_team_by_path', 'get_descendant_team_ids',
+})
+
+_writer: ThreadPoolExecutor | None = None
+_readers: ThreadPoolExecutor | None = None
+_shard_writers: dict[int, ThreadPoolExecutor] = {}
+_executor_lock = threading.Lock()
+_guild_arg_pos: dict[str, int] = {}
+
+_stats: dict[str, dict] = {}
+_stats_lock = threading.Lock()
+_wrappers: dict[str, object] = {}
+
+
+def _guild_arg(name: str, fn, args, kwargs) -> int | None:
+    pos = _guild_arg_pos.get(name)
+    if pos is None:
+        try:
+            params = list(inspect.signature(fn).parameters)
+        except (TypeError, ValueError):
+            params = []
+        pos = _guild_arg_pos[name] = params.index('guild_id') if 'guild_id' in params else -1
+    if pos < 0:
+        return None
+    if 'guild_id' in kwargs:
+        return kwargs['guild_id']
+    return args[pos] if pos < len(args) else None
+
+
+def _executor(name: str, guild_id: int | None = None) -> ThreadPoolExecutor:
+    global _writer, _readers
+    with _executor_lock:
+        if name in READ_ONLY:
+            if _readers is None:
+                _readers = ThreadPoolExecutor(max_workers=READER_THREADS, thread_name_prefix="db-reader")
+            return _readers
+        if guild_id is not None:
+            slot = int(guild_id) % max(1, SHARD_WRITER_THREADS)
+            ex = _shard_writers.get(slot)
+            if ex is None:
+                ex = _shard_writers[slot] = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"db-writer-{slot}")
+            return ex
+        if _writer is None:
+            _writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+        return _writer
+
+
+def _record(name: str, wait: float, run: float) -> None:
+    with _stats_lock:
+        s = _stats.get(name)
+        if s is None:
+            s = _stats[name] = {'calls': 0, 'wait_total': 0.0, 'wait_max': 0.0, 'run_total': 0.0, 'run_max': 0.0}
+        s['calls'] += 1
+        s['wait_total'] += wait
+        s['run_total'] += run
+        if wait > s['wait_max']:
+            s['wait_max'] = wait
+        if run > s['run_max']:
+            s['run_max'] = run
+
+
+def _timed(name: str, fn, submitted: float, args, kwargs):
+    started = time.perf_counter()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        _record(name, started - submitted, time.perf_counter() - started)
+
+
+def _resolve(name: str):
+    # Look the function up on the package each call so instrumentation or
+    # monkeypatching applied to `database.<name>` is honoured.
+    fn = getattr(sys.modules[__package__], name, None)
+    if not callable(fn):
+        raise AttributeError(f"database has no function {name!r}")
+    return fn
+
+
+def __getattr__(name: str):
+    if name.startswith('__'):
+        raise AttributeError(name)
+    wrapper = _wrappers.get(name)
+    if wrapper is not None:
+        return wrapper
+    _resolve(name)  # fail fast on typos
+
+    async def call(*args, **kwargs):
+        fn = _resolve(name)
+        loop = asyncio.get_running_loop()
+        gid = _guild_arg(name, fn, args, kwargs) if core.SHARDING else None
+        submitted = time.perf_counter()
+        return await loop.run_in_executor(_executor(name, gid), functools.partial(_timed, name, fn, submitted, args, kwargs))
+
+    call.__name__ = call.__qualname__ = name
+    _wrappers[name] = call
+    return call
+
+
+def get_stats() -> dict[str, dict]:
+    """Per-function counters: calls, queue wait and execution time (seconds, total/max/avg)."""
+    with _stats_lock:
+        out = {}
+        for name, s in _stats.items():
+            n = s['calls'] or 1
+            out[name] = dict(s, wait_avg=s['wait_total'] / n, run_avg=s['run_total'] / n)
+        return out
+
+
+def reset_stats() -> None:
+    with _stats_lock:
+        _stats.clear()
+
+
+def shutdown(wait: bool = True) -> None:
+    """Drain queued calls and stop the worker threads."""
+    global _writer, _readers
+    with _executor_lock:
+        executors = [_writer, _readers, *_shard_writers.values()]
+        _writer = _readers = None
+        _shard_writers.clear()
+    for ex in executors:
+        if ex is not None:
+            ex.shutdown(wait=wait)
+
+
+__all__ = ['READ_ONLY', 'get_stats', 'reset_stats', 'shutdown']
@@ -15,7 +15,7 @@ def attendance_check_in(guild_id: int, user_id: int) -> tuple[bool, int, int, in
     today = _today_kst()
     yday = _yesterday_kst()
     now = int(time.time())
-    with get_conn() as conn:
+    with get_conn(guild_id) as conn:
         conn.execute("BEGIN IMMEDIATE")
         cur = conn.execute("SELECT last_date, streak, max_streak, total_days FROM attendance WHERE guild_id=? AND user_id=?", (guild_id, user_id))
         row = cur.fetchone()
@@ -51,7 +51,7 @@ def attendance_check_in(guild_id: int, user_id: int) -> tuple[bool, int, int, in
 
 def attendance_today(guild_id: int):
     today = _today_kst()
-    with get_conn() as conn:
+    with get_conn(guild_id) as conn:
         cur = conn.execute("SELECT user_id, last_date, streak FROM attendance WHERE guild_id=?", (guild_id,))
         checked, not_checked = [], []
         for uid, last_date, streak in cur.fetchall():
@@ -60,16 +60,16 @@ def attendance_today(guild_id: int):
 
 
 def attendance_max_streak_leaderboard(guild_id: int, limit: int = 20):
-    with get_conn() as conn:
+    with get_conn(guild_id) as conn:
         cur = conn.execute("SELECT user_id, max_streak, total_days FROM attendance WHERE guild_id=? ORDER BY max_streak DESC, total_days DESC, user_id ASC LIMIT ?", (guild_id, int(limit)))
         return [(int(uid), int(ms), int(td)) for (uid, ms, td) in cur.fetchall()]
 
-__all__ = ['attendance_check_in','attendance_today','attendance_max_streak_leaderboard']
+__all__ = ['attendance_check_in','attendance_today','attendance_max_streak_leaderboard','attendance_yesterday_not_today']
 
 
 def attendance_yesterday_not_today(guild_id: int):
     """Return user_ids who checked in yesterday but not today (i.e., last_date == yesterday)."""
     yday = _yesterday_kst()
-    with get_conn() as conn:
+    with get_conn(guild_id) as conn:
         cur = conn.execute("SELECT user_id FROM attendance WHERE guild_id=? AND last_date=?", (guild_id, yday))
         return [int(u) for (u,) in cur.fetchall()]
@@ -1,5 +1,7 @@
 from .core import get_conn
-from .economy import DEFAULT_BALANCE, _ensure_user
+from .shards import guild_for_id, guild_scopes, sharding_enabled
+from .economy import DEFAULT_BALANCE, _ensure_user, held_funds
+from .writebehind import enqueue_write
 import time
 
 
@@ -10,9 +12,11 @@ def create_auction(seller_id: int, name: str, emoji: str, qty: int, start_price:
         raise ValueError("Start price must be >= 0")
     if duration_seconds < 3600 or duration_seconds > 30 * 24 * 3600:
         raise ValueError("Duration must be between 1 hour and 30 days")
+    if guild_id is None and sharding_enabled():
+        raise ValueError("Auctions need a guild when sharding is enabled")
     now = int(time.time())
     end_at = now + duration_seconds
-    with get_conn() as conn:
+    with get_conn(guild_id) as conn:
         conn.execute("BEGIN IMMEDIATE")
         # decrement seller inventory
         cur = conn.execute("SELECT id FROM items WHERE name=? AND emoji=?", (name.strip(), emoji.strip()))
@@ -41,17 +45,23 @@ def create_auction(seller_id: int, name: str, emoji: str, qty: int, start_price:
         return int(cur.lastrowid)
 
 
+def _auction_scope(auction_id: int) -> tuple[bool, int | None]:
+    """(found, guild_id) for routing an id-only call; not found when no guild file owns the id."""
+    gid = guild_for_id(auction_id)
+    return (gid is not None or not sharding_enabled()), gid
+
+
 def get_auction(auction_id: int):
-    with get_conn() as conn:
+    found, gid = _auction_scope(auction_id)
+    if not found:
+        return None
+    with get_conn(gid) as conn:
         cur = conn.execute("SELECT * FROM auctions WHERE id=?", (auction_id,))
         return cur.fetchone()
 
 
-def list_open_auctions(offset: int, limit: int, query: str | None = None, guild_id: int | None = None):
-    limit = max(1, min(int(limit), 50))
-    offset = max(0, int(offset))
-    now = int(time.time())
-    with get_conn() as conn:
+def _open_auctions(guild_id: int | None, offset: int, limit: int, query: str | None, now: int):
+    with get_conn(guild_id) as conn:
         base = "SELECT id, seller_id, name, emoji, qty, start_price, current_bid, current_bidder_id, end_at FROM auctions WHERE status='open' AND end_at > ?"
         args = [now]
         if guild_id is not None:
@@ -67,9 +77,8 @@ def list_open_auctions(offset: int, limit: int, query: str | None = None, guild_
         return cur.fetchall()
 
 
-def count_open_auctions(query: str | None = None, guild_id: int | None = None) -> int:
-    now = int(time.time())
-    with get_conn() as conn:
+def _count_open(guild_id: int | None, query: str | None, now: int) -> int:
+    with get_conn(guild_id) as conn:
         base = "SELECT COUNT(*) FROM auctions WHERE status='open' AND end_at > ?"
         args = [now]
         if guild_id is not None:
@@ -83,11 +92,35 @@ def count_open_auctions(query: str | None = None, guild_id: int | None = None) -
         return int(cur.fetchone()[0])
 
 
+def list_open_auctions(offset: int, limit: int, query: str | None = None, guild_id: int | None = None):
+    limit = max(1, min(int(limit), 50))
+    offset = max(0, int(offset))
+    now = int(time.time())
+    if guild_id is None and sharding_enabled():
+        # each guild file contributes its first offset+limit rows; merge them by end_at
+        rows = []
+        for scope in guild_scopes():
+            rows.extend(_open_auctions(scope, 0, offset + limit, query, now))
+        rows.sort(key=lambda r: r[8])
+        return rows[offset:offset + limit]
+    return _open_auctions(guild_id, offset, limit, query, now)
+
+
+def count_open_auctions(query: str | None = None, guild_id: int | None = None) -> int:
+    now = int(time.time())
+    if guild_id is None and sharding_enabled():
+        return sum(_count_open(scope, query, now) for scope in guild_scopes())
+    return _count_open(guild_id, query, now)
+
+
 def place_bid(auction_id: int, bidder_id: int, amount: int):
     if amount <= 0:
         raise ValueError("Bid must be positive")
+    found, gid = _auction_scope(auction_id)
+    if not found:
+        raise ValueError("Auction not found")
     now = int(time.time())
-    with get_conn() as conn:
+    with get_conn(gid) as conn:
         conn.execute("BEGIN IMMEDIATE")
         cur = conn.execute(
             "SELECT seller_id, start_price, current_bid, current_bidder_id, end_at, status, name, emoji, qty FROM auctions WHERE id=?",
@@ -107,7 +140,7 @@ def place_bid(auction_id: int, bidder_id: int, amount: int):
 
         # deduct bidder funds
         bal = _ensure_user(conn, bidder_id)
-        if bal < amount:
+        if bal - held_funds(bidder_id) < amount:
             raise ValueError("Insufficient funds")
         conn.execute("UPDATE balances SET balance=? WHERE user_id=?", (bal - amount, bidder_id))
         # refund previous top bidder
@@ -122,82 +155,28 @@ def place_bid(auction_id: int, bidder_id: int, amount: int):
             conn.execute("UPDATE balances SET balance=? WHERE user_id=?", (prev_bal + int(current_bid), current_bidder_id))
 
         conn.execute("UPDATE auctions SET current_bid=?, current_bidder_id=? WHERE id=?", (amount, bidder_id, auction_id))
-        conn.execute("INSERT INTO auction_bids(auction_id, bidder_id, amount, created_at) VALUES(?, ?, ?, ?)", (auction_id, bidder_id, amount, now))
-        return amount, bidder_id, (int(prev_id) if prev_id is not None else None), (int(prev_amt) if prev_amt is not None else None)
+    # bid history is append-only: log it only once the bid itself has committed
+    enqueue_write("INSERT INTO auction_bids(auction_id, bidder_id, amount, created_at) VALUES(?, ?, ?, ?)", (auction_id, bidder_id, amount, now), guild_id=gid)
+    return amount, bidder_id, (int(prev_id) if prev_id is not None else None), (int(prev_amt) if prev_amt is not None else None)
 
 
 def finalize_due_auctions(max_to_close: int = 50) -> int:
-    now = int(time.time())
-    closed = 0
-    with get_conn() as conn:
-        cur = conn.execute(
-            "SELECT id, guild_id, seller_id, name, emoji, qty, current_bid, current_bidder_id FROM auctions WHERE status='open' AND end_at <= ? LIMIT ?",
-            (now, max_to_close),
-        )
-        rows = cur.fetchall()
-        for (aid, gid, seller_id, name, emoji, qty, current_bid, current_bidder_id) in rows:
-            conn.execute("SAVEPOINT fin_one")
-            try:
-                cur2 = conn.execute("SELECT status, current_bid, current_bidder_id FROM auctions WHERE id=?", (aid,))
-                row2 = cur2.fetchone()
-                if not row2:
-                    conn.execute("RELEASE fin_one")
-                    continue
-                st, cb, cbid = row2
-                if st != 'open':
-                    conn.execute("RELEASE fin_one")
-                    continue
-                if cbid is None or cb is None:
-                    conn.execute(
-                        """
-                        INSERT INTO inventory(user_id, item_id, qty)
-                        SELECT ?, i.id, ? FROM items i WHERE i.name=? AND i.emoji=?
-                        ON CONFLICT(user_id, item_id) DO UPDATE SET qty=qty+excluded.qty
-                        """,
-                        (seller_id, qty, name, emoji),
-                    )
-                    conn.execute("UPDATE auctions SET status='closed', winner_id=NULL, winning_bid=NULL WHERE id=?", (aid,))
-                    closed += 1
-                    conn.execute("RELEASE fin_one")
-                    continue
-                # winner case
-                conn.execute(
-                    """
-                    INSERT INTO inventory(user_id, item_id, qty)
-                    SELECT ?, i.id, ? FROM items i WHERE i.name=? AND i.emoji=?
-                    ON CONFLICT(user_id, item_id) DO UPDATE SET qty=qty+excluded.qty
-                    """,
-                    (cbid, qty, name, emoji),
-                )
-                # patent ownership transfer
-                try:
-                    if str(emoji) == "📜" and str(name).startswith("특허:"):
-                        w = str(name).split(":", 1)[1]
-                        conn.execute("UPDATE patents SET owner_id=? WHERE guild_id=? AND word=?", (cbid, int(gid) if gid is not None else 0, w))
-                except Exception:
-                    pass
-                # pay seller
-                cur3 = conn.execute("SELECT balance FROM balances WHERE user_id=?", (seller_id,))
-                rowb = cur3.fetchone()
-                seller_bal = int(rowb[0]) if rowb else DEFAULT_BALANCE
-                if rowb is None:
-                    conn.execute("INSERT INTO balances(user_id, balance) VALUES(?, ?)", (seller_id, seller_bal))
-                conn.execute("UPDATE balances SET balance=? WHERE user_id=?", (seller_bal + int(cb), seller_id))
-                conn.execute("UPDATE auctions SET status='closed', winner_id=?, winning_bid=? WHERE id=?", (cbid, cb, aid))
-                closed += 1
-                conn.execute("RELEASE fin_one")
-            except Exception:
-                conn.execute("ROLLBACK TO fin_one")
-                conn.execute("RELEASE fin_one")
-                continue
-    return closed
+    return len(finalize_due_auctions_details(max_to_close))
 
 
 def finalize_due_auctions_details(max_to_close: int = 50):
     now = int(time.time())
     results = []
-    with get_conn() as conn:
-        cur = conn.execute("SELECT id, guild_id, seller_id, name, emoji, qty, current_bid, current_bidder_id FROM auctions WHERE status='open' AND end_at <= ? LIMIT ?", (now, max_to_close))
+    for scope in guild_scopes():
+        if len(results) >= max_to_close:
+            break
+        _finalize_due(scope, now, max_to_close - len(results), results)
+    return results
+
+
+def _finalize_due(guild_id: int | None, now: int, limit: int, results: list) -> None:
+    with get_conn(guild_id) as conn:
+        cur = conn.execute("SELECT id, guild_id, seller_id, name, emoji, qty, current_bid, current_bidder_id FROM auctions WHERE status='open' AND end_at <= ? LIMIT ?", (now, limit))
         for (aid, gid, seller_id, name, emoji, qty, current_bid, current_bidder_id) in cur.fetchall():
             conn.execute("SAVEPOINT fin_det_one")
             try:
@@ -249,31 +228,41 @@ def finalize_due_auctions_details(max_to_close: int = 50):
                 conn.execute("ROLLBACK TO fin_det_one")
                 conn.execute("RELEASE fin_det_one")
                 continue
-    return results
 
 
 def list_due_unsold_auctions(limit: int = 50):
     now = int(time.time())
-    with get_conn() as conn:
-        cur = conn.execute(
-            """
-            SELECT id, guild_id, seller_id, name, emoji, qty
-            FROM auctions
-            WHERE status='open' AND end_at <= ? AND current_bid IS NULL AND current_bidder_id IS NULL
-            LIMIT ?
-            """,
-            (now, limit),
-        )
-        return cur.fetchall()
+    rows = []
+    for scope in guild_scopes():
+        if len(rows) >= limit:
+            break
+        with get_conn(scope) as conn:
+            cur = conn.execute(
+                """
+                SELECT id, guild_id, seller_id, name, emoji, qty
+                FROM auctions
+                WHERE status='open' AND end_at <= ? AND current_bid IS NULL AND current_bidder_id IS NULL
+                LIMIT ?
+                """,
+                (now, limit - len(rows)),
+            )
+            rows.extend(cur.fetchall())
+    return rows
 
 
 def discard_unsold_auction(aid: int) -> None:
-    with get_conn() as conn:
+    found, gid = _auction_scope(aid)
+    if not found:
+        return
+    with get_conn(gid) as conn:
         conn.execute("UPDATE auctions SET status='closed', winner_id=NULL, winning_bid=NULL WHERE id=?", (aid,))
 
 
 def get_auction_guild(aid: int) -> tuple[int | None, int, str]:
-    with get_conn() as conn:
+    found, gid = _auction_scope(aid)
+    if not found:
+        raise ValueError("Auction not found")
+    with get_conn(gid) as conn:
         cur = conn.execute("SELECT guild_id, end_at, status FROM auctions WHERE id=?", (aid,))
         row = cur.fetchone()
         if not row:
@@ -1,368 +1,217 @@
 import os
 import sqlite3
+import threading
+import time
 from contextlib import contextmanager
-from datetime import datetime
 from zoneinfo import ZoneInfo
 
 DB_PATH = os.environ.get("DB_PATH", os.path.join(os.getcwd(), "data.sqlite3"))
 KST = ZoneInfo("Asia/Seoul")
 
+# Per-guild database files (see database/shards.py). When on, get_conn(guild_id)
+# opens the guild's file with the core file (DB_PATH) attached as "core".
+SHARDING = os.environ.get("DB_SHARDING", "0") == "1"
 
-@contextmanager
-def get_conn():
-    conn = sqlite3.connect(DB_PATH)
+# Connection pool tuning. POOL_SIZE is how many idle connections each thread
+# keeps open; 0 restores the old connect-per-call behaviour.
+POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "4"))
+# Prepared statements cached per connection (sqlite3 keeps an LRU).
+STATEMENT_CACHE_SIZE = int(os.environ.get("DB_STATEMENT_CACHE", "256"))
+# Idle connections older than this many seconds are pinged before reuse.
+HEALTH_CHECK_AFTER = float(os.environ.get("DB_HEALTH_CHECK_AFTER", "30"))
+
+_local = threading.local()
+# Set by database.profiling while instrumentation is on; None costs one read per get_conn.
+_profile_hook = None
+# Connection observers (see database/leaderboard.py): objects with setup(conn),
+# run on every connection and again after _refresh_observers(), and
+# committed(conn) / rolled_back(conn), run when a get_conn() block ends.
+_observers: list = []
+_observers_gen = 0
+_open_conns: dict = {}  # connection -> observer generation it was set up for
+_open_lock = threading.Lock()
+
+
+def _connect(path: str, attach: str | None = None) -> sqlite3.Connection:
+    # Pragmas are per-connection, so they only need to run once here.
+    conn = sqlite3.connect(path, cached_statements=STATEMENT_CACHE_SIZE, check_same_thread=False)
+    # Only takes effect on a brand-new file (before WAL and the first table); a no-op otherwise
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL;")
+    conn.execute("PRAGMA journal_mode=WAL;")
+    conn.execute("PRAGMA synchronous=NORMAL;")
+    conn.execute("PRAGMA busy_timeout=5000;")
+    if attach is not None:
+        # Unqualified names resolve in main first, so guild tables come from the
+        # shard file and global tables (balances, items, ...) from the core file.
+        conn.execute("ATTACH DATABASE ? AS core", (attach,))
+        conn.execute("PRAGMA core.synchronous=NORMAL;")
+    with _open_lock:
+        _open_conns[conn] = -1
+    _setup(conn)
+    return conn
+
+
+def _setup(conn: sqlite3.Connection) -> None:
+    gen = _observers_gen
+    for obs in _observers:
+        obs.setup(conn)
+    with _open_lock:
+        if conn in _open_conns:
+            _open_conns[conn] = gen
+
+
+def _add_observer(obs) -> None:
+    _observers.append(obs)
+    _refresh_observers()
+
+
+def _refresh_observers() -> None:
+    """Make every connection re-run observer setup before its next use (e.g. after migrations)."""
+    global _observers_gen
+    _observers_gen += 1
+
+
+def _close(conn: sqlite3.Connection) -> None:
+    with _open_lock:
+        _open_conns.pop(conn, None)
+    for obs in _observers:
+        obs.rolled_back(conn)
     try:
-        conn.execute("PRAGMA journal_mode=WAL;")
-        conn.execute("PRAGMA synchronous=NORMAL;")
-        yield conn
-        conn.commit()
-    except Exception:
-        conn.rollback()
-        raise
-    finally:
         conn.close()
+    except sqlite3.Error:
+        pass
 
 
-def init_db():
-    """Create tables if not exist and run lightweight migrations."""
-    now = int(datetime.now(KST).timestamp())
-    with get_conn() as conn:
-        # Economy
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS balances (
-                user_id INTEGER PRIMARY KEY,
-                balance INTEGER NOT NULL
-            );
-            """
-        )
-
-        # Attendance
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS attendance (
-                guild_id INTEGER NOT NULL,
-                user_id INTEGER NOT NULL,
-                last_date TEXT,
-                streak INTEGER NOT NULL DEFAULT 0,
-                max_streak INTEGER NOT NULL DEFAULT 0,
-                total_days INTEGER NOT NULL DEFAULT 0,
-                PRIMARY KEY (guild_id, user_id)
-            );
-            """
-        )
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS attendance_logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                ts INTEGER NOT NULL,
-                guild_id INTEGER NOT NULL,
-                user_id INTEGER NOT NULL,
-                date TEXT NOT NULL,
-                reward INTEGER NOT NULL
-            );
-            """
-        )
-
-        # Patents
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS patent_participants (
-                guild_id INTEGER NOT NULL,
-                user_id INTEGER NOT NULL,
-                PRIMARY KEY (guild_id, user_id)
-            );
-            """
-        )
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS patents (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                guild_id INTEGER NOT NULL,
-                owner_id INTEGER NOT NULL,
-                word TEXT NOT NULL,
-                price INTEGER NOT NULL,
-                created_ts INTEGER NOT NULL,
-                auctioned INTEGER,
-                UNIQUE (guild_id, word)
-            );
-            """
-        )
-        try:
-            conn.execute("ALTER TABLE patents ADD COLUMN auctioned INTEGER")
-        except Exception:
-            pass
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS patent_logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                ts INTEGER NOT NULL,
-                guild_id INTEGER NOT NULL,
-                user_id INTEGER NOT NULL,
-                channel_id INTEGER,
-                message_id INTEGER,
-                words TEXT NOT NULL,
-                total_fee INTEGER NOT NULL,
-                censored INTEGER NOT NULL
-            );
-            """
-        )
-
-        # Trading
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS etf_ticks (
-                guild_id INTEGER NOT NULL,
-                ts INTEGER NOT NULL,
-                symbol TEXT NOT NULL,
-                price REAL NOT NULL,
-                delta REAL NOT NULL,
-                PRIMARY KEY (guild_id, ts, symbol)
-            );
-            """
-        )
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS instruments (
-                symbol TEXT PRIMARY KEY,
-                name TEXT NOT NULL,
-                kind TEXT NOT NULL,
-                category TEXT
-            );
-            """
-        )
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS trades (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                ts INTEGER NOT NULL,
-                guild_id INTEGER NOT NULL,
-                user_id INTEGER NOT NULL,
-                symbol TEXT NOT NULL,
-                side TEXT NOT NULL,
-                qty INTEGER NOT NULL,
-                price REAL NOT NULL,
-                notional INTEGER NOT NULL
-            );
-            """
-        )
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS orders (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                created_ts INTEGER NOT NULL,
-                guild_id INTEGER NOT NULL,
-                user_id INTEGER NOT NULL,
-                symbol TEXT NOT NULL,
-                side TEXT NOT NULL,
-                qty INTEGER NOT NULL,
-                order_type TEXT NOT NULL,
-                limit_price REAL,
-                status TEXT NOT NULL DEFAULT 'OPEN',
-                executed_ts INTEGER,
-                executed_price REAL,
-                note TEXT
-            );
-            """
-        )
-
-        # Activity indices
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS activity_indices (
-                guild_id INTEGER NOT NULL,
-                date TEXT NOT NULL,
-                category TEXT NOT NULL,
-                open_idx REAL NOT NULL,
-                current_idx REAL NOT NULL,
-                lower_bound REAL NOT NULL,
-                upper_bound REAL NOT NULL,
-                opened_at INTEGER NOT NULL,
-                closed_at INTEGER,
-                high_idx REAL,
-                low_idx REAL,
-                PRIMARY KEY (guild_id, date, category)
-            );
-            """
-        )
-        try:
-            conn.execute("ALTER TABLE activity_indices ADD COLUMN high_idx REAL")
-        except Exception:
-            pass
-        try:
-            conn.execute("ALTER TABLE activity_indices ADD COLUMN low_idx REAL")
-        except Exception:
-            pass
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS activity_ticks (
-                guild_id INTEGER NOT NULL,
-                ts INTEGER NOT NULL,
-                date TEXT NOT NULL,
-                category TEXT NOT NULL,
-                idx_value REAL NOT NULL,
-                delta REAL NOT NULL,
-                chat_count INTEGER NOT NULL,
-                react_count INTEGER NOT NULL,
-                voice_count INTEGER NOT NULL,
-                PRIMARY KEY (guild_id, ts, category)
-            );
-            """
-        )
-
-        # Settings & announcements
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS guild_settings (
-                guild_id INTEGER PRIMARY KEY,
-                auction_channel_id INTEGER,
-                index_alerts_enabled INTEGER,
-                main_chat_channel_id INTEGER,
-                announce_channel_id INTEGER,
-                rank_role_names TEXT
-            );
-            """
-        )
-        for col in ("index_alerts_enabled", "main_chat_channel_id", "announce_channel_id"):
-            try:
-                conn.execute(f"ALTER TABLE guild_settings ADD COLUMN {col} INTEGER")
-            except Exception:
-                pass
+def _healthy(conn: sqlite3.Connection) -> bool:
+    try:
+        conn.execute("SELECT 1").fetchone()
+        return True
+    except sqlite3.Error:
+        return False
+
+
+def _idle_list() -> list:
+    idle = getattr(_local, "idle", None)
+    if idle is None:
+        idle = _local.idle = []
+    return idle
+
+
+def _acquire(path: str, attach: str | None = None) -> sqlite3.Connection:
+    """Pop an idle connection for ``path`` from this thread's pool or open a new one.
+
+    Nested ``get_conn()`` blocks on the same thread get distinct connections,
+    so an inner commit never ends an outer transaction.
+    """
+    idle = _idle_list()
+    key = (path, attach)
+    # Newest first; connections to other files (guild shards) stay pooled
+    for i in range(len(idle) - 1, -1, -1):
+        conn, conn_key, released_at = idle[i]
+        if conn not in _open_conns:
+            del idle[i]  # closed by close_pool()
+            continue
+        if conn_key != key:
+            continue
+        del idle[i]
+        if time.monotonic() - released_at > HEALTH_CHECK_AFTER and not _healthy(conn):
+            _close(conn)
+            continue
+        if _open_conns.get(conn) != _observers_gen:
+            _setup(conn)
+        return conn
+    return _connect(path, attach)
+
+
+def _release(conn: sqlite3.Connection, path: str, attach: str | None = None) -> None:
+    idle = _idle_list()
+    if conn.in_transaction or POOL_SIZE <= 0:
+        _close(conn)
+        return
+    if len(idle) >= POOL_SIZE:
+        _close(idle.pop(0)[0])  # least recently released
+    idle.append((conn, (path, attach), time.monotonic()))
+
+
+def close_pool() -> None:
+    """Close every pooled connection (all threads). Call on shutdown."""
+    with _open_lock:
+        conns = list(_open_conns)
+        _open_conns.clear()
+    for conn in conns:
         try:
-            conn.execute("ALTER TABLE guild_settings ADD COLUMN rank_role_names TEXT")
-        except Exception:
+            conn.close()
+        except sqlite3.Error:
             pass
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS announcements (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                guild_id INTEGER NOT NULL,
-                content TEXT NOT NULL,
-                active INTEGER NOT NULL DEFAULT 1,
-                created_ts INTEGER NOT NULL
-            );
-            """
-        )
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS message_counters (
-                guild_id INTEGER NOT NULL,
-                channel_id INTEGER NOT NULL,
-                count INTEGER NOT NULL DEFAULT 0,
-                PRIMARY KEY (guild_id, channel_id)
-            );
-            """
-        )
-
-        # Items & inventory
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS items (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                emoji TEXT NOT NULL,
-                UNIQUE(name, emoji)
-            );
-            """
-        )
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS inventory (
-                user_id INTEGER NOT NULL,
-                item_id INTEGER NOT NULL,
-                qty INTEGER NOT NULL,
-                PRIMARY KEY (user_id, item_id),
-                FOREIGN KEY (item_id) REFERENCES items(id) ON DELETE CASCADE
-            );
-            """
-        )
-
-        # Auctions
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS auctions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                seller_id INTEGER NOT NULL,
-                name TEXT NOT NULL,
-                emoji TEXT NOT NULL,
-                qty INTEGER NOT NULL,
-                start_price INTEGER NOT NULL,
-                current_bid INTEGER,
-                current_bidder_id INTEGER,
-                created_at INTEGER NOT NULL,
-                end_at INTEGER NOT NULL,
-                status TEXT NOT NULL DEFAULT 'open',
-                winner_id INTEGER,
-                winning_bid INTEGER,
-                guild_id INTEGER
-            );
-            """
-        )
+        for obs in _observers:
+            obs.rolled_back(conn)
+    _local.idle = []
+
+
+@contextmanager
+def get_conn(guild_id: int | None = None):
+    """Connection for the core database, or for ``guild_id``'s file when sharding.
+
+    Pass the guild whenever the statements touch guild-scoped tables; without
+    sharding the argument is ignored.
+    """
+    if guild_id is not None and SHARDING:
+        from .shards import shard_path
+        with _open(shard_path(guild_id), DB_PATH) as conn:
+            yield conn
+    else:
+        with _open(DB_PATH) as conn:
+            yield conn
+
+
+@contextmanager
+def _open(path: str, attach: str | None = None):
+    hook = _profile_hook
+    conn = _acquire(path, attach)
+    try:
+        if hook is None:
+            yield conn
+            conn.commit()
+        else:
+            yield hook.wrap(conn)
+            t0 = time.perf_counter()
+            conn.commit()
+            hook.committed(time.perf_counter() - t0)
+        for obs in _observers:
+            obs.committed(conn)
+    except BaseException:
+        # KeyboardInterrupt / cancellation too: never keep a pooled connection (or its write lock) checked out
         try:
-            conn.execute("ALTER TABLE auctions ADD COLUMN guild_id INTEGER")
-        except Exception:
-            pass
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS auction_bids (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                auction_id INTEGER NOT NULL,
-                bidder_id INTEGER NOT NULL,
-                amount INTEGER NOT NULL,
-                created_at INTEGER NOT NULL
-            );
-            """
-        )
-
-        # Auto transfer
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS auto_transfers (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                guild_id INTEGER NOT NULL,
-                from_user INTEGER NOT NULL,
-                to_user INTEGER NOT NULL,
-                amount INTEGER NOT NULL,
-                period_days INTEGER NOT NULL,
-                start_date TEXT NOT NULL,
-                last_date TEXT,
-                active INTEGER NOT NULL DEFAULT 1
-            );
-            """
-        )
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS auto_transfer_logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                ts INTEGER NOT NULL,
-                auto_id INTEGER NOT NULL,
-                status TEXT NOT NULL,
-                message TEXT
-            );
-            """
-        )
-
-        # Teams (DB-backed)
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS teams (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                guild_id INTEGER NOT NULL,
-                name TEXT NOT NULL,
-                parent_id INTEGER,
-                UNIQUE(guild_id, name, parent_id)
-            );
-            """
-        )
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS user_teams (
-                guild_id INTEGER NOT NULL,
-                user_id INTEGER NOT NULL,
-                team_id INTEGER NOT NULL,
-                PRIMARY KEY (guild_id, user_id)
-            );
-            """
-        )
-
-__all__ = ['get_conn', 'init_db', 'KST', 'DB_PATH']
+            conn.rollback()
+        except sqlite3.Error:
+            _close(conn)
+            raise
+        for obs in _observers:
+            obs.rolled_back(conn)
+        _release(conn, path, attach)
+        raise
+    else:
+        _release(conn, path, attach)
+
+
+_schema_ready_for: str | None = None
+_schema_lock = threading.Lock()
+
+
+def init_db():
+    """Bring the schema up to date (versioned migrations), once per process."""
+    global _schema_ready_for
+    if _schema_ready_for == DB_PATH:
+        return
+    with _schema_lock:
+        if _schema_ready_for == DB_PATH:
+            return
+        from .migrations import migrate
+        migrate()
+        _refresh_observers()
+        if SHARDING:
+            from .shards import check_core_file
+            check_core_file()
+        _schema_ready_for = DB_PATH
+
+__all__ = ['get_conn', 'close_pool', 'init_db', 'KST', 'DB_PATH']
@@ -1,7 +1,61 @@
+import json as _json
+import threading
+
 from .core import get_conn
+from .leaderboard import rank_index
 
 DEFAULT_BALANCE = 1000
 
+# Money promised but not yet debited (deferred patent royalties, see
+# royalties.py): user_id -> amount. Spending checks and get_balance() see
+# balance minus this, so a hold cannot be spent twice.
+_held: dict[int, int] = {}
+_held_lock = threading.Lock()
+
+
+def held_funds(user_id: int) -> int:
+    return _held.get(int(user_id), 0)
+
+
+def _try_hold(user_id: int, amount: int, balance: int) -> bool:
+    """Hold ``amount`` if ``balance`` (the stored balance) still covers it on top of existing holds."""
+    with _held_lock:
+        held = _held.get(user_id, 0)
+        if balance - held < amount:
+            return False
+        _held[user_id] = held + amount
+        return True
+
+
+def _release(user_id: int, amount: int) -> None:
+    with _held_lock:
+        left = _held.get(user_id, 0) - amount
+        if left > 0:
+            _held[user_id] = left
+        else:
+            _held.pop(user_id, None)
+
+
+def _reset_holds(holds: dict[int, int]) -> None:
+    with _held_lock:
+        _held.clear()
+        _held.update({u: a for u, a in holds.items() if a > 0})
+
+
+def _apply_deltas(conn, deltas: dict[int, int]) -> None:
+    """Add ``deltas`` (user_id -> amount, may be negative) to balances in one statement.
+
+    Users without a row start at DEFAULT_BALANCE, hence the +/- on the inserted value.
+    """
+    deltas = {uid: amt for uid, amt in deltas.items() if amt}
+    if not deltas:
+        return
+    conn.execute(
+        "INSERT INTO balances(user_id, balance) SELECT CAST(key AS INTEGER), ? + value FROM json_each(?) WHERE 1 "
+        "ON CONFLICT(user_id) DO UPDATE SET balance = balance + excluded.balance - ?",
+        (DEFAULT_BALANCE, _json.dumps({str(u): int(a) for u, a in deltas.items()}), DEFAULT_BALANCE),
+    )
+
 
 def _ensure_user(conn, user_id: int) -> int:
     cur = conn.execute("SELECT balance FROM balances WHERE user_id=?", (user_id,))
@@ -13,13 +67,14 @@ def _ensure_user(conn, user_id: int) -> int:
 
 
 def get_balance(user_id: int) -> int:
+    """Spendable balance: the stored balance minus any held funds."""
     with get_conn() as conn:
         cur = conn.execute("SELECT balance FROM balances WHERE user_id=?", (user_id,))
         row = cur.fetchone()
         if row is None:
             conn.execute("INSERT INTO balances(user_id, balance) VALUES(?, ?)", (user_id, DEFAULT_BALANCE))
-            return DEFAULT_BALANCE
-        return int(row[0])
+            return DEFAULT_BALANCE - held_funds(user_id)
+        return int(row[0]) - held_funds(user_id)
 
 
 def transfer(sender_id: int, receiver_id: int, amount: int) -> tuple[int, int]:
@@ -31,7 +86,7 @@ def transfer(sender_id: int, receiver_id: int, amount: int) -> tuple[int, int]:
         receiver_balance = _ensure_user(conn, receiver_id)
         if sender_id == receiver_id:
             raise ValueError("Cannot transfer to self")
-        if sender_balance < amount:
+        if sender_balance - held_funds(sender_id) < amount:
             raise ValueError("Insufficient funds")
         new_sender = sender_balance - amount
         new_receiver = receiver_balance + amount
@@ -42,6 +97,9 @@ def transfer(sender_id: int, receiver_id: int, amount: int) -> tuple[int, int]:
 
 def top_balances(limit: int = 10) -> list[tuple[int, int]]:
     limit = max(1, min(int(limit), 50))
+    idx = rank_index()
+    if idx is not None:
+        return idx.page(0, limit)
     with get_conn() as conn:
         cur = conn.execute(
             "SELECT user_id, balance FROM balances ORDER BY balance DESC, user_id ASC LIMIT ?",
@@ -51,6 +109,14 @@ def top_balances(limit: int = 10) -> list[tuple[int, int]]:
 
 
 def get_rank(user_id: int) -> tuple[int, int, int]:
+    idx = rank_index()
+    if idx is not None:
+        found = idx.rank_of(user_id)
+        if found is None:
+            get_balance(user_id)  # creates the row; the index picks it up on commit
+            found = idx.rank_of(user_id)
+        if found is not None:
+            return found
     with get_conn() as conn:
         balance = _ensure_user(conn, user_id)
         cur = conn.execute("SELECT COUNT(DISTINCT balance) FROM balances WHERE balance > ?", (balance,))
@@ -61,6 +127,9 @@ def get_rank(user_id: int) -> tuple[int, int, int]:
 
 
 def count_users() -> int:
+    idx = rank_index()
+    if idx is not None:
+        return idx.total()
     with get_conn() as conn:
         cur = conn.execute("SELECT COUNT(*) FROM balances")
         return int(cur.fetchone()[0])
@@ -69,6 +138,9 @@ def count_users() -> int:
 def rank_page(offset: int, limit: int) -> list[tuple[int, int]]:
     offset = max(0, int(offset))
     limit = max(1, min(int(limit), 50))
+    idx = rank_index()
+    if idx is not None:
+        return idx.page(offset, limit)
     with get_conn() as conn:
         cur = conn.execute(
             "SELECT user_id, balance FROM balances ORDER BY balance DESC, user_id ASC LIMIT ? OFFSET ?",
@@ -76,6 +148,35 @@ def rank_page(offset: int, limit: int) -> list[tuple[int, int]]:
         )
         return [(int(uid), int(bal)) for uid, bal in cur.fetchall()]
 
+
+def rank_page_after(balance: int, user_id: int, limit: int) -> list[tuple[int, int]]:
+    """The ``limit`` rows ranked right after (balance, user_id); keyset paging for the next page."""
+    limit = max(1, min(int(limit), 50))
+    idx = rank_index()
+    if idx is not None:
+        return idx.page_after(balance, user_id, limit)
+    with get_conn() as conn:
+        cur = conn.execute(
+            "SELECT user_id, balance FROM balances WHERE balance <= ? AND (balance < ? OR user_id > ?) ORDER BY balance DESC, user_id ASC LIMIT ?",
+            (balance, balance, user_id, limit),
+        )
+        return [(int(uid), int(bal)) for uid, bal in cur.fetchall()]
+
+
+def rank_page_before(balance: int, user_id: int, limit: int) -> list[tuple[int, int]]:
+    """The ``limit`` rows ranked right before (balance, user_id), in ranking order."""
+    limit = max(1, min(int(limit), 50))
+    idx = rank_index()
+    if idx is not None:
+        return idx.page_before(balance, user_id, limit)
+    with get_conn() as conn:
+        cur = conn.execute(
+            "SELECT user_id, balance FROM balances WHERE balance >= ? AND (balance > ? OR user_id < ?) ORDER BY balance ASC, user_id DESC LIMIT ?",
+            (balance, balance, user_id, limit),
+        )
+        return [(int(uid), int(bal)) for uid, bal in reversed(cur.fetchall())]
+
 __all__ = [
-    'DEFAULT_BALANCE', 'get_balance', 'transfer', 'top_balances', 'get_rank', 'count_users', 'rank_page'
+    'DEFAULT_BALANCE', 'get_balance', 'held_funds', 'transfer', 'top_balances', 'get_rank', 'count_users', 'rank_page',
+    'rank_page_after', 'rank_page_before',
 ]
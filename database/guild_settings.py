@@ -0,0 +1,117 @@
+"""Per-guild settings kept in memory.
+
+The main chat / announce channels, the index alert switch, the rank role
+names and whether the guild has active announcements are read on every
+message and every index minute. Each guild's row is loaded once, on first
+use, into a ``GuildSettings`` and then updated in place by the ``set_*`` and
+announcement functions right after their write commits, so the getters in
+``announcements`` and ``teams`` do no I/O. Entries are replaced, never
+mutated, so ``peek_guild_settings`` may read them without the lock. Writes
+from other processes are not seen; ``reload_guild_settings()`` drops the
+cache.
+"""
+
+import threading
+
+from . import core
+from .core import get_conn
+
+DEFAULT_RANK_ROLES = ("회장", "사장", "부장", "차장", "과장", "대리", "사수", "부사수", "신입")
+
+
+class GuildSettings:
+    """One guild's settings. Treat as read-only; updates replace the object."""
+
+    __slots__ = ("main_chat_channel_id", "announce_channel_id", "index_alerts_enabled", "rank_role_names", "has_announcements")
+
+    def __init__(self, main_chat_channel_id: int | None = None, announce_channel_id: int | None = None,
+                 index_alerts_enabled: bool = False, rank_role_names: tuple[str, ...] = DEFAULT_RANK_ROLES,
+                 has_announcements: bool = False):
+        self.main_chat_channel_id = main_chat_channel_id
+        self.announce_channel_id = announce_channel_id
+        self.index_alerts_enabled = index_alerts_enabled
+        self.rank_role_names = rank_role_names
+        self.has_announcements = has_announcements
+
+    @property
+    def notify_channel_id(self) -> int | None:
+        """Announce channel, falling back to the main chat channel."""
+        return self.announce_channel_id if self.announce_channel_id is not None else self.main_chat_channel_id
+
+    def _replace(self, **changes) -> "GuildSettings":
+        fields = {name: getattr(self, name) for name in self.__slots__}
+        fields.update(changes)
+        return GuildSettings(**fields)
+
+
+def _role_names(csv) -> tuple[str, ...]:
+    if csv is None or str(csv).strip() == "":
+        return DEFAULT_RANK_ROLES
+    return tuple(n for n in (n.strip() for n in str(csv).split(",")) if n)
+
+
+_lock = threading.Lock()
+_settings: dict[int, GuildSettings] = {}
+_loaded_for: str | None = None
+
+
+def _check_path() -> None:
+    global _loaded_for
+    if _loaded_for != core.DB_PATH:
+        _settings.clear()
+        _loaded_for = core.DB_PATH
+
+
+def _load(guild_id: int) -> GuildSettings:
+    with get_conn(guild_id) as conn:
+        row = conn.execute(
+            "SELECT main_chat_channel_id, announce_channel_id, index_alerts_enabled, rank_role_names FROM guild_settings WHERE guild_id=?",
+            (guild_id,),
+        ).fetchone()
+        has_ann = conn.execute("SELECT 1 FROM announcements WHERE guild_id=? AND active=1 LIMIT 1", (guild_id,)).fetchone() is not None
+    if row is None:
+        return GuildSettings(has_announcements=has_ann)
+    main_ch, ann_ch, alerts, roles = row
+    return GuildSettings(
+        main_chat_channel_id=int(main_ch) if main_ch is not None else None,
+        announce_channel_id=int(ann_ch) if ann_ch is not None else None,
+        index_alerts_enabled=bool(int(alerts)) if alerts is not None else False,
+        rank_role_names=_role_names(roles),
+        has_announcements=has_ann,
+    )
+
+
+def _update(guild_id: int, **changes) -> None:
+    """Apply a committed write to the cached entry, if the guild is cached."""
+    with _lock:
+        _check_path()
+        cur = _settings.get(int(guild_id))
+        if cur is not None:
+            _settings[int(guild_id)] = cur._replace(**changes)
+
+
+def get_guild_settings(guild_id: int) -> GuildSettings:
+    with _lock:
+        _check_path()
+        found = _settings.get(int(guild_id))
+        if found is not None:
+            return found
+        # loaded under the lock so a concurrent _update cannot be lost behind a stale read
+        found = _settings[int(guild_id)] = _load(int(guild_id))
+        return found
+
+
+def peek_guild_settings(guild_id: int) -> GuildSettings | None:
+    """Cached settings without touching the database; None when not loaded yet."""
+    if _loaded_for != core.DB_PATH:
+        return None
+    return _settings.get(int(guild_id))
+
+
+def reload_guild_settings() -> None:
+    """Forget every cached guild (e.g. after another process changed settings)."""
+    with _lock:
+        _settings.clear()
+
+
+__all__ = ['GuildSettings', 'get_guild_settings', 'peek_guild_settings', 'reload_guild_settings']
@@ -0,0 +1,114 @@
+"""Per-minute activity index math for every guild at once.
+
+``minute_tick`` used to score each guild and category in a Python loop with
+two window queries, a snapshot read and two writes each. ``score_minute``
+takes the minute's inputs as ``[guilds x categories]`` arrays and returns the
+new index values in one vectorised pass (NumPy when installed, otherwise the
+scalar loop below, which is the original formula kept operation for
+operation so both paths give bit-identical results).
+``activity.apply_minute_batch`` feeds it and persists the result.
+"""
+
+try:
+    import numpy as np
+except Exception:  # numpy is optional (it comes with matplotlib)
+    np = None
+
+CATEGORIES = ('chat', 'react', 'voice')
+# (chat, react, voice) weights per category, in CATEGORIES order
+WEIGHTS = ((1.0, 0.3, 0.3), (0.3, 1.0, 0.3), (0.3, 0.3, 1.0))
+# category scaling so full activity tends to reach the ±1%/min clamp
+SCALE = (0.073, 0.073, 0.11)
+# ~1000 msgs/hour (~17/min) and 8 people in voice -> full scale
+CHAT_MAX, REACT_MAX, VOICE_MAX = 17.0, 30.0, 8.0
+REL_WIN = 300     # relative boost: last 5 minutes ...
+REL_GAP = 3600    # ... vs the same 5 minutes one hour ago
+REL_BETA = 0.8
+REL_MIN, REL_MAX = 0.8, 1.3
+S = 10.0          # volatility divisor; baseline 1.0 is neutral
+DECAY = 0.001     # 0.1% downward drift per minute
+CLAMP = 0.01      # ±1% per minute
+
+
+def _score_scalar(counts, gaps, cur_sums, prev_sums, current, lower, upper) -> list[list[float]]:
+    out = []
+    for g in range(len(counts)):
+        chat_c, react_c, voice_c = counts[g]
+        gap = gaps[g]
+        gap_bonus = 0.0
+        if gap < 60.0:
+            gap_bonus = (60.0 - gap) / 60.0
+        x_chat = min(chat_c / CHAT_MAX, 1.0)
+        x_react = min(react_c / REACT_MAX, 1.0)
+        x_voice = min(voice_c / VOICE_MAX, 1.0)
+        row = []
+        for k in range(len(CATEGORIES)):
+            a, b, c = WEIGHTS[k]
+            base_score = 1.0 + SCALE[k] * (a * x_chat + b * x_react + c * x_voice + 0.5 * gap_bonus)
+            cur_s, prev_s = cur_sums[g][k], prev_sums[g][k]
+            cur_w = a * cur_s[0] + b * cur_s[1] + c * cur_s[2]
+            prev_w = a * prev_s[0] + b * prev_s[1] + c * prev_s[2]
+            ratio = (cur_w + 1.0) / (prev_w + 1.0)
+            rel_factor = 1.0 + REL_BETA * (ratio - 1.0)
+            rel_factor = max(REL_MIN, min(REL_MAX, rel_factor))
+            change_raw = (base_score - 1.0) / S
+            change_raw *= rel_factor
+            change_raw -= DECAY
+            change_pct = max(-CLAMP, min(CLAMP, change_raw))
+            new_val = current[g][k] * (1.0 + change_pct)
+            if new_val < lower[g][k]:
+                new_val = lower[g][k]
+            if new_val > upper[g][k]:
+                new_val = upper[g][k]
+            row.append(new_val)
+        out.append(row)
+    return out
+
+
+def _score_numpy(counts, gaps, cur_sums, prev_sums, current, lower, upper) -> list[list[float]]:
+    counts = np.asarray(counts, dtype=np.float64)          # [G, 3 metrics]
+    gaps = np.asarray(gaps, dtype=np.float64)              # [G]
+    cur = np.asarray(cur_sums, dtype=np.float64)           # [G, C, 3 metrics]
+    prev = np.asarray(prev_sums, dtype=np.float64)
+    current = np.asarray(current, dtype=np.float64)        # [G, C]
+    lower = np.asarray(lower, dtype=np.float64)
+    upper = np.asarray(upper, dtype=np.float64)
+    w = np.asarray(WEIGHTS, dtype=np.float64)              # [C, 3 metrics]
+    a, b, c = w[:, 0], w[:, 1], w[:, 2]
+
+    gap_bonus = np.where(gaps < 60.0, (60.0 - gaps) / 60.0, 0.0)[:, None]
+    x_chat = np.minimum(counts[:, 0] / CHAT_MAX, 1.0)[:, None]
+    x_react = np.minimum(counts[:, 1] / REACT_MAX, 1.0)[:, None]
+    x_voice = np.minimum(counts[:, 2] / VOICE_MAX, 1.0)[:, None]
+    # same association order as the scalar formula, so no rounding drift
+    base_score = 1.0 + np.asarray(SCALE) * (a * x_chat + b * x_react + c * x_voice + 0.5 * gap_bonus)
+    cur_w = a * cur[:, :, 0] + b * cur[:, :, 1] + c * cur[:, :, 2]
+    prev_w = a * prev[:, :, 0] + b * prev[:, :, 1] + c * prev[:, :, 2]
+    ratio = (cur_w + 1.0) / (prev_w + 1.0)
+    rel_factor = np.maximum(REL_MIN, np.minimum(REL_MAX, 1.0 + REL_BETA * (ratio - 1.0)))
+    change_raw = (base_score - 1.0) / S
+    change_raw *= rel_factor
+    change_raw -= DECAY
+    change_pct = np.maximum(-CLAMP, np.minimum(CLAMP, change_raw))
+    new_val = current * (1.0 + change_pct)
+    new_val = np.where(new_val < lower, lower, new_val)
+    new_val = np.where(new_val > upper, upper, new_val)
+    return new_val.tolist()
+
+
+def score_minute(counts, gaps, cur_sums, prev_sums, current, lower, upper) -> list[list[float]]:
+    """New index values ``[G][C]`` for one minute.
+
+    ``counts`` is ``[G][(chat, react, voice)]`` for the minute just closed,
+    ``gaps`` the average message gap per guild in seconds, ``cur_sums`` and
+    ``prev_sums`` ``[G][C][(chat, react, voice)]`` window totals, and
+    ``current``/``lower``/``upper`` ``[G][C]`` from today's index rows.
+    """
+    if not len(counts):
+        return []
+    if np is not None:
+        return _score_numpy(counts, gaps, cur_sums, prev_sums, current, lower, upper)
+    return _score_scalar(counts, gaps, cur_sums, prev_sums, current, lower, upper)
+
+
+__all__ = ['score_minute']
@@ -145,11 +145,6 @@ def transfer_item(sender_id: int, receiver_id: int, name: str, emoji: str, qty:
         receiver_qty = int(cur.fetchone()[0])
         return new_sender, receiver_qty
 
-__all__ = [
-    'list_inventory','grant_item','discard_item','transfer_item','instrument_item','INSTRUMENT_ITEM_MAP',
-    'instrument_item_names','is_instrument_item_name','is_patent_item_name'
-]
-
 __all__ = [
     'list_inventory',
     'grant_item',
@@ -160,6 +155,7 @@ __all__ = [
     'instrument_item_names',
     'is_instrument_item_name',
     'is_patent_item_name',
+    'list_items_for_users',
 ]
 
 
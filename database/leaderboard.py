@@ -0,0 +1,318 @@
+"""In-memory order-statistics index over ``balances`` for the money ranking.
+
+``get_rank`` used to count the distinct balances above the user's and
+``rank_page`` walked ``LIMIT/OFFSET``, both O(n) per call. This index keeps
+every (balance, user) pair in a bucketed sorted list with a Fenwick tree over
+the bucket sizes, plus the sorted distinct balances, so dense rank, positional
+pages and keyset pages are O(log n). It is built on first use from one
+index-ordered read of ``balances``.
+
+Sync: every connection gets TEMP triggers on ``balances`` that record the
+touched user ids; when the ``get_conn()`` block commits, those users are read
+back and applied under the index lock, so the newest read always lands last.
+Only committed values are read, so rollbacks and savepoints need nothing
+special. Writes from other processes are not seen; ``reload_rank_index()``
+rebuilds from the table. ``DB_RANK_INDEX=0`` turns the index off and the
+economy functions use SQL instead.
+"""
+
+import bisect
+import os
+import sqlite3
+import threading
+
+from . import core
+
+ENABLED = os.environ.get("DB_RANK_INDEX", "1") == "1"
+BUCKET_SIZE = 512
+REFRESH_CHUNK = 500
+
+# Entries are single ints ordered like ``balance DESC, user_id ASC``.
+_UID_BITS = 64
+_UID_MASK = (1 << _UID_BITS) - 1
+
+
+def _key(balance: int, user_id: int) -> int:
+    return (-int(balance) << _UID_BITS) + int(user_id)
+
+
+def _row(key: int) -> tuple[int, int]:
+    return key & _UID_MASK, -(key >> _UID_BITS)
+
+
+class _SortedList:
+    """Sorted multiset of ints: buckets of about BUCKET_SIZE and a Fenwick tree of bucket lengths."""
+
+    def __init__(self, items: list[int] | None = None):
+        items = items or []  # must already be sorted
+        self._lists = [items[i:i + BUCKET_SIZE] for i in range(0, len(items), BUCKET_SIZE)]
+        self._maxes = [b[-1] for b in self._lists]
+        self._len = len(items)
+        self._rebuild()
+
+    def __len__(self) -> int:
+        return self._len
+
+    def _rebuild(self) -> None:
+        n = len(self._lists)
+        tree = [0] * (n + 1)
+        for i, b in enumerate(self._lists, 1):
+            tree[i] += len(b)
+            j = i + (i & -i)
+            if j <= n:
+                tree[j] += tree[i]
+        self._tree = tree
+
+    def _tree_add(self, i: int, delta: int) -> None:
+        tree = self._tree
+        i += 1
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+
+    def _prefix(self, i: int) -> int:
+        """Total length of the first ``i`` buckets."""
+        tree = self._tree
+        s = 0
+        while i > 0:
+            s += tree[i]
+            i -= i & -i
+        return s
+
+    def _locate(self, index: int) -> tuple[int, int]:
+        """(bucket, offset) of position ``index``."""
+        tree = self._tree
+        n = len(tree) - 1
+        pos = 0
+        bit = 1 << n.bit_length()
+        while bit:
+            nxt = pos + bit
+            if nxt <= n and tree[nxt] <= index:
+                pos = nxt
+                index -= tree[nxt]
+            bit >>= 1
+        return pos, index
+
+    def add(self, x: int) -> None:
+        if not self._lists:
+            self._lists, self._maxes, self._len = [[x]], [x], 1
+            self._rebuild()
+            return
+        i = bisect.bisect_left(self._maxes, x)
+        if i == len(self._maxes):
+            i -= 1
+            self._lists[i].append(x)
+            self._maxes[i] = x
+        else:
+            bisect.insort(self._lists[i], x)
+        self._len += 1
+        b = self._lists[i]
+        if len(b) > 2 * BUCKET_SIZE:
+            half = len(b) // 2
+            self._lists[i:i + 1] = [b[:half], b[half:]]
+            self._maxes[i:i + 1] = [b[half - 1], b[-1]]
+            self._rebuild()
+        else:
+            self._tree_add(i, 1)
+
+    def remove(self, x: int) -> bool:
+        i = bisect.bisect_left(self._maxes, x)
+        if i == len(self._maxes):
+            return False
+        b = self._lists[i]
+        j = bisect.bisect_left(b, x)
+        if j == len(b) or b[j] != x:
+            return False
+        del b[j]
+        self._len -= 1
+        if b:
+            self._maxes[i] = b[-1]
+            self._tree_add(i, -1)
+        else:
+            del self._lists[i]
+            del self._maxes[i]
+            self._rebuild()
+        return True
+
+    def bisect_left(self, x: int) -> int:
+        i = bisect.bisect_left(self._maxes, x)
+        if i == len(self._maxes):
+            return self._len
+        return self._prefix(i) + bisect.bisect_left(self._lists[i], x)
+
+    def bisect_right(self, x: int) -> int:
+        i = bisect.bisect_right(self._maxes, x)
+        if i == len(self._maxes):
+            return self._len
+        return self._prefix(i) + bisect.bisect_right(self._lists[i], x)
+
+    def slice(self, start: int, stop: int) -> list[int]:
+        start, stop = max(0, start), min(self._len, stop)
+        if start >= stop:
+            return []
+        bi, off = self._locate(start)
+        out: list[int] = []
+        need = stop - start
+        while need > 0 and bi < len(self._lists):
+            chunk = self._lists[bi][off:off + need]
+            out.extend(chunk)
+            need -= len(chunk)
+            bi += 1
+            off = 0
+        return out
+
+
+class RankIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded_for: str | None = None
+        self._clear()
+
+    def _clear(self) -> None:
+        self._entries = _SortedList()
+        self._distinct = _SortedList()   # -balance, one per distinct value
+        self._counts: dict[int, int] = {}    # balance -> users holding it
+        self._balances: dict[int, int] = {}  # user_id -> balance
+
+    def ensure_loaded(self) -> None:
+        if self._loaded_for != core.DB_PATH:
+            with self._lock:
+                if self._loaded_for != core.DB_PATH:
+                    self.load()
+
+    def load(self) -> None:
+        with self._lock:
+            core.init_db()
+            with core.get_conn() as conn:
+                rows = conn.execute("SELECT user_id, balance FROM balances ORDER BY balance DESC, user_id ASC").fetchall()
+            self._clear()
+            keys = []
+            for uid, bal in rows:
+                uid, bal = int(uid), int(bal)
+                self._balances[uid] = bal
+                self._counts[bal] = self._counts.get(bal, 0) + 1
+                keys.append(_key(bal, uid))
+            keys.sort()  # already ordered by the index; keeps the invariant if ids are odd
+            self._entries = _SortedList(keys)
+            self._distinct = _SortedList(sorted(-b for b in self._counts))
+            self._loaded_for = core.DB_PATH
+
+    def _set(self, user_id: int, balance: int | None) -> None:
+        old = self._balances.get(user_id)
+        if old == balance:
+            return
+        if old is not None:
+            self._entries.remove(_key(old, user_id))
+            n = self._counts[old] - 1
+            if n:
+                self._counts[old] = n
+            else:
+                del self._counts[old]
+                self._distinct.remove(-old)
+            del self._balances[user_id]
+        if balance is not None:
+            self._entries.add(_key(balance, user_id))
+            n = self._counts.get(balance, 0)
+            if not n:
+                self._distinct.add(-balance)
+            self._counts[balance] = n + 1
+            self._balances[user_id] = balance
+
+    def refresh(self, conn: sqlite3.Connection, user_ids: set[int]) -> None:
+        """Read the committed balances of ``user_ids`` through ``conn`` and apply them."""
+        with self._lock:
+            if self._loaded_for != core.DB_PATH:
+                return  # not built yet (or built for another file); the next load reads fresh data
+            ids = list(user_ids)
+            try:
+                for i in range(0, len(ids), REFRESH_CHUNK):
+                    part = ids[i:i + REFRESH_CHUNK]
+                    q = ",".join("?" * len(part))
+                    found = {int(u): int(b) for u, b in conn.execute(f"SELECT user_id, balance FROM balances WHERE user_id IN ({q})", part)}
+                    for uid in part:
+                        self._set(int(uid), found.get(int(uid)))
+            except sqlite3.Error:
+                self._loaded_for = None  # rebuild on next use rather than serve a wrong rank
+
+    def total(self) -> int:
+        return len(self._entries)
+
+    def rank_of(self, user_id: int) -> tuple[int, int, int] | None:
+        """(dense rank, balance, total users), or None when the user has no row."""
+        with self._lock:
+            bal = self._balances.get(int(user_id))
+            if bal is None:
+                return None
+            return self._distinct.bisect_left(-bal) + 1, bal, len(self._entries)
+
+    def page(self, offset: int, limit: int) -> list[tuple[int, int]]:
+        with self._lock:
+            return [_row(k) for k in self._entries.slice(offset, offset + limit)]
+
+    def page_after(self, balance: int, user_id: int, limit: int) -> list[tuple[int, int]]:
+        with self._lock:
+            i = self._entries.bisect_right(_key(balance, user_id))
+            return [_row(k) for k in self._entries.slice(i, i + limit)]
+
+    def page_before(self, balance: int, user_id: int, limit: int) -> list[tuple[int, int]]:
+        with self._lock:
+            i = self._entries.bisect_left(_key(balance, user_id))
+            return [_row(k) for k in self._entries.slice(i - limit, i)]
+
+
+_TRIGGERS = (
+    "CREATE TEMP TRIGGER IF NOT EXISTS _rank_ins AFTER INSERT ON {schema}.balances BEGIN SELECT _rank_touch(NEW.user_id); END",
+    "CREATE TEMP TRIGGER IF NOT EXISTS _rank_upd AFTER UPDATE OF balance ON {schema}.balances BEGIN SELECT _rank_touch(NEW.user_id); END",
+    "CREATE TEMP TRIGGER IF NOT EXISTS _rank_del AFTER DELETE ON {schema}.balances BEGIN SELECT _rank_touch(OLD.user_id); END",
+)
+
+
+class _Observer:
+    """Collects the user ids each connection touches in ``balances``; see ``core._observers``."""
+
+    def __init__(self, index: RankIndex):
+        self._index = index
+        self._dirty: dict = {}  # connection -> set of user ids
+
+    def setup(self, conn: sqlite3.Connection) -> None:
+        schema = None
+        for _, name, _ in conn.execute("PRAGMA database_list").fetchall():
+            if name != "temp" and conn.execute(f"PRAGMA {name}.table_info(balances)").fetchall():
+                schema = name
+                break
+        if schema is None:
+            return  # a guild file opened without the core file, or a file not migrated yet
+        dirty = self._dirty
+        conn.create_function("_rank_touch", 1, lambda uid: dirty.setdefault(conn, set()).add(uid))
+        for trigger in _TRIGGERS:
+            conn.execute(trigger.format(schema=schema))
+
+    def committed(self, conn: sqlite3.Connection) -> None:
+        users = self._dirty.pop(conn, None)
+        if users:
+            self._index.refresh(conn, users)
+
+    def rolled_back(self, conn: sqlite3.Connection) -> None:
+        self._dirty.pop(conn, None)
+
+
+_index = RankIndex()
+if ENABLED:
+    core._add_observer(_Observer(_index))
+
+
+def rank_index() -> RankIndex | None:
+    """The loaded index, or None when ``DB_RANK_INDEX=0``."""
+    if not ENABLED:
+        return None
+    _index.ensure_loaded()
+    return _index
+
+
+def reload_rank_index() -> None:
+    """Rebuild from the table (e.g. after another process changed balances)."""
+    if ENABLED:
+        _index.load()
+
+
+__all__ = ['rank_index', 'reload_rank_index']
@@ -0,0 +1,591 @@
+"""Versioned schema migrations.
+
+Each step runs once per database, in order, inside its own transaction and is
+recorded in ``schema_version``. ``migrate()`` is what ``init_db()`` calls; when
+the database is already current it costs a single version read.
+
+To change the schema append a new ``(version, name, fn)`` entry to
+``MIGRATIONS``; never edit a step that has already shipped.
+
+With ``DB_SHARDING=1`` the same steps run against the core file and against
+every guild file, each seeing only its own tables: ``GLOBAL_TABLES`` live in
+the core file, every other table in the guild files. Statements aimed at a
+table of the other scope are skipped, so steps need no sharding awareness.
+"""
+
+import os
+import re
+import time
+
+from . import core
+from .core import get_conn
+
+# Tables kept in the core file when sharding; all other tables are per guild.
+GLOBAL_TABLES = frozenset({"balances", "items", "inventory", "instruments", "guild_shards"})
+
+_TARGET = re.compile(
+    r"^\s*(?:CREATE\s+(?:UNIQUE\s+)?INDEX\s+(?:IF\s+NOT\s+EXISTS\s+)?\w+\s+ON\s+(\w+)"
+    r"|CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)"
+    r"|ALTER\s+TABLE\s+(\w+)"
+    r"|INSERT\s+(?:OR\s+\w+\s+)?INTO\s+(\w+)"
+    r"|UPDATE\s+(\w+)"
+    r"|DELETE\s+FROM\s+(\w+))",
+    re.IGNORECASE,
+)
+
+
+class _Scoped:
+    """Connection wrapper that skips statements for tables outside ``scope``."""
+
+    def __init__(self, conn, scope: str):
+        self._conn = conn
+        self._scope = scope
+
+    def _in_scope(self, sql: str) -> bool:
+        m = _TARGET.match(sql)
+        if not m:
+            return True
+        table = next(g for g in m.groups() if g)
+        return (table in GLOBAL_TABLES) == (self._scope == "core")
+
+    def execute(self, sql: str, params=()):
+        if not self._in_scope(sql):
+            return None
+        return self._conn.execute(sql, params)
+
+    def executemany(self, sql: str, seq):
+        if not self._in_scope(sql):
+            return None
+        return self._conn.executemany(sql, seq)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def _columns(conn, table: str) -> set[str]:
+    return {str(r[1]) for r in conn.execute(f"PRAGMA table_info({table})").fetchall()}
+
+
+def _add_column(conn, table: str, column: str, decl: str) -> None:
+    if column not in _columns(conn, table):
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
+def _m001_baseline(conn) -> None:
+    """Tables as created by the pre-migration init_db, plus its column back-fills."""
+    # Economy
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS balances (
+            user_id INTEGER PRIMARY KEY,
+            balance INTEGER NOT NULL
+        );
+        """
+    )
+
+    # Attendance
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS attendance (
+            guild_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            last_date TEXT,
+            streak INTEGER NOT NULL DEFAULT 0,
+            max_streak INTEGER NOT NULL DEFAULT 0,
+            total_days INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (guild_id, user_id)
+        );
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS attendance_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ts INTEGER NOT NULL,
+            guild_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            reward INTEGER NOT NULL
+        );
+        """
+    )
+
+    # Patents
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS patent_participants (
+            guild_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            PRIMARY KEY (guild_id, user_id)
+        );
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS patents (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER NOT NULL,
+            owner_id INTEGER NOT NULL,
+            word TEXT NOT NULL,
+            price INTEGER NOT NULL,
+            created_ts INTEGER NOT NULL,
+            auctioned INTEGER,
+            UNIQUE (guild_id, word)
+        );
+        """
+    )
+    _add_column(conn, "patents", "auctioned", "INTEGER")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS patent_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ts INTEGER NOT NULL,
+            guild_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            channel_id INTEGER,
+            message_id INTEGER,
+            words TEXT NOT NULL,
+            total_fee INTEGER NOT NULL,
+            censored INTEGER NOT NULL
+        );
+        """
+    )
+
+    # Trading
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS etf_ticks (
+            guild_id INTEGER NOT NULL,
+            ts INTEGER NOT NULL,
+            symbol TEXT NOT NULL,
+            price REAL NOT NULL,
+            delta REAL NOT NULL,
+            PRIMARY KEY (guild_id, ts, symbol)
+        );
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS instruments (
+            symbol TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            category TEXT
+        );
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS trades (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ts INTEGER NOT NULL,
+            guild_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            symbol TEXT NOT NULL,
+            side TEXT NOT NULL,
+            qty INTEGER NOT NULL,
+            price REAL NOT NULL,
+            notional INTEGER NOT NULL
+        );
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS orders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_ts INTEGER NOT NULL,
+            guild_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            symbol TEXT NOT NULL,
+            side TEXT NOT NULL,
+            qty INTEGER NOT NULL,
+            order_type TEXT NOT NULL,
+            limit_price REAL,
+            status TEXT NOT NULL DEFAULT 'OPEN',
+            executed_ts INTEGER,
+            executed_price REAL,
+            note TEXT
+        );
+        """
+    )
+
+    # Activity indices
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS activity_indices (
+            guild_id INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            category TEXT NOT NULL,
+            open_idx REAL NOT NULL,
+            current_idx REAL NOT NULL,
+            lower_bound REAL NOT NULL,
+            upper_bound REAL NOT NULL,
+            opened_at INTEGER NOT NULL,
+            closed_at INTEGER,
+            high_idx REAL,
+            low_idx REAL,
+            PRIMARY KEY (guild_id, date, category)
+        );
+        """
+    )
+    _add_column(conn, "activity_indices", "high_idx", "REAL")
+    _add_column(conn, "activity_indices", "low_idx", "REAL")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS activity_ticks (
+            guild_id INTEGER NOT NULL,
+            ts INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            category TEXT NOT NULL,
+            idx_value REAL NOT NULL,
+            delta REAL NOT NULL,
+            chat_count INTEGER NOT NULL,
+            react_count INTEGER NOT NULL,
+            voice_count INTEGER NOT NULL,
+            PRIMARY KEY (guild_id, ts, category)
+        );
+        """
+    )
+
+    # Settings & announcements
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS guild_settings (
+            guild_id INTEGER PRIMARY KEY,
+            auction_channel_id INTEGER,
+            index_alerts_enabled INTEGER,
+            main_chat_channel_id INTEGER,
+            announce_channel_id INTEGER,
+            rank_role_names TEXT
+        );
+        """
+    )
+    for col in ("index_alerts_enabled", "main_chat_channel_id", "announce_channel_id"):
+        _add_column(conn, "guild_settings", col, "INTEGER")
+    _add_column(conn, "guild_settings", "rank_role_names", "TEXT")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS announcements (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER NOT NULL,
+            content TEXT NOT NULL,
+            active INTEGER NOT NULL DEFAULT 1,
+            created_ts INTEGER NOT NULL
+        );
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS message_counters (
+            guild_id INTEGER NOT NULL,
+            channel_id INTEGER NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (guild_id, channel_id)
+        );
+        """
+    )
+
+    # Items & inventory
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            emoji TEXT NOT NULL,
+            UNIQUE(name, emoji)
+        );
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS inventory (
+            user_id INTEGER NOT NULL,
+            item_id INTEGER NOT NULL,
+            qty INTEGER NOT NULL,
+            PRIMARY KEY (user_id, item_id),
+            FOREIGN KEY (item_id) REFERENCES items(id) ON DELETE CASCADE
+        );
+        """
+    )
+
+    # Auctions
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS auctions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            seller_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            emoji TEXT NOT NULL,
+            qty INTEGER NOT NULL,
+            start_price INTEGER NOT NULL,
+            current_bid INTEGER,
+            current_bidder_id INTEGER,
+            created_at INTEGER NOT NULL,
+            end_at INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'open',
+            winner_id INTEGER,
+            winning_bid INTEGER,
+            guild_id INTEGER
+        );
+        """
+    )
+    _add_column(conn, "auctions", "guild_id", "INTEGER")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS auction_bids (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            auction_id INTEGER NOT NULL,
+            bidder_id INTEGER NOT NULL,
+            amount INTEGER NOT NULL,
+            created_at INTEGER NOT NULL
+        );
+        """
+    )
+
+    # Auto transfer
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS auto_transfers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER NOT NULL,
+            from_user INTEGER NOT NULL,
+            to_user INTEGER NOT NULL,
+            amount INTEGER NOT NULL,
+            period_days INTEGER NOT NULL,
+            start_date TEXT NOT NULL,
+            last_date TEXT,
+            active INTEGER NOT NULL DEFAULT 1
+        );
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS auto_transfer_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ts INTEGER NOT NULL,
+            auto_id INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            message TEXT
+        );
+        """
+    )
+
+    # Teams (DB-backed)
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS teams (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            parent_id INTEGER,
+            UNIQUE(guild_id, name, parent_id)
+        );
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS user_teams (
+            guild_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            team_id INTEGER NOT NULL,
+            PRIMARY KEY (guild_id, user_id)
+        );
+        """
+    )
+
+
+def _m002_indexes(conn) -> None:
+    """Indexes for the hot paths; keep tools/check_query_plans.py passing."""
+    statements = [
+        # 30s auction closer and /경매 목록 (partial: closed auctions pile up)
+        "CREATE INDEX IF NOT EXISTS idx_auctions_open_end ON auctions(end_at) WHERE status='open'",
+        "CREATE INDEX IF NOT EXISTS idx_auctions_open_guild_end ON auctions(guild_id, end_at) WHERE status='open'",
+        # expired-patent sweep
+        "CREATE INDEX IF NOT EXISTS idx_patents_unauctioned_created ON patents(created_ts) WHERE auctioned IS NULL OR auctioned = 0",
+        "CREATE INDEX IF NOT EXISTS idx_patent_logs_guild ON patent_logs(guild_id, id)",
+        "CREATE INDEX IF NOT EXISTS idx_patent_logs_guild_user ON patent_logs(guild_id, user_id, id)",
+        # order matching at market open
+        "CREATE INDEX IF NOT EXISTS idx_orders_open_guild ON orders(guild_id, id) WHERE status='OPEN'",
+        # yesterday-not-today reminder
+        "CREATE INDEX IF NOT EXISTS idx_attendance_guild_last ON attendance(guild_id, last_date)",
+        # auto transfer scheduler and per-user listing
+        "CREATE INDEX IF NOT EXISTS idx_auto_transfers_active ON auto_transfers(id) WHERE active=1",
+        "CREATE INDEX IF NOT EXISTS idx_auto_transfers_from ON auto_transfers(guild_id, from_user, id)",
+        # range reads over ticks; the primary keys lead with ts, not category/symbol
+        "CREATE INDEX IF NOT EXISTS idx_activity_ticks_cat_ts ON activity_ticks(guild_id, category, ts)",
+        "CREATE INDEX IF NOT EXISTS idx_etf_ticks_symbol_ts ON etf_ticks(guild_id, symbol, ts, price)",
+        "CREATE INDEX IF NOT EXISTS idx_activity_indices_cat_date ON activity_indices(guild_id, category, date)",
+        # leaderboard
+        "CREATE INDEX IF NOT EXISTS idx_balances_rank ON balances(balance DESC, user_id)",
+        # misc per-guild lookups
+        "CREATE INDEX IF NOT EXISTS idx_auction_bids_auction ON auction_bids(auction_id)",
+        "CREATE INDEX IF NOT EXISTS idx_announcements_guild ON announcements(guild_id, active, id)",
+        "CREATE INDEX IF NOT EXISTS idx_teams_parent ON teams(guild_id, parent_id)",
+        "CREATE INDEX IF NOT EXISTS idx_user_teams_team ON user_teams(guild_id, team_id)",
+    ]
+    for sql in statements:
+        conn.execute(sql)
+
+
+def _m003_tick_rollups(conn) -> None:
+    """Hourly/daily OHLC rollups of the minute tick tables (see database/rollups.py)."""
+    for grain in ("hourly", "daily"):
+        conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS activity_ticks_{grain} (
+                guild_id INTEGER NOT NULL,
+                category TEXT NOT NULL,
+                bucket_ts INTEGER NOT NULL,
+                open_px REAL NOT NULL,
+                high_px REAL NOT NULL,
+                low_px REAL NOT NULL,
+                close_px REAL NOT NULL,
+                chat_count INTEGER NOT NULL DEFAULT 0,
+                react_count INTEGER NOT NULL DEFAULT 0,
+                voice_count INTEGER NOT NULL DEFAULT 0,
+                n_ticks INTEGER NOT NULL,
+                PRIMARY KEY (guild_id, category, bucket_ts)
+            );
+            """
+        )
+        conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS etf_ticks_{grain} (
+                guild_id INTEGER NOT NULL,
+                symbol TEXT NOT NULL,
+                bucket_ts INTEGER NOT NULL,
+                open_px REAL NOT NULL,
+                high_px REAL NOT NULL,
+                low_px REAL NOT NULL,
+                close_px REAL NOT NULL,
+                n_ticks INTEGER NOT NULL,
+                PRIMARY KEY (guild_id, symbol, bucket_ts)
+            );
+            """
+        )
+    # One row per KST trading day whose ticks have been rolled up
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS tick_rollups (
+            date TEXT PRIMARY KEY,
+            rolled_at INTEGER NOT NULL,
+            activity_buckets INTEGER NOT NULL,
+            etf_buckets INTEGER NOT NULL
+        );
+        """
+    )
+
+
+def _m004_guild_shards(conn) -> None:
+    """Registry of per-guild files; shard_no also picks the guild's id block."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS guild_shards (
+            guild_id INTEGER PRIMARY KEY,
+            shard_no INTEGER NOT NULL UNIQUE,
+            created_at INTEGER NOT NULL
+        );
+        """
+    )
+
+
+def _m005_patent_royalties(conn) -> None:
+    """Append-only ledger of deferred patent royalties (see database/royalties.py)."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS patent_royalties (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ts INTEGER NOT NULL,
+            guild_id INTEGER NOT NULL,
+            payer_id INTEGER NOT NULL,
+            owner_id INTEGER NOT NULL,
+            amount INTEGER NOT NULL,
+            settled_at INTEGER
+        );
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_patent_royalties_unsettled ON patent_royalties(payer_id, owner_id, amount) WHERE settled_at IS NULL")
+
+
+def _m006_order_lookup(conn) -> None:
+    """Per-user order listing for /투자 예약목록 (see database/orders.py)."""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_user ON orders(guild_id, user_id, status)")
+
+
+def _m007_index_dates(conn) -> None:
+    """Guilds and days by date for the tick rollups (see database/rollups.py)."""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_activity_indices_date ON activity_indices(date, guild_id)")
+
+
+def _m008_opening_auction_date(conn) -> None:
+    """KST date of each guild's last opening batch (see database/orders.py)."""
+    _add_column(conn, "guild_settings", "last_auction_date", "TEXT")
+
+
+MIGRATIONS = [
+    (1, "baseline schema", _m001_baseline),
+    (2, "hot-path indexes", _m002_indexes),
+    (3, "tick rollup tables", _m003_tick_rollups),
+    (4, "guild shard registry", _m004_guild_shards),
+    (5, "patent royalty ledger", _m005_patent_royalties),
+    (6, "order lookup index", _m006_order_lookup),
+    (7, "index days by date", _m007_index_dates),
+    (8, "opening batch date", _m008_opening_auction_date),
+]
+
+
+def _current_version(conn) -> int:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at INTEGER NOT NULL
+        );
+        """
+    )
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return int(row[0]) if row and row[0] is not None else 0
+
+
+def schema_version() -> int:
+    with get_conn() as conn:
+        return _current_version(conn)
+
+
+def _migrate(open_conn, scope: str | None, label: str) -> list[int]:
+    with open_conn() as conn:
+        current = _current_version(conn)
+    latest = MIGRATIONS[-1][0]
+    if current >= latest:
+        return []
+    applied = []
+    for version, name, step in MIGRATIONS:
+        if version <= current:
+            continue
+        with open_conn() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            # another process may have migrated while we waited for the lock
+            if _current_version(conn) >= version:
+                continue
+            step(conn if scope is None else _Scoped(conn, scope))
+            conn.execute(
+                "INSERT INTO schema_version(version, name, applied_at) VALUES(?, ?, ?)",
+                (version, name, int(time.time())),
+            )
+        applied.append(version)
+        print(f"[db] {label}migration {version:03d} applied: {name}")
+    return applied
+
+
+def migrate() -> list[int]:
+    """Apply pending migrations to the core file. Returns the versions applied by this call."""
+    return _migrate(get_conn, "core" if core.SHARDING else None, "")
+
+
+def migrate_shard(path: str) -> list[int]:
+    """Apply pending migrations to one guild file (guild-scoped tables only)."""
+    return _migrate(lambda: core._open(path), "guild", f"{os.path.basename(path)} ")
+
+
+__all__ = ['GLOBAL_TABLES', 'MIGRATIONS', 'migrate', 'migrate_shard', 'schema_version']
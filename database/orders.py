@@ -0,0 +1,378 @@
+"""Reserved orders (/투자 예약매수·예약매도, after-hours 매수·매도) and their book.
+
+Orders are rows in ``orders``: ``LIMIT`` orders wait for the price to cross
+their limit, ``MARKET_OPEN`` orders (placed while the market is closed) fire
+at the next tick of an open market. Matching used to read every open order
+of a guild each minute and check it against the price. Each guild now has an
+in-memory book, loaded from the open rows on first use: per symbol, BUY
+limits in a max-heap and SELL limits in a min-heap, so ``take_crossing_orders``
+only pops the orders whose limit the new price crosses, O(k log n) for k
+fills. Cancelled and filled orders leave the heaps lazily. Orders handed out
+stay reserved until ``mark_order_filled`` or ``restore_order`` (execution
+failed, e.g. not enough money) settles them. At the open,
+``run_opening_auction`` fills the overnight ``MARKET_OPEN`` orders and the
+crossing limits at the opening prices in one transaction instead of one
+trade per order. Writes from other processes are not seen;
+``reload_order_books()`` drops the books.
+"""
+
+import heapq
+import json
+import threading
+import time as _time
+
+from . import core
+from .core import get_conn
+from .inventory import INSTRUMENT_ITEM_MAP
+from .shards import guild_for_id, sharding_enabled
+from .trading import ORDER_GONE, execute_trades_batch, normalize_symbol
+
+SIDES = ("BUY", "SELL")
+
+
+def _check(symbol: str, side: str, qty: int) -> str:
+    symbol = normalize_symbol(symbol)
+    if symbol not in INSTRUMENT_ITEM_MAP:
+        raise ValueError("알 수 없는 종목입니다.")
+    if side not in SIDES:
+        raise ValueError("주문 방향은 BUY 또는 SELL이어야 합니다.")
+    if int(qty) <= 0:
+        raise ValueError("수량은 1 이상이어야 합니다.")
+    return symbol
+
+
+class _GuildBook:
+    """Open orders of one guild. Rows are
+    (id, user_id, symbol, side, qty, order_type, limit_price)."""
+
+    def __init__(self, rows):
+        self.orders: dict[int, tuple] = {}
+        self.bids: dict[str, list] = {}   # symbol -> heap of (-limit, id)
+        self.asks: dict[str, list] = {}   # symbol -> heap of (limit, id)
+        self.at_open: list[int] = []      # MARKET_OPEN ids, oldest first
+        self.stale = 0
+        for row in rows:
+            self.add(row)
+
+    def add(self, row: tuple) -> None:
+        oid = int(row[0])
+        if oid in self.orders:
+            return  # already loaded from the table
+        self.orders[oid] = row
+        self._push(row)
+
+    def _push(self, row: tuple) -> None:
+        oid, _, symbol, side, _, otype, lpx = row
+        if otype == "MARKET_OPEN":
+            self.at_open.append(oid)
+        elif side == "BUY":
+            heapq.heappush(self.bids.setdefault(symbol, []), (-float(lpx), oid))
+        else:
+            heapq.heappush(self.asks.setdefault(symbol, []), (float(lpx), oid))
+
+    def remove(self, oid: int) -> None:
+        if self.orders.pop(oid, None) is not None:
+            self.stale += 1
+            if self.stale > len(self.orders) + 64:
+                self._compact()
+
+    def _compact(self) -> None:
+        live = set(self.orders)
+        for heaps in (self.bids, self.asks):
+            for sym, heap in heaps.items():
+                heaps[sym] = [e for e in heap if e[1] in live]
+                heapq.heapify(heaps[sym])
+        self.at_open = [oid for oid in self.at_open if oid in live]
+        self.stale = 0
+
+    def take(self, prices: dict[str, float], market_open: bool) -> list[tuple]:
+        out = []
+        if market_open and self.at_open:
+            waiting = []
+            for oid in self.at_open:
+                row = self.orders.get(oid)
+                if row is not None:
+                    (out if row[2] in prices else waiting).append(row)
+            self.at_open = [row[0] for row in waiting]
+        for symbol, px in prices.items():
+            bids = self.bids.get(symbol)
+            while bids and -bids[0][0] >= px:      # buy when price <= limit
+                _, oid = heapq.heappop(bids)
+                if oid in self.orders:
+                    out.append(self.orders[oid])
+            asks = self.asks.get(symbol)
+            while asks and asks[0][0] <= px:       # sell when price >= limit
+                _, oid = heapq.heappop(asks)
+                if oid in self.orders:
+                    out.append(self.orders[oid])
+        out.sort(key=lambda r: r[0])  # oldest order first, as before
+        return out
+
+
+class OrderBooks:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded_for: str | None = None
+        self._books: dict[int, _GuildBook] = {}
+        # guild -> event lists of the loads in progress; adds and removes that
+        # commit while a load reads the table are replayed onto the new book
+        self._loading: dict[int, list[list]] = {}
+
+    def _check_path(self) -> None:
+        if self._loaded_for != core.DB_PATH:
+            self._books = {}
+            self._loading = {}
+            self._loaded_for = core.DB_PATH
+
+    def book(self, guild_id: int) -> _GuildBook:
+        gid = int(guild_id)
+        with self._lock:
+            self._check_path()
+            found = self._books.get(gid)
+            if found is not None:
+                return found
+            path = self._loaded_for
+            events: list = []
+            self._loading.setdefault(gid, []).append(events)
+        # read outside the lock so other guilds are not held up
+        try:
+            with get_conn(guild_id) as conn:
+                rows = conn.execute(
+                    "SELECT id, user_id, symbol, side, qty, order_type, limit_price FROM orders WHERE guild_id=? AND status='OPEN' ORDER BY id ASC",
+                    (guild_id,),
+                ).fetchall()
+        except BaseException:
+            with self._lock:
+                self._unregister(gid, events)
+            raise
+        with self._lock:
+            self._unregister(gid, events)
+            self._check_path()
+            found = self._books.get(gid)
+            if found is None:
+                found = _GuildBook(rows)
+                for kind, value in events:
+                    if kind == "add":
+                        found.add(value)
+                    else:
+                        found.remove(value)
+                if self._loaded_for == path:
+                    self._books[gid] = found
+            return found
+
+    def _unregister(self, gid: int, events: list) -> None:
+        loads = [e for e in self._loading.get(gid, []) if e is not events]
+        if loads:
+            self._loading[gid] = loads
+        else:
+            self._loading.pop(gid, None)
+
+    def added(self, guild_id: int, row: tuple) -> None:
+        with self._lock:
+            self._check_path()
+            found = self._books.get(int(guild_id))
+            if found is not None:  # an unloaded guild reads the row when it loads
+                found.add(row)
+            for events in self._loading.get(int(guild_id), []):
+                events.append(("add", row))
+
+    def removed(self, guild_id: int | None, order_id: int) -> None:
+        with self._lock:
+            self._check_path()
+            gids = list(self._books) if guild_id is None else [int(guild_id)]
+            for gid in gids:
+                found = self._books.get(gid)
+                if found is not None:
+                    found.remove(int(order_id))
+            loading = self._loading.values() if guild_id is None else [self._loading.get(int(guild_id), [])]
+            for loads in loading:
+                for events in loads:
+                    events.append(("remove", int(order_id)))
+
+    def take(self, guild_id: int, prices: dict[str, float], market_open: bool) -> list[tuple]:
+        found = self.book(guild_id)
+        with self._lock:
+            return found.take(prices, market_open)
+
+    def restore(self, guild_id: int, order_id: int) -> None:
+        found = self.book(guild_id)
+        with self._lock:
+            row = found.orders.get(int(order_id))
+            if row is not None:
+                found._push(row)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._books = {}
+
+
+_books = OrderBooks()
+
+
+def _insert(guild_id: int, user_id: int, symbol: str, side: str, qty: int, order_type: str, limit_price: float | None) -> int:
+    with get_conn(guild_id) as conn:
+        cur = conn.execute(
+            "INSERT INTO orders(created_ts, guild_id, user_id, symbol, side, qty, order_type, limit_price) VALUES(?, ?, ?, ?, ?, ?, ?, ?)",
+            (int(_time.time()), guild_id, user_id, symbol, side, int(qty), order_type, limit_price),
+        )
+        oid = int(cur.lastrowid)
+    _books.added(guild_id, (oid, user_id, symbol, side, int(qty), order_type, limit_price))
+    return oid
+
+
+def create_order_limit(guild_id: int, user_id: int, symbol: str, side: str, qty: int, limit_price: float) -> int:
+    symbol = _check(symbol, side, qty)
+    if not float(limit_price) > 0:
+        raise ValueError("지정가는 0보다 커야 합니다.")
+    return _insert(guild_id, user_id, symbol, side, qty, "LIMIT", float(limit_price))
+
+
+def create_order_market_open(guild_id: int, user_id: int, symbol: str, side: str, qty: int) -> int:
+    symbol = _check(symbol, side, qty)
+    return _insert(guild_id, user_id, symbol, side, qty, "MARKET_OPEN", None)
+
+
+def list_user_orders(guild_id: int, user_id: int, status: str = "OPEN"):
+    """(id, symbol, side, qty, order_type, limit_price, status, created_ts), oldest first."""
+    with get_conn(guild_id) as conn:
+        cur = conn.execute(
+            "SELECT id, symbol, side, qty, order_type, limit_price, status, created_ts FROM orders WHERE guild_id=? AND user_id=? AND status=? ORDER BY id ASC",
+            (guild_id, user_id, status),
+        )
+        return cur.fetchall()
+
+
+def cancel_order(guild_id: int, user_id: int, order_id: int) -> bool:
+    with get_conn(guild_id) as conn:
+        cur = conn.execute(
+            "UPDATE orders SET status='CANCELLED' WHERE id=? AND guild_id=? AND user_id=? AND status='OPEN'",
+            (int(order_id), guild_id, user_id),
+        )
+        ok = cur.rowcount > 0
+    if ok:
+        _books.removed(guild_id, order_id)
+    return ok
+
+
+def mark_order_filled(order_id: int, ts: int, price: float) -> bool:
+    gid = guild_for_id(order_id)
+    if gid is None and sharding_enabled():
+        return False
+    with get_conn(gid) as conn:
+        cur = conn.execute(
+            "UPDATE orders SET status='FILLED', executed_ts=?, executed_price=? WHERE id=? AND status='OPEN'",
+            (int(ts), float(price), int(order_id)),
+        )
+        ok = cur.rowcount > 0
+    _books.removed(gid, order_id)
+    return ok
+
+
+def take_crossing_orders(guild_id: int, prices: dict[str, float], market_open: bool = True) -> list[tuple]:
+    """Open orders to execute at ``prices`` (symbol -> price), oldest first.
+
+    Limit orders whose limit the price crosses, plus the ``MARKET_OPEN``
+    orders of the priced symbols when ``market_open``. They are reserved until ``mark_order_filled``
+    or ``restore_order``.
+    """
+    return _books.take(guild_id, {normalize_symbol(s): float(p) for s, p in prices.items()}, market_open)
+
+
+def restore_order(guild_id: int, order_id: int) -> None:
+    """Put a taken order that could not execute back in the book."""
+    _books.restore(guild_id, order_id)
+
+
+def _settle(guild_id: int, rows: list[tuple], prices: dict[str, float] | None, ts: int) -> list:
+    fills = [(r[1], r[2], r[3], r[4], r[0], prices[r[2]] if prices is not None else None) for r in rows]
+    try:
+        results = execute_trades_batch(guild_id, fills, ts)
+    except BaseException:
+        # nothing committed (e.g. database is locked): every taken order stays open
+        for row in rows:
+            _books.restore(guild_id, row[0])
+        raise
+    for row, res in zip(rows, results):
+        if not isinstance(res, ValueError) or str(res) == ORDER_GONE:
+            _books.removed(guild_id, row[0])
+        else:
+            _books.restore(guild_id, row[0])
+    return results
+
+
+def fill_orders(guild_id: int, rows, ts: int) -> list:
+    """Execute taken orders at the current price in one transaction.
+
+    ``rows`` come from ``take_crossing_orders``. Each trade commits together
+    with its order's FILLED mark; orders that cannot execute go back in the
+    book. Returns execute_trades_batch's per-order results.
+    """
+    return _settle(guild_id, list(rows), None, ts)
+
+
+def _claim_opening(guild_id: int, date: str) -> bool:
+    """Record ``date`` as the guild's opening batch day; False if it already ran."""
+    with get_conn(guild_id) as conn:
+        cur = conn.execute(
+            "INSERT INTO guild_settings(guild_id, last_auction_date) VALUES(?, ?)\n"
+            "             ON CONFLICT(guild_id) DO UPDATE SET last_auction_date=excluded.last_auction_date\n"
+            "             WHERE last_auction_date IS NULL OR last_auction_date < excluded.last_auction_date",
+            (guild_id, date),
+        )
+        return cur.rowcount > 0
+
+
+def run_opening_auction(guild_id: int, prices: dict[str, float], ts: int, date: str | None = None) -> list[tuple] | None:
+    """Opening batch of one guild.
+
+    The market is the counterparty to every fill, so there is no price to
+    uncross: ``MARKET_OPEN`` orders fill at the opening ``prices`` (symbol ->
+    price), limits only where that price crosses them, at that price, as
+    ``take_crossing_orders`` would. All of them settle in one transaction;
+    orders that fail stay in the book. Returns (order row, price, result)
+    per order taken, result being execute_trades_batch's.
+
+    With ``date`` (KST ``YYYY-MM-DD``) the batch runs once per guild and day:
+    the day is stored in ``guild_settings`` first, so a restart does not run
+    it again, and None is returned when it already ran. If the batch fails
+    the day is cleared again and the next call retries.
+    """
+    if date is not None and not _claim_opening(guild_id, date):
+        return None
+    try:
+        prices = {normalize_symbol(s): float(p) for s, p in prices.items()}
+        rows = _books.take(guild_id, prices, True)
+        if not rows:
+            return []
+        results = _settle(guild_id, rows, prices, ts)
+    except BaseException:
+        if date is not None:
+            with get_conn(guild_id) as conn:
+                conn.execute("UPDATE guild_settings SET last_auction_date=NULL WHERE guild_id=? AND last_auction_date=?", (guild_id, date))
+        raise
+    return [(row, prices[row[2]], res) for row, res in zip(rows, results)]
+
+
+def reload_order_books() -> None:
+    _books.clear()
+
+
+def list_instrument_holdings(user_id: int) -> list[tuple[str, int]]:
+    """(symbol, qty) of the instrument items the user holds."""
+    names = sorted({name for _, name in INSTRUMENT_ITEM_MAP.values()})
+    with get_conn() as conn:
+        cur = conn.execute(
+            """
+            SELECT i.name, SUM(inv.qty) FROM inventory AS inv JOIN items AS i ON i.id = inv.item_id
+            WHERE inv.user_id=? AND inv.qty > 0 AND i.name IN (SELECT value FROM json_each(?))
+            GROUP BY i.name ORDER BY i.name ASC
+            """,
+            (user_id, json.dumps(names)),
+        )
+        return [(str(name), int(qty)) for name, qty in cur.fetchall()]
+
+
+__all__ = [
+    'create_order_limit','create_order_market_open','list_user_orders','cancel_order','mark_order_filled',
+    'take_crossing_orders','restore_order','fill_orders','run_opening_auction','reload_order_books','list_instrument_holdings',
+]
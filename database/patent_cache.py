@@ -0,0 +1,342 @@
+"""Per-guild patent state for the message path: participants, words, matcher.
+
+``find_patent_hits`` used to read every patent row of the guild and test
+``w in text`` per word on each message, O(patents x message length). Here
+each guild's casefolded words are compiled into an Aho-Corasick automaton
+once, so a message is scanned in one pass whatever the patent count, and
+the owner/price of every word is kept next to it. The guild's participant
+set is kept too, so a message from someone who never joined costs no
+database work at all (``peek_patent_participant``). ``reload_patent_cache()``
+loads every guild that has participants once at startup; after that a guild
+with nobody in the game is known to be empty.
+
+Updates are incremental: a word added since the last build is checked with
+a plain substring test (C speed, cheap for a handful of words) until
+COMPACT_AT of them pile up and the automaton is rebuilt on the next scan; a
+cancelled word is only dropped from the word map, which filters the
+matches; an owner or price change just updates the map. Sync uses TEMP triggers on ``patents`` like the
+rank index (``leaderboard.py``): the touched (guild, word) rows are read back
+when the ``get_conn()`` block commits, so ``add_patent``, ``cancel_patent``,
+``transfer_patent`` and auction settlement are all covered; triggers on
+``patent_participants`` do the same for joins and leaves. Writes from other
+processes are not seen; ``reload_patent_cache()`` reads everything again.
+``DB_PATENT_CACHE=0`` turns the cache off and ``find_patent_hits`` reads the
+table again.
+
+Censoring: a scan also keeps where each word matched (``PatentScan``), so
+``PatentScan.censor`` wraps the merged spans in spoiler markup in one pass
+without searching the text again. Offsets come from the casefolded text and
+are only reused when casefolding kept the length (it never merges
+characters, so equal length means a 1:1 mapping); otherwise, and when the
+cache is off, one alternation pattern over the censored words (longest
+first, cached) does a single substitution.
+"""
+
+import functools
+import os
+import re
+import sqlite3
+import threading
+from collections import deque
+
+from . import core
+from .shards import guild_scopes
+
+ENABLED = os.environ.get("DB_PATENT_CACHE", "1") == "1"
+COMPACT_AT = 64
+
+
+class _Automaton:
+    """Aho-Corasick automaton over a fixed set of words."""
+
+    __slots__ = ("_goto", "_fail", "_out")
+
+    def __init__(self, words):
+        goto: list[dict[str, int]] = [{}]
+        out: list[tuple[str, ...]] = [()]
+        for w in words:
+            s = 0
+            for ch in w:
+                nxt = goto[s].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[s][ch] = nxt
+                    goto.append({})
+                    out.append(())
+                s = nxt
+            if s:
+                out[s] = (w,)
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            s = queue.popleft()
+            for ch, t in goto[s].items():
+                queue.append(t)
+                f = fail[s]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[t] = goto[f].get(ch, 0)
+                if out[fail[t]]:
+                    out[t] = out[t] + out[fail[t]]
+        self._goto, self._fail, self._out = goto, fail, out
+
+    def words_at(self, state: int) -> tuple[str, ...]:
+        return self._out[state]
+
+    def scan(self, text: str, ends: list) -> None:
+        """Append (index, state) for every index of ``text`` where at least one word ends."""
+        goto, fail, out = self._goto, self._fail, self._out
+        root_get = goto[0].get
+        s = 0
+        for i, ch in enumerate(text):
+            if s:
+                g = goto[s]
+                while ch not in g:
+                    s = fail[s]
+                    if not s:
+                        break
+                    g = goto[s]
+                else:
+                    s = g[ch]
+                    if out[s]:
+                        ends.append((i, s))
+                    continue
+            s = root_get(ch, 0)
+            if s and out[s]:
+                ends.append((i, s))
+
+
+@functools.lru_cache(maxsize=256)
+def _censor_pattern(words: frozenset) -> re.Pattern:
+    return re.compile("|".join(re.escape(w) for w in sorted(words, key=len, reverse=True)), re.IGNORECASE)
+
+
+def censor_text(content: str, words) -> str:
+    """Wrap every occurrence of ``words`` (case-insensitive) in ``||`` with one regex pass."""
+    words = frozenset(w for w in words if w)
+    if not words:
+        return content
+    return _censor_pattern(words).sub(lambda m: f"||{m.group(0)}||", content)
+
+
+class PatentScan:
+    """One message's hits and where they matched; see ``scan_patent_message``."""
+
+    __slots__ = ("content", "hits", "_spans")
+
+    def __init__(self, content: str, hits: list[tuple[str, int, int]], spans: list[tuple[int, int, str]] | None = None):
+        self.content = content
+        self.hits = hits
+        self._spans = spans  # (start, end, word) over the casefolded text, or None
+
+    def censor(self, words) -> str:
+        words = set(words)
+        if self._spans is None or len(self.content.casefold()) != len(self.content):
+            return censor_text(self.content, words)
+        spans = sorted((a, b) for a, b, w in self._spans if w in words)
+        if not spans:
+            return self.content
+        parts, pos = [], 0
+        start, end = spans[0]
+        for a, b in spans[1:]:
+            if a <= end:
+                end = max(end, b)
+                continue
+            parts += [self.content[pos:start], "||", self.content[start:end], "||"]
+            pos, (start, end) = end, (a, b)
+        parts += [self.content[pos:start], "||", self.content[start:end], "||", self.content[end:]]
+        return "".join(parts)
+
+
+class _GuildPatents:
+    def __init__(self, rows, members):
+        self.words: dict[str, tuple[int, int]] = {str(w): (int(o), int(p)) for o, w, p in rows if w}
+        self.members: set[int] = set(members)
+        self.main = _Automaton(self.words)
+        self.compiled = set(self.words)
+        self.added: list[str] = []  # not in ``main`` yet
+
+    def put(self, word: str, owner_id: int, price: int) -> None:
+        self.words[word] = (owner_id, price)
+        if word not in self.compiled:
+            self.compiled.add(word)
+            self.added.append(word)
+
+    def drop(self, word: str) -> None:
+        self.words.pop(word, None)  # stays in the automaton; matches are filtered by ``words``
+
+    def scan(self, text: str) -> tuple[list[tuple[str, int, int]], list[tuple[int, int, str]]]:
+        """Hits (word, owner, price) in order of first end position, and every (start, end, word) span."""
+        if len(self.added) >= COMPACT_AT or len(self.compiled) > 2 * len(self.words) + COMPACT_AT:
+            self.main = _Automaton(self.words)
+            self.compiled = set(self.words)
+            self.added = []
+        ends: list[tuple[int, int]] = []
+        self.main.scan(text, ends)
+        words, words_at = self.words, self.main.words_at
+        found: dict[str, None] = {}
+        spans = []
+        for i, state in ends:
+            for w in words_at(state):
+                if w in words:
+                    found[w] = None
+                    spans.append((i + 1 - len(w), i + 1, w))
+        for w in self.added:
+            j = text.find(w)
+            while j >= 0:
+                found[w] = None
+                spans.append((j, j + len(w), w))
+                j = text.find(w, j + 1)
+        return [(w, *words[w]) for w in found if w in words], spans
+
+
+class PatentCache:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded_for: str | None = None
+        self._guilds: dict[int, _GuildPatents] = {}
+        self._complete = False  # every guild with participants is in ``_guilds``
+
+    def _reset(self) -> None:
+        self._guilds = {}
+        self._complete = False
+        self._loaded_for = core.DB_PATH
+
+    def _load(self, conn: sqlite3.Connection, guild_id: int) -> _GuildPatents:
+        rows = conn.execute("SELECT owner_id, word, price FROM patents WHERE guild_id=?", (guild_id,)).fetchall()
+        members = conn.execute("SELECT user_id FROM patent_participants WHERE guild_id=?", (guild_id,)).fetchall()
+        g = self._guilds[guild_id] = _GuildPatents(rows, (int(u) for (u,) in members))
+        return g
+
+    def load(self) -> None:
+        """Read every guild that has participants."""
+        with self._lock:
+            core.init_db()
+            self._reset()
+            for scope in guild_scopes():
+                with core.get_conn(scope) as conn:
+                    for (gid,) in conn.execute("SELECT DISTINCT guild_id FROM patent_participants").fetchall():
+                        self._load(conn, int(gid))
+            self._complete = True
+
+    def _guild(self, guild_id: int) -> _GuildPatents:
+        if self._loaded_for != core.DB_PATH:
+            self._reset()
+        g = self._guilds.get(guild_id)
+        if g is None:
+            with core.get_conn(guild_id) as conn:
+                g = self._load(conn, guild_id)
+        return g
+
+    def scan(self, guild_id: int, text: str) -> tuple[list[tuple[str, int, int]], list[tuple[int, int, str]]]:
+        with self._lock:
+            return self._guild(int(guild_id)).scan(text)
+
+    def is_participant(self, guild_id: int, user_id: int) -> bool:
+        with self._lock:
+            known = self.peek_participant(guild_id, user_id)
+            if known is not None:
+                return known
+            return int(user_id) in self._guild(int(guild_id)).members
+
+    def peek_participant(self, guild_id: int, user_id: int) -> bool | None:
+        """Membership from memory only; None when the guild has not been read yet.
+
+        Lock-free (single dict and set lookups), so the event loop never waits
+        behind a scan running in a database thread.
+        """
+        if self._loaded_for != core.DB_PATH:
+            return None
+        g = self._guilds.get(int(guild_id))
+        if g is None:
+            return False if self._complete else None
+        return int(user_id) in g.members
+
+    def refresh(self, conn: sqlite3.Connection, words: set[tuple[int, str]], members: set[tuple[int, int]]) -> None:
+        """Read the committed rows of the touched (guild, word) and (guild, user) pairs through ``conn`` and apply them."""
+        with self._lock:
+            if self._loaded_for != core.DB_PATH:
+                return
+            try:
+                for gid, word in words:
+                    g = self._guilds.get(gid)
+                    if g is None:
+                        continue  # not loaded yet; the first read sees fresh rows
+                    row = conn.execute("SELECT owner_id, price FROM patents WHERE guild_id=? AND word=?", (gid, word)).fetchone()
+                    if row is None:
+                        g.drop(word)
+                    else:
+                        g.put(word, int(row[0]), int(row[1]))
+                for gid, uid in members:
+                    g = self._guilds.get(gid)
+                    if g is None:
+                        if self._complete:
+                            self._load(conn, gid)  # first participant of the guild since startup
+                        continue
+                    if conn.execute("SELECT 1 FROM patent_participants WHERE guild_id=? AND user_id=?", (gid, uid)).fetchone():
+                        g.members.add(uid)
+                    else:
+                        g.members.discard(uid)
+            except sqlite3.Error:
+                self._reset()  # reload on next use rather than charge a stale owner
+
+
+_TRIGGERS = (
+    "CREATE TEMP TRIGGER IF NOT EXISTS _patent_ins AFTER INSERT ON {schema}.patents BEGIN SELECT _patent_touch(NEW.guild_id, NEW.word); END",
+    "CREATE TEMP TRIGGER IF NOT EXISTS _patent_upd AFTER UPDATE OF guild_id, owner_id, word, price ON {schema}.patents BEGIN SELECT _patent_touch(OLD.guild_id, OLD.word), _patent_touch(NEW.guild_id, NEW.word); END",
+    "CREATE TEMP TRIGGER IF NOT EXISTS _patent_del AFTER DELETE ON {schema}.patents BEGIN SELECT _patent_touch(OLD.guild_id, OLD.word); END",
+    "CREATE TEMP TRIGGER IF NOT EXISTS _patent_join AFTER INSERT ON {schema}.patent_participants BEGIN SELECT _patent_member_touch(NEW.guild_id, NEW.user_id); END",
+    "CREATE TEMP TRIGGER IF NOT EXISTS _patent_leave AFTER DELETE ON {schema}.patent_participants BEGIN SELECT _patent_member_touch(OLD.guild_id, OLD.user_id); END",
+)
+
+
+class _Observer:
+    """Collects what each connection touches in ``patents`` and ``patent_participants``; see ``core._observers``."""
+
+    def __init__(self, cache: PatentCache):
+        self._cache = cache
+        self._words: dict = {}    # connection -> set of (guild_id, word)
+        self._members: dict = {}  # connection -> set of (guild_id, user_id)
+
+    def setup(self, conn: sqlite3.Connection) -> None:
+        schema = None
+        for _, name, _ in conn.execute("PRAGMA database_list").fetchall():
+            if name != "temp" and conn.execute(f"PRAGMA {name}.table_info(patents)").fetchall():
+                schema = name
+                break
+        if schema is None:
+            return  # the core file of a sharded setup, or a file not migrated yet
+        words, members = self._words, self._members
+        conn.create_function("_patent_touch", 2, lambda gid, word: words.setdefault(conn, set()).add((int(gid), str(word))))
+        conn.create_function("_patent_member_touch", 2, lambda gid, uid: members.setdefault(conn, set()).add((int(gid), int(uid))))
+        for trigger in _TRIGGERS:
+            conn.execute(trigger.format(schema=schema))
+
+    def committed(self, conn: sqlite3.Connection) -> None:
+        words = self._words.pop(conn, None)
+        members = self._members.pop(conn, None)
+        if words or members:
+            self._cache.refresh(conn, words or set(), members or set())
+
+    def rolled_back(self, conn: sqlite3.Connection) -> None:
+        self._words.pop(conn, None)
+        self._members.pop(conn, None)
+
+
+_cache = PatentCache()
+if ENABLED:
+    core._add_observer(_Observer(_cache))
+
+
+def get_patent_cache() -> PatentCache | None:
+    """The cache, or None when ``DB_PATENT_CACHE=0``."""
+    return _cache if ENABLED else None
+
+
+def reload_patent_cache() -> None:
+    """Read participants and patents of every active guild (at startup, or after another process changed them)."""
+    if ENABLED:
+        _cache.load()
+
+
+__all__ = ['PatentScan', 'get_patent_cache', 'reload_patent_cache']
@@ -1,24 +1,36 @@
 from .core import get_conn
+from .economy import DEFAULT_BALANCE, _apply_deltas, held_funds
+from .patent_cache import PatentScan, censor_text, get_patent_cache
+from .shards import guild_for_id, guild_scopes, sharding_enabled
+from .writebehind import enqueue_write, flush_if_pending
 import time as _time
-import re as _re
 
 
 def join_patent_game(guild_id: int, user_id: int) -> None:
-    with get_conn() as conn:
+    with get_conn(guild_id) as conn:
         conn.execute("INSERT OR IGNORE INTO patent_participants(guild_id, user_id) VALUES(?, ?)", (guild_id, user_id))
 
 
 def leave_patent_game(guild_id: int, user_id: int) -> None:
-    with get_conn() as conn:
+    with get_conn(guild_id) as conn:
         conn.execute("DELETE FROM patent_participants WHERE guild_id=? AND user_id=?", (guild_id, user_id))
 
 
 def is_patent_participant(guild_id: int, user_id: int) -> bool:
-    with get_conn() as conn:
+    cache = get_patent_cache()
+    if cache is not None:
+        return cache.is_participant(guild_id, user_id)
+    with get_conn(guild_id) as conn:
         cur = conn.execute("SELECT 1 FROM patent_participants WHERE guild_id=? AND user_id=?", (guild_id, user_id))
         return cur.fetchone() is not None
 
 
+def peek_patent_participant(guild_id: int, user_id: int) -> bool | None:
+    """Membership from memory without touching the database; None when it is not cached."""
+    cache = get_patent_cache()
+    return cache.peek_participant(guild_id, user_id) if cache is not None else None
+
+
 def patent_min_price(word: str) -> int:
     w = (word or "").strip()
     n = len(w)
@@ -48,7 +60,7 @@ def add_patent(guild_id: int, owner_id: int, word: str, price: int) -> int:
         raise ValueError("가격이 최소 요구 금액보다 낮습니다.")
     now = int(_time.time())
     key = w.casefold()
-    with get_conn() as conn:
+    with get_conn(guild_id) as conn:
         try:
             cur = conn.execute("INSERT INTO patents(guild_id, owner_id, word, price, created_ts) VALUES(?, ?, ?, ?, ?)", (guild_id, owner_id, key, int(price), now))
             pid = int(cur.lastrowid)
@@ -61,29 +73,42 @@ def add_patent(guild_id: int, owner_id: int, word: str, price: int) -> int:
 
 def cancel_patent(guild_id: int, owner_id: int, word: str) -> bool:
     key = (word or "").strip().casefold()
-    with get_conn() as conn:
+    with get_conn(guild_id) as conn:
         cur = conn.execute("DELETE FROM patents WHERE guild_id=? AND owner_id=? AND word=?", (guild_id, owner_id, key))
         return cur.rowcount > 0
 
 
 def transfer_patent(guild_id: int, from_id: int, to_id: int, word: str) -> bool:
     key = (word or "").strip().casefold()
-    with get_conn() as conn:
+    with get_conn(guild_id) as conn:
         cur = conn.execute("UPDATE patents SET owner_id=? WHERE guild_id=? AND owner_id=? AND word=?", (to_id, guild_id, from_id, key))
         return cur.rowcount > 0
 
 
 def list_patents(guild_id: int):
-    with get_conn() as conn:
+    with get_conn(guild_id) as conn:
         cur = conn.execute("SELECT owner_id, word, price FROM patents WHERE guild_id=? ORDER BY LENGTH(word) ASC, price DESC", (guild_id,))
         return [(int(oid), str(w), int(p)) for (oid, w, p) in cur.fetchall()]
 
 
+def scan_patent_message(guild_id: int, content: str) -> PatentScan:
+    """Hits of one message plus what ``PatentScan.censor`` needs to hide them without a second scan."""
+    content = content or ""
+    cache = get_patent_cache()
+    if cache is not None and content:
+        hits, spans = cache.scan(guild_id, content.casefold())
+        return PatentScan(content, hits, spans)
+    return PatentScan(content, find_patent_hits(guild_id, content))
+
+
 def find_patent_hits(guild_id: int, content: str):
     text = (content or "").casefold()
     if not text:
         return []
-    with get_conn() as conn:
+    cache = get_patent_cache()
+    if cache is not None:
+        return cache.scan(guild_id, text)[0]
+    with get_conn(guild_id) as conn:
         cur = conn.execute("SELECT owner_id, word, price FROM patents WHERE guild_id=?", (guild_id,))
         hits, seen = [], set()
         for oid, w, p in cur.fetchall():
@@ -96,34 +121,56 @@ def find_patent_hits(guild_id: int, content: str):
 
 
 def censor_words(content: str, words: list[str]) -> str:
-    s = content
-    for w in sorted(set(words), key=len, reverse=True):
-        try:
-            pat = _re.compile(_re.escape(w), _re.IGNORECASE)
-            s = pat.sub(lambda m: f"||{m.group(0)}||", s)
-        except Exception:
-            pass
-    return s
+    return censor_text(content, words)
 
 
 def log_patent_detection(guild_id: int, user_id: int, channel_id: int | None, message_id: int | None, words: list[str], total_fee: int, censored: bool) -> None:
     now = int(_time.time())
     words_str = ",".join(sorted(set([w for w in words if w])))
-    with get_conn() as conn:
+    enqueue_write(
+        "INSERT INTO patent_logs(ts, guild_id, user_id, channel_id, message_id, words, total_fee, censored) VALUES(?, ?, ?, ?, ?, ?, ?, ?)",
+        (now, guild_id, user_id, channel_id if channel_id is not None else None, message_id if message_id is not None else None, words_str, int(total_fee), 1 if censored else 0),
+        guild_id=guild_id,
+    )
+
+
+def settle_patent_usage(guild_id: int, payer_id: int, fees: dict[int, int], words: list[str], channel_id: int | None = None, message_id: int | None = None) -> bool:
+    """Charge one message's usage fees (owner id -> fee) and log it in a single transaction.
+
+    The balance check, the owner credits and payer debit (one upsert over the
+    fee map) and the ``patent_logs`` row commit together, so a message that
+    hits ten patents costs one commit. Returns False, writing nothing, when the
+    payer cannot cover the total; the caller censors and logs that case.
+    """
+    fees = {int(o): int(f) for o, f in fees.items() if int(f) > 0 and int(o) != int(payer_id)}
+    if not fees:
+        return True
+    total = sum(fees.values())
+    now = int(_time.time())
+    words_str = ",".join(sorted(set([w for w in words if w])))
+    with get_conn(guild_id) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT balance FROM balances WHERE user_id=?", (payer_id,)).fetchone()
+        if (int(row[0]) if row else DEFAULT_BALANCE) - held_funds(payer_id) < total:
+            return False
+        _apply_deltas(conn, {**fees, int(payer_id): -total})
         conn.execute(
-            "INSERT INTO patent_logs(ts, guild_id, user_id, channel_id, message_id, words, total_fee, censored) VALUES(?, ?, ?, ?, ?, ?, ?, ?)",
-            (now, guild_id, user_id, channel_id if channel_id is not None else None, message_id if message_id is not None else None, words_str, int(total_fee), 1 if censored else 0),
+            "INSERT INTO patent_logs(ts, guild_id, user_id, channel_id, message_id, words, total_fee, censored) VALUES(?, ?, ?, ?, ?, ?, ?, 0)",
+            (now, guild_id, payer_id, channel_id, message_id, words_str, total),
         )
+        return True
 
 
 def get_recent_patent_logs(guild_id: int, limit: int = 20):
-    with get_conn() as conn:
+    flush_if_pending()
+    with get_conn(guild_id) as conn:
         cur = conn.execute("SELECT ts, user_id, channel_id, message_id, words, total_fee, censored FROM patent_logs WHERE guild_id=? ORDER BY id DESC LIMIT ?", (guild_id, int(limit)))
         return [(int(ts), int(uid), (int(ch) if ch is not None else None), (int(mid) if mid is not None else None), str(words), int(fee), bool(c)) for (ts, uid, ch, mid, words, fee, c) in cur.fetchall()]
 
 
 def get_user_patent_logs(guild_id: int, user_id: int, limit: int = 20):
-    with get_conn() as conn:
+    flush_if_pending()
+    with get_conn(guild_id) as conn:
         cur = conn.execute("SELECT ts, user_id, channel_id, message_id, words, total_fee, censored FROM patent_logs WHERE guild_id=? AND user_id=? ORDER BY id DESC LIMIT ?", (guild_id, user_id, int(limit)))
         return [(int(ts), int(uid), (int(ch) if ch is not None else None), (int(mid) if mid is not None else None), str(words), int(fee), bool(c)) for (ts, uid, ch, mid, words, fee, c) in cur.fetchall()]
 
@@ -131,26 +178,33 @@ def get_user_patent_logs(guild_id: int, user_id: int, limit: int = 20):
 def list_expired_unauctioned_patents(limit: int = 50):
     now = int(_time.time())
     cutoff = now - 14 * 24 * 3600
-    with get_conn() as conn:
-        cur = conn.execute("SELECT id, guild_id, owner_id, word, price, created_ts FROM patents WHERE created_ts <= ? AND (auctioned IS NULL OR auctioned = 0) ORDER BY created_ts ASC LIMIT ?", (cutoff, int(limit)))
-        return [(int(i), int(g), int(o), str(w), int(p), int(cts)) for (i, g, o, w, p, cts) in cur.fetchall()]
+    out = []
+    for scope in guild_scopes():
+        with get_conn(scope) as conn:
+            cur = conn.execute("SELECT id, guild_id, owner_id, word, price, created_ts FROM patents WHERE created_ts <= ? AND (auctioned IS NULL OR auctioned = 0) ORDER BY created_ts ASC LIMIT ?", (cutoff, int(limit)))
+            out.extend((int(i), int(g), int(o), str(w), int(p), int(cts)) for (i, g, o, w, p, cts) in cur.fetchall())
+    out.sort(key=lambda r: r[5])
+    return out[:int(limit)]
 
 
 def mark_patent_auctioned(patent_id: int) -> None:
-    with get_conn() as conn:
+    gid = guild_for_id(patent_id)
+    if gid is None and sharding_enabled():
+        return
+    with get_conn(gid) as conn:
         conn.execute("UPDATE patents SET auctioned=1 WHERE id=?", (int(patent_id),))
 
 
 def get_patent_price(guild_id: int, word: str) -> int | None:
     key = (word or "").strip().casefold()
-    with get_conn() as conn:
+    with get_conn(guild_id) as conn:
         cur = conn.execute("SELECT price FROM patents WHERE guild_id=? AND word=?", (guild_id, key))
         row = cur.fetchone()
         return int(row[0]) if row else None
 
 __all__ = [name for name in (
-    'join_patent_game','leave_patent_game','is_patent_participant','patent_min_price','patent_usage_fee',
-    'add_patent','cancel_patent','transfer_patent','list_patents','find_patent_hits','censor_words',
-    'log_patent_detection','get_recent_patent_logs','get_user_patent_logs','list_expired_unauctioned_patents',
+    'join_patent_game','leave_patent_game','is_patent_participant','peek_patent_participant','patent_min_price','patent_usage_fee',
+    'add_patent','cancel_patent','transfer_patent','list_patents','find_patent_hits','scan_patent_message','censor_words',
+    'log_patent_detection','settle_patent_usage','get_recent_patent_logs','get_user_patent_logs','list_expired_unauctioned_patents',
     'mark_patent_auctioned','get_patent_price',
 )]
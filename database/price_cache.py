@@ -0,0 +1,113 @@
+"""Per-minute price snapshots of the four instruments.
+
+Index prices only move when the activity minute is applied, yet every quote,
+holding valuation, order check and ETF tick reread ``activity_indices``
+(three connections for ``ETF_ALL``). ``apply_minute_batch`` now publishes
+each guild's new prices here right after its commit, and ``get_symbol_price``
+fills a missing guild from one read, so intra-minute price reads are
+dictionary lookups. A snapshot belongs to one KST date; a new day misses until
+it is opened and read. Every publish takes a new version, and a read-back
+that started before a newer publish is dropped rather than stored over it.
+The last recorded ETF tick per symbol is kept alongside for the tick deltas.
+Writes from other processes are not seen.
+"""
+
+import threading
+
+from . import core
+
+# symbol -> index category; ETF_ALL is their mean
+INDEX_SYMBOLS = (("IDX_CHAT", "chat"), ("IDX_VOICE", "voice"), ("IDX_REACT", "react"))
+
+
+class PriceSnapshot:
+    """One guild's prices for ``date`` as of tick ``ts``. Read-only; publishes replace it."""
+
+    __slots__ = ("date", "ts", "version", "prices")
+
+    def __init__(self, date: str, ts: int, version: int, prices: dict[str, float]):
+        self.date = date
+        self.ts = ts
+        self.version = version
+        self.prices = prices
+
+
+_lock = threading.Lock()
+_snaps: dict[int, PriceSnapshot] = {}
+_touched: dict[int, int] = {}  # guild -> version of its last publish or drop
+_last_etf: dict[tuple[int, str], float] = {}
+_version = 0
+_loaded_for: str | None = None
+
+
+def _check_path() -> None:
+    global _loaded_for
+    if _loaded_for != core.DB_PATH:
+        _snaps.clear()
+        _touched.clear()
+        _last_etf.clear()
+        _loaded_for = core.DB_PATH
+
+
+def prices_from_indices(currents: dict[str, float]) -> dict[str, float]:
+    prices = {sym: float(currents[cat]) for sym, cat in INDEX_SYMBOLS}
+    prices["ETF_ALL"] = (prices["IDX_CHAT"] + prices["IDX_VOICE"] + prices["IDX_REACT"]) / 3.0
+    return prices
+
+
+def current_version() -> int:
+    return _version
+
+
+def publish_prices(guild_id: int, date_kst: str, ts: int, currents: dict[str, float], seen: int | None = None) -> None:
+    """Store a guild's prices from its index values (category -> current).
+
+    ``seen`` is ``current_version()`` taken before reading ``currents`` from
+    the database; the snapshot is skipped if the guild changed since.
+    """
+    global _version
+    with _lock:
+        _check_path()
+        gid = int(guild_id)
+        if seen is not None and _touched.get(gid, 0) > seen:
+            return
+        _version += 1
+        _snaps[gid] = PriceSnapshot(date_kst, int(ts), _version, prices_from_indices(currents))
+        _touched[gid] = _version
+
+
+def drop_prices(guild_id: int) -> None:
+    """Forget a guild's snapshot (its index changed outside the minute batch)."""
+    global _version
+    with _lock:
+        _check_path()
+        _version += 1
+        _snaps.pop(int(guild_id), None)
+        _touched[int(guild_id)] = _version
+
+
+def price_snapshot(guild_id: int, date_kst: str) -> PriceSnapshot | None:
+    """The guild's snapshot for ``date_kst`` without touching the database, or None."""
+    if _loaded_for != core.DB_PATH:
+        return None
+    snap = _snaps.get(int(guild_id))
+    return snap if snap is not None and snap.date == date_kst else None
+
+
+def remember_etf_price(guild_id: int, symbol: str, price: float, read_back: bool = False) -> None:
+    """Note the last recorded tick; a ``read_back`` from the table never replaces a newer one."""
+    with _lock:
+        _check_path()
+        if read_back:
+            _last_etf.setdefault((int(guild_id), symbol), float(price))
+        else:
+            _last_etf[(int(guild_id), symbol)] = float(price)
+
+
+def last_etf_price(guild_id: int, symbol: str) -> float | None:
+    if _loaded_for != core.DB_PATH:
+        return None
+    return _last_etf.get((int(guild_id), symbol))
+
+
+__all__ = ['PriceSnapshot', 'price_snapshot']
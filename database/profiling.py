@@ -0,0 +1,327 @@
+"""Opt-in instrumentation for the database package.
+
+``enable_profiling()`` (or ``DB_PROFILE=1`` at start-up) does two things:
+
+- every public function re-exported by ``database`` is replaced in the package
+  namespace by a timing wrapper (cogs call ``db.<fn>`` / ``db.aio.<fn>``, both
+  resolve through the package, so they pick the wrappers up);
+- ``get_conn()`` hands out a thin connection proxy that times each statement,
+  counts the rows fetched or changed, times ``BEGIN`` (lock wait) and
+  ``COMMIT`` separately, and logs statements slower than ``SLOW_QUERY_MS``
+  with the shapes (types) of their bound parameters, never the values.
+
+When disabled nothing is wrapped and ``get_conn()`` pays one global read.
+Latency percentiles come from the last ``SAMPLE_WINDOW`` calls per key.
+Statement time covers ``execute`` only; rows are counted as they are fetched.
+"""
+
+import atexit
+import functools
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+from . import core
+
+SLOW_QUERY_MS = float(os.environ.get("DB_SLOW_QUERY_MS", "50"))
+SAMPLE_WINDOW = int(os.environ.get("DB_PROFILE_SAMPLES", "2048"))
+SLOW_LOG_SIZE = 200
+
+# Package functions that are plumbing rather than queries.
+_NOT_WRAPPED = {'get_conn', 'close_pool', 'init_db'}
+
+_lock = threading.Lock()
+_local = threading.local()
+_originals: dict[str, object] = {}
+_functions: dict[str, "_Metric"] = {}
+_statements: dict[str, "_Metric"] = {}
+_lock_wait = None
+_commit = None
+_slow: deque = deque(maxlen=SLOW_LOG_SIZE)
+_since = 0.0
+
+
+class _Metric:
+    __slots__ = ('calls', 'errors', 'rows', 'total', 'max', 'samples')
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=SAMPLE_WINDOW)
+
+    def add(self, elapsed: float, error: bool = False) -> None:
+        self.calls += 1
+        self.total += elapsed
+        if elapsed > self.max:
+            self.max = elapsed
+        if error:
+            self.errors += 1
+        self.samples.append(elapsed)
+
+    def snapshot(self) -> dict:
+        s = sorted(self.samples)
+
+        def pct(q: float) -> float:
+            return s[min(len(s) - 1, int(q * len(s)))] * 1000 if s else 0.0
+
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'rows': self.rows,
+            'total_ms': self.total * 1000,
+            'avg_ms': self.total * 1000 / self.calls if self.calls else 0.0,
+            'max_ms': self.max * 1000,
+            'p50_ms': pct(0.50),
+            'p95_ms': pct(0.95),
+            'p99_ms': pct(0.99),
+        }
+
+
+def _metric(table: dict, key: str) -> _Metric:
+    m = table.get(key)
+    if m is None:
+        m = table[key] = _Metric()
+    return m
+
+
+def _frames() -> list:
+    frames = getattr(_local, "frames", None)
+    if frames is None:
+        frames = _local.frames = []
+    return frames
+
+
+def _shape(params) -> str:
+    if params is None:
+        return "()"
+    if isinstance(params, dict):
+        return "{" + ", ".join(f"{k}: {type(v).__name__}" for k, v in params.items()) + "}"
+    return "(" + ", ".join(type(v).__name__ for v in params) + ")"
+
+
+def _normalize(sql: str) -> str:
+    return " ".join(sql.split())
+
+
+def _add_rows(key: str, n: int) -> None:
+    if n <= 0:
+        return
+    with _lock:
+        _metric(_statements, key).rows += n
+    frames = _frames()
+    if frames:
+        frames[-1][1] += n
+
+
+def _record_statement(sql: str, shape: str, elapsed: float, error: bool) -> str:
+    key = _normalize(sql)
+    with _lock:
+        _metric(_statements, key).add(elapsed, error)
+        if key.upper().startswith("BEGIN"):
+            _lock_wait.add(elapsed, error)
+        if elapsed * 1000 >= SLOW_QUERY_MS:
+            frames = _frames()
+            _slow.append({
+                'ts': time.time(),
+                'ms': elapsed * 1000,
+                'function': frames[-1][0] if frames else None,
+                'sql': key,
+                'params': shape,
+                'error': error,
+            })
+    return key
+
+
+class _ProfiledCursor:
+    __slots__ = ('_cur', '_key')
+
+    def __init__(self, cur, key: str):
+        self._cur = cur
+        self._key = key
+
+    def fetchone(self):
+        row = self._cur.fetchone()
+        if row is not None:
+            _add_rows(self._key, 1)
+        return row
+
+    def fetchall(self):
+        rows = self._cur.fetchall()
+        _add_rows(self._key, len(rows))
+        return rows
+
+    def fetchmany(self, *args):
+        rows = self._cur.fetchmany(*args)
+        _add_rows(self._key, len(rows))
+        return rows
+
+    def __iter__(self):
+        for row in self._cur:
+            _add_rows(self._key, 1)
+            yield row
+
+    def __getattr__(self, name):
+        return getattr(self._cur, name)
+
+
+class _ProfiledConnection:
+    __slots__ = ('_conn',)
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def _run(self, method, sql: str, params, shape: str):
+        t0 = time.perf_counter()
+        try:
+            cur = method(sql, params)
+        except Exception:
+            _record_statement(sql, shape, time.perf_counter() - t0, True)
+            raise
+        key = _record_statement(sql, shape, time.perf_counter() - t0, False)
+        if cur.rowcount > 0:
+            _add_rows(key, cur.rowcount)
+        return _ProfiledCursor(cur, key)
+
+    def execute(self, sql: str, params=()):
+        return self._run(self._conn.execute, sql, params, _shape(params))
+
+    def executemany(self, sql: str, seq):
+        seq = list(seq)
+        shape = f"{len(seq)} x {_shape(seq[0])}" if seq else "0 x ()"
+        return self._run(self._conn.executemany, sql, seq, shape)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class _Hook:
+    """What ``core.get_conn`` talks to while profiling is on."""
+
+    @staticmethod
+    def wrap(conn):
+        return _ProfiledConnection(conn)
+
+    @staticmethod
+    def committed(elapsed: float) -> None:
+        with _lock:
+            _commit.add(elapsed)
+
+
+def _timed(name: str, fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        frames = _frames()
+        frame = [name, 0]
+        frames.append(frame)
+        t0 = time.perf_counter()
+        error = False
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            error = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - t0
+            frames.pop()
+            with _lock:
+                m = _metric(_functions, name)
+                m.add(elapsed, error)
+                m.rows += frame[1]
+            if frames:
+                frames[-1][1] += frame[1]
+
+    wrapper.__profiled__ = fn
+    return wrapper
+
+
+def profiling_enabled() -> bool:
+    return core._profile_hook is not None
+
+
+def enable_profiling(slow_query_ms: float | None = None) -> int:
+    """Start collecting. Returns how many package functions were wrapped."""
+    global SLOW_QUERY_MS, _since
+    if slow_query_ms is not None:
+        SLOW_QUERY_MS = float(slow_query_ms)
+    pkg = sys.modules[__package__]
+    with _lock:
+        if core._profile_hook is not None:
+            return len(_originals)
+        for name, fn in list(vars(pkg).items()):
+            if (name.startswith('_') or name in _NOT_WRAPPED or not inspect.isfunction(fn)
+                    or not fn.__module__.startswith(__package__ + '.') or fn.__module__ == __name__):
+                continue
+            _originals[name] = fn
+            setattr(pkg, name, _timed(name, fn))
+        if not _since:
+            _since = time.time()
+        core._profile_hook = _Hook
+        return len(_originals)
+
+
+def disable_profiling() -> None:
+    """Stop collecting and restore the original functions; collected data is kept."""
+    pkg = sys.modules[__package__]
+    with _lock:
+        core._profile_hook = None
+        for name, fn in _originals.items():
+            setattr(pkg, name, fn)
+        _originals.clear()
+
+
+def reset_profile() -> None:
+    global _lock_wait, _commit, _since
+    with _lock:
+        _functions.clear()
+        _statements.clear()
+        _slow.clear()
+        _lock_wait = _Metric()
+        _commit = _Metric()
+        _since = time.time() if core._profile_hook is not None else 0.0
+
+
+def get_profile() -> dict:
+    """Everything collected so far, as plain JSON-serialisable data."""
+    with _lock:
+        return {
+            'enabled': core._profile_hook is not None,
+            'since': _since or None,
+            'slow_query_ms': SLOW_QUERY_MS,
+            'functions': {k: m.snapshot() for k, m in _functions.items()},
+            'statements': {k: m.snapshot() for k, m in _statements.items()},
+            'lock_wait': _lock_wait.snapshot(),
+            'commit': _commit.snapshot(),
+            'slow_queries': list(_slow),
+        }
+
+
+def dump_profile(path: str) -> str:
+    """Write ``get_profile()`` to ``path`` as JSON; returns the path."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(get_profile(), f, ensure_ascii=False, indent=2)
+    return path
+
+
+def _dump_at_exit() -> None:
+    path = os.environ.get("DB_PROFILE_DUMP")
+    if path and (_functions or _statements):
+        try:
+            dump_profile(path)
+        except OSError as e:
+            print(f"[db] profile dump failed: {e}")
+
+
+reset_profile()
+atexit.register(_dump_at_exit)
+
+__all__ = [
+    'enable_profiling', 'disable_profiling', 'profiling_enabled',
+    'reset_profile', 'get_profile', 'dump_profile',
+]
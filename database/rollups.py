@@ -0,0 +1,242 @@
+"""Hourly/daily rollups and retention for the minute tick tables.
+
+Once a trading day has closed (21:00 KST) ``run_tick_maintenance`` folds its
+``activity_ticks`` and ``etf_ticks`` rows into ``*_hourly`` and ``*_daily``
+OHLC tables (activity rollups also keep summed chat/react/voice counts),
+records the day in ``tick_rollups``, deletes raw minute rows older than
+``RAW_TICK_RETENTION_DAYS`` (never rows of a day that is not rolled up yet)
+and reclaims the freed pages when the file uses incremental auto-vacuum.
+
+``get_etf_candles`` reads from the coarsest table that serves the requested
+timeframe and fills the not-yet-rolled tail from raw rows.
+"""
+
+import os
+import time as _time
+from datetime import datetime, timedelta
+
+from .core import get_conn, KST
+from .shards import guild_scopes
+from .trading import normalize_symbol
+from .writebehind import flush_if_pending
+
+RAW_TICK_RETENTION_DAYS = int(os.environ.get("DB_TICK_RETENTION_DAYS", "14"))
+# Pages released per maintenance run (0 = all free pages)
+VACUUM_PAGES = int(os.environ.get("DB_VACUUM_PAGES", "0"))
+MARKET_CLOSE = (21, 0)
+# Ticks recorded in the closing minute can still be in the write-behind queue
+CLOSE_GRACE_SEC = 120
+
+TIMEFRAMES = {"minute": 60, "hour": 3600, "day": 86400}
+
+# Spelled out per table (rather than formatted) so tools/check_query_plans.py sees them
+_RAW_SQL = "SELECT ts, price FROM etf_ticks WHERE guild_id=? AND symbol=? AND ts>=? ORDER BY ts ASC"
+_ROLLUP_SQL = {
+    "hour": "SELECT bucket_ts, open_px, high_px, low_px, close_px FROM etf_ticks_hourly WHERE guild_id=? AND symbol=? AND bucket_ts>=? AND bucket_ts<? ORDER BY bucket_ts ASC",
+    "day": "SELECT bucket_ts, open_px, high_px, low_px, close_px FROM etf_ticks_daily WHERE guild_id=? AND symbol=? AND bucket_ts>=? AND bucket_ts<? ORDER BY bucket_ts ASC",
+}
+_INSERT_ACTIVITY = {
+    "hourly": "INSERT OR REPLACE INTO activity_ticks_hourly(guild_id, category, bucket_ts, open_px, high_px, low_px, close_px, chat_count, react_count, voice_count, n_ticks) VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+    "daily": "INSERT OR REPLACE INTO activity_ticks_daily(guild_id, category, bucket_ts, open_px, high_px, low_px, close_px, chat_count, react_count, voice_count, n_ticks) VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+}
+_INSERT_ETF = {
+    "hourly": "INSERT OR REPLACE INTO etf_ticks_hourly(guild_id, symbol, bucket_ts, open_px, high_px, low_px, close_px, n_ticks) VALUES(?, ?, ?, ?, ?, ?, ?, ?)",
+    "daily": "INSERT OR REPLACE INTO etf_ticks_daily(guild_id, symbol, bucket_ts, open_px, high_px, low_px, close_px, n_ticks) VALUES(?, ?, ?, ?, ?, ?, ?, ?)",
+}
+
+
+def _day_start(date_kst: str) -> int:
+    return int(datetime.strptime(date_kst, "%Y-%m-%d").replace(tzinfo=KST).timestamp())
+
+
+def _last_closed_date(now_ts: int) -> str:
+    now = datetime.fromtimestamp(now_ts - CLOSE_GRACE_SEC, KST)
+    if (now.hour, now.minute) < MARKET_CLOSE:
+        now -= timedelta(days=1)
+    return now.strftime("%Y-%m-%d")
+
+
+def _rolled_until(conn) -> int:
+    """First timestamp not covered by the rollup tables (0 if nothing is rolled)."""
+    row = conn.execute("SELECT MAX(date) FROM tick_rollups").fetchone()
+    return _day_start(row[0]) + 86400 if row and row[0] else 0
+
+
+def _bucket_start(ts: int, size: int) -> int:
+    if size == 86400:
+        return int(datetime.fromtimestamp(ts, KST).replace(hour=0, minute=0, second=0).timestamp())
+    # KST is a whole-hour offset, so UTC hour/minute buckets are KST buckets too
+    return ts - ts % size
+
+
+def _fold(rows, size: int) -> list:
+    """Fold time-ordered (ts, o, h, l, c, *counts) rows into buckets of ``size`` seconds."""
+    out = []
+    for ts, o, h, l, c, *counts in rows:
+        b = _bucket_start(int(ts), size)
+        if out and out[-1][0] == b:
+            cur = out[-1]
+            cur[2] = max(cur[2], h)
+            cur[3] = min(cur[3], l)
+            cur[4] = c
+            for i, v in enumerate(counts):
+                cur[5 + i] += v
+            cur[-1] += 1
+        else:
+            out.append([b, o, h, l, c, *counts, 1])
+    return out
+
+
+def _rollup_day(conn, date_kst: str) -> tuple[int, int]:
+    start = _day_start(date_kst)
+    end = start + 86400
+    guilds = [int(r[0]) for r in conn.execute("SELECT DISTINCT guild_id FROM activity_indices WHERE date=?", (date_kst,))]
+    act_rows: dict[str, list] = {"hourly": [], "daily": []}
+    etf_rows: dict[str, list] = {"hourly": [], "daily": []}
+    for gid in guilds:
+        by_cat: dict[str, list] = {}
+        for cat, ts, v, ch, re, vo in conn.execute(
+            "SELECT category, ts, idx_value, chat_count, react_count, voice_count FROM activity_ticks WHERE guild_id=? AND ts>=? AND ts<? ORDER BY ts ASC",
+            (gid, start, end),
+        ):
+            by_cat.setdefault(cat, []).append((ts, v, v, v, v, int(ch or 0), int(re or 0), int(vo or 0)))
+        for cat, rows in by_cat.items():
+            hourly = _fold(rows, 3600)
+            # daily from hourly; the trailing tick count becomes a sum of hourly counts
+            daily = _fold([r[:-1] for r in hourly], 86400)
+            daily[0][-1] = sum(r[-1] for r in hourly)
+            act_rows["hourly"].extend((gid, cat, *r) for r in hourly)
+            act_rows["daily"].extend((gid, cat, *r) for r in daily)
+        by_sym: dict[str, list] = {}
+        for sym, ts, px in conn.execute(
+            "SELECT symbol, ts, price FROM etf_ticks WHERE guild_id=? AND ts>=? AND ts<? ORDER BY ts ASC",
+            (gid, start, end),
+        ):
+            by_sym.setdefault(sym, []).append((ts, px, px, px, px))
+        for sym, rows in by_sym.items():
+            hourly = _fold(rows, 3600)
+            daily = _fold([r[:-1] for r in hourly], 86400)
+            daily[0][-1] = sum(r[-1] for r in hourly)
+            etf_rows["hourly"].extend((gid, sym, *r) for r in hourly)
+            etf_rows["daily"].extend((gid, sym, *r) for r in daily)
+    for grain in ("hourly", "daily"):
+        conn.executemany(_INSERT_ACTIVITY[grain], act_rows[grain])
+        conn.executemany(_INSERT_ETF[grain], etf_rows[grain])
+    n_act, n_etf = len(act_rows["hourly"]), len(etf_rows["hourly"])
+    conn.execute(
+        "INSERT OR REPLACE INTO tick_rollups(date, rolled_at, activity_buckets, etf_buckets) VALUES(?, ?, ?, ?)",
+        (date_kst, int(_time.time()), n_act, n_etf),
+    )
+    return n_act, n_etf
+
+
+def rollup_closed_days(now_ts: int | None = None) -> list[str]:
+    """Roll up every closed trading day that is not rolled up yet. Returns the dates."""
+    now_ts = int(now_ts if now_ts is not None else _time.time())
+    last_closed = _last_closed_date(now_ts)
+    flush_if_pending()
+    done = set()
+    for scope in guild_scopes():
+        with get_conn(scope) as conn:
+            row = conn.execute("SELECT MAX(date) FROM tick_rollups").fetchone()
+            after = row[0] if row and row[0] else ""
+            days = [str(r[0]) for r in conn.execute(
+                "SELECT DISTINCT date FROM activity_indices WHERE date>? AND date<=? ORDER BY date ASC",
+                (after, last_closed),
+            )]
+        for d in days:
+            # one transaction per day so a crash leaves whole days behind
+            with get_conn(scope) as conn:
+                _rollup_day(conn, d)
+            done.add(d)
+    return sorted(done)
+
+
+def _index_guilds(conn) -> list[int]:
+    """Guilds with indices, one index seek each rather than a walk over every index day."""
+    out = []
+    row = conn.execute("SELECT MIN(guild_id) FROM activity_indices").fetchone()
+    while row and row[0] is not None:
+        out.append(int(row[0]))
+        row = conn.execute("SELECT MIN(guild_id) FROM activity_indices WHERE guild_id>?", (row[0],)).fetchone()
+    return out
+
+
+def prune_raw_ticks(now_ts: int | None = None, retention_days: int | None = None) -> int:
+    """Delete raw minute ticks older than the horizon that are already rolled up."""
+    now_ts = int(now_ts if now_ts is not None else _time.time())
+    days = RAW_TICK_RETENTION_DAYS if retention_days is None else int(retention_days)
+    deleted = 0
+    for scope in guild_scopes():
+        with get_conn(scope) as conn:
+            cutoff = min(now_ts - days * 86400, _rolled_until(conn))
+            if cutoff <= 0:
+                continue
+            for gid in _index_guilds(conn):
+                deleted += conn.execute("DELETE FROM activity_ticks WHERE guild_id=? AND ts<?", (gid, cutoff)).rowcount or 0
+                deleted += conn.execute("DELETE FROM etf_ticks WHERE guild_id=? AND ts<?", (gid, cutoff)).rowcount or 0
+    return deleted
+
+
+def compact_database(pages: int | None = None) -> int | None:
+    """Release free pages with ``incremental_vacuum``.
+
+    Returns the number of pages released, or None when the file was created
+    without incremental auto-vacuum (new files get it in ``core._connect``);
+    older files need one offline ``PRAGMA auto_vacuum=INCREMENTAL; VACUUM;``.
+    When sharded, the core file and every guild file are compacted and the
+    counts summed.
+    """
+    pages = VACUUM_PAGES if pages is None else int(pages)
+    released = None
+    for scope in dict.fromkeys([None] + guild_scopes()):
+        with get_conn(scope) as conn:
+            if int(conn.execute("PRAGMA auto_vacuum").fetchone()[0]) != 2:
+                continue
+            before = int(conn.execute("PRAGMA freelist_count").fetchone()[0])
+            conn.execute(f"PRAGMA incremental_vacuum({pages})" if pages > 0 else "PRAGMA incremental_vacuum").fetchall()
+            after = int(conn.execute("PRAGMA freelist_count").fetchone()[0])
+            released = (released or 0) + before - after
+    return released
+
+
+def run_tick_maintenance(now_ts: int | None = None) -> dict:
+    """Rollup, prune and compact; cheap when there is no newly closed day."""
+    rolled = rollup_closed_days(now_ts)
+    if not rolled:
+        return {'rolled': [], 'pruned': 0, 'vacuumed': None}
+    pruned = prune_raw_ticks(now_ts)
+    vacuumed = compact_database() if pruned else None
+    return {'rolled': rolled, 'pruned': pruned, 'vacuumed': vacuumed}
+
+
+def get_etf_candles(guild_id: int, symbol: str, timeframe: str, since_ts: int) -> list[tuple[int, float, float, float, float]]:
+    """(bucket_ts, open, high, low, close) for ``timeframe`` in minute/hour/day."""
+    if timeframe not in TIMEFRAMES:
+        raise ValueError(f"Unknown timeframe: {timeframe}")
+    size = TIMEFRAMES[timeframe]
+    symbol = normalize_symbol(symbol)
+    since_ts = int(since_ts)
+    flush_if_pending()
+    out: list[tuple[int, float, float, float, float]] = []
+    raw_from = since_ts
+    with get_conn(guild_id) as conn:
+        if timeframe != "minute":
+            until = _rolled_until(conn)
+            if until > since_ts:
+                cur = conn.execute(
+                    _ROLLUP_SQL[timeframe],
+                    (guild_id, symbol, _bucket_start(since_ts, size), until),
+                )
+                out = [(int(b), float(o), float(h), float(l), float(c)) for b, o, h, l, c in cur.fetchall()]
+                raw_from = max(since_ts, until)
+        cur = conn.execute(_RAW_SQL, (guild_id, symbol, raw_from))
+        raw = [(int(ts), float(px), float(px), float(px), float(px)) for ts, px in cur.fetchall()]
+    out.extend(tuple(r[:5]) for r in _fold(raw, size))
+    return out
+
+
+__all__ = [
+    'RAW_TICK_RETENTION_DAYS', 'rollup_closed_days', 'prune_raw_ticks', 'compact_database',
+    'run_tick_maintenance', 'get_etf_candles',
+]
@@ -0,0 +1,117 @@
+"""Deferred patent royalties: accrue per message, pay out in netted batches.
+
+With ``PATENT_ROYALTIES=deferred`` a message that uses patented words no
+longer moves money. ``accrue_patent_royalties`` checks the payer's spendable
+balance, holds the fee in memory (``economy.held_funds``, which every
+spending check and ``get_balance`` subtract) and commits one ledger row per
+owner in one transaction (the hold is released if that fails). The usual
+``patent_logs`` row goes through the write-behind queue, so ``/특허 로그``
+keeps showing every detection.
+
+``settle_patent_royalties`` (run every ``PATENT_ROYALTY_MINUTES`` by the patent
+cog) sums the unsettled ledger per payer/owner pair, nets every user's
+position and applies it with one upsert, marks the rows settled and releases
+the holds, one transaction per file. Holds are rebuilt from the unsettled
+rows by ``load_royalty_holds`` at startup.
+"""
+
+import os
+import time as _time
+
+from .core import get_conn
+from .economy import DEFAULT_BALANCE, _apply_deltas, _release, _reset_holds, _try_hold
+from .leaderboard import rank_index
+from .shards import guild_scopes
+from .writebehind import enqueue_write
+
+DEFERRED = os.environ.get("PATENT_ROYALTIES", "instant") == "deferred"
+SETTLE_MINUTES = int(os.environ.get("PATENT_ROYALTY_MINUTES", "5"))
+
+
+def royalties_deferred() -> bool:
+    return DEFERRED
+
+
+def _stored_balance(user_id: int) -> int:
+    idx = rank_index()
+    if idx is not None:
+        found = idx.rank_of(user_id)
+        if found is not None:
+            return found[1]
+    with get_conn() as conn:
+        row = conn.execute("SELECT balance FROM balances WHERE user_id=?", (user_id,)).fetchone()
+        return int(row[0]) if row else DEFAULT_BALANCE
+
+
+def accrue_patent_royalties(guild_id: int, payer_id: int, fees: dict[int, int], words: list[str], channel_id: int | None = None, message_id: int | None = None) -> bool:
+    """Hold one message's usage fees (owner id -> fee) for the next payout.
+
+    Returns False, holding nothing, when the payer's spendable balance cannot
+    cover the total; the caller censors and logs that case.
+    """
+    payer_id = int(payer_id)
+    fees = {int(o): int(f) for o, f in fees.items() if int(f) > 0 and int(o) != payer_id}
+    if not fees:
+        return True
+    total = sum(fees.values())
+    if not _try_hold(payer_id, total, _stored_balance(payer_id)):
+        return False
+    now = int(_time.time())
+    # the ledger is money: committed now, not left to the write-behind queue
+    try:
+        with get_conn(guild_id) as conn:
+            conn.executemany(
+                "INSERT INTO patent_royalties(ts, guild_id, payer_id, owner_id, amount) VALUES(?, ?, ?, ?, ?)",
+                [(now, guild_id, payer_id, owner_id, fee) for owner_id, fee in fees.items()],
+            )
+    except BaseException:
+        _release(payer_id, total)
+        raise
+    enqueue_write(
+        "INSERT INTO patent_logs(ts, guild_id, user_id, channel_id, message_id, words, total_fee, censored) VALUES(?, ?, ?, ?, ?, ?, ?, 0)",
+        (now, guild_id, payer_id, channel_id, message_id, ",".join(sorted(set([w for w in words if w]))), total),
+        guild_id=guild_id,
+    )
+    return True
+
+
+def settle_patent_royalties() -> int:
+    """Pay out every unsettled accrual, netted per user. Returns the amount moved."""
+    moved = 0
+    for scope in guild_scopes():
+        with get_conn(scope) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT payer_id, owner_id, SUM(amount) FROM patent_royalties WHERE settled_at IS NULL GROUP BY payer_id, owner_id"
+            ).fetchall()
+            if not rows:
+                continue
+            deltas: dict[int, int] = {}
+            paid: dict[int, int] = {}
+            for payer_id, owner_id, amount in rows:
+                payer_id, owner_id, amount = int(payer_id), int(owner_id), int(amount)
+                deltas[owner_id] = deltas.get(owner_id, 0) + amount
+                deltas[payer_id] = deltas.get(payer_id, 0) - amount
+                paid[payer_id] = paid.get(payer_id, 0) + amount
+            _apply_deltas(conn, deltas)
+            conn.execute("UPDATE patent_royalties SET settled_at=? WHERE settled_at IS NULL", (int(_time.time()),))
+        for payer_id, amount in paid.items():  # committed; the debit now carries the hold
+            _release(payer_id, amount)
+        moved += sum(paid.values())
+    return moved
+
+
+def load_royalty_holds() -> None:
+    """Rebuild the holds from the unsettled accruals (startup, after a restart)."""
+    holds: dict[int, int] = {}
+    for scope in guild_scopes():
+        with get_conn(scope) as conn:
+            rows = conn.execute(
+                "SELECT payer_id, owner_id, SUM(amount) FROM patent_royalties WHERE settled_at IS NULL GROUP BY payer_id, owner_id"
+            ).fetchall()
+        for payer_id, _, amount in rows:
+            holds[int(payer_id)] = holds.get(int(payer_id), 0) + int(amount)
+    _reset_holds(holds)
+
+
+__all__ = ['royalties_deferred', 'accrue_patent_royalties', 'settle_patent_royalties', 'load_royalty_holds']
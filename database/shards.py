@@ -0,0 +1,160 @@
+"""Per-guild database files (``DB_SHARDING=1``).
+
+Guild-scoped tables live in ``<DB_SHARD_DIR>/guild_<id>.sqlite3``; the global
+tables (``migrations.GLOBAL_TABLES``: balances, items, inventory, ...) stay in
+the core file ``DB_PATH``, which every guild connection attaches as ``core``.
+``get_conn(guild_id)`` does the routing; this module keeps the ``guild_shards``
+registry in the core file, creates and migrates guild files on first use and
+maps row ids back to guilds.
+
+Row ids: every guild file has a shard number and its AUTOINCREMENT tables
+count up from ``shard_no * ID_BLOCK``, so functions that only get an id
+(``place_bid``, ``mark_patent_auctioned``, ...) find the file via
+``guild_for_id``.
+
+Each file has its own WAL and writer lock. A transaction that writes both a
+guild table and a global table (bids, trades, attendance rewards) commits the
+two files one after the other, so it is not atomic across files if the
+process dies in between.
+"""
+
+import os
+import threading
+import time
+
+from . import core
+from .core import get_conn
+
+ID_BLOCK = 10 ** 9
+
+_lock = threading.Lock()
+_state_for: str | None = None
+_paths: dict[int, str] = {}       # guild_id -> migrated file path
+_guild_by_no: dict[int, int] = {}  # shard_no -> guild_id
+
+
+def sharding_enabled() -> bool:
+    return core.SHARDING
+
+
+def shard_dir() -> str:
+    return os.environ.get("DB_SHARD_DIR") or os.path.join(os.path.dirname(os.path.abspath(core.DB_PATH)), "shards")
+
+
+def _file_for(guild_id: int) -> str:
+    return os.path.join(shard_dir(), f"guild_{int(guild_id)}.sqlite3")
+
+
+def _check_state() -> None:
+    # Caches belong to one core file; start over if DB_PATH was switched
+    global _state_for
+    if _state_for != core.DB_PATH:
+        _paths.clear()
+        _guild_by_no.clear()
+        _state_for = core.DB_PATH
+
+
+def _register(guild_id: int) -> int:
+    core.init_db()
+    with get_conn() as conn:
+        row = conn.execute("SELECT shard_no FROM guild_shards WHERE guild_id=?", (guild_id,)).fetchone()
+        if row:
+            return int(row[0])
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT shard_no FROM guild_shards WHERE guild_id=?", (guild_id,)).fetchone()
+        if row:
+            return int(row[0])
+        row = conn.execute("SELECT COALESCE(MAX(shard_no), 0) + 1 FROM guild_shards").fetchone()
+        shard_no = int(row[0])
+        conn.execute("INSERT INTO guild_shards(guild_id, shard_no, created_at) VALUES(?, ?, ?)", (guild_id, shard_no, int(time.time())))
+        return shard_no
+
+
+def _seed_id_block(path: str, shard_no: int) -> None:
+    """Start every AUTOINCREMENT table of the file at the shard's id block."""
+    base = shard_no * ID_BLOCK
+    with core._open(path) as conn:
+        tables = [str(r[0]) for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND sql LIKE '%AUTOINCREMENT%'")]
+        for name in tables:
+            row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name=?", (name,)).fetchone()
+            if row is None:
+                conn.execute("INSERT INTO sqlite_sequence(name, seq) VALUES(?, ?)", (name, base))
+            elif int(row[0]) < base:
+                conn.execute("UPDATE sqlite_sequence SET seq=? WHERE name=?", (base, name))
+
+
+def shard_path(guild_id: int) -> str:
+    """File for ``guild_id``; registered, created and migrated on first use."""
+    guild_id = int(guild_id)
+    _check_state()
+    path = _paths.get(guild_id)
+    if path is not None:
+        return path
+    with _lock:
+        _check_state()
+        path = _paths.get(guild_id)
+        if path is not None:
+            return path
+        from .migrations import migrate_shard
+        shard_no = _register(guild_id)
+        path = _file_for(guild_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        migrate_shard(path)
+        _seed_id_block(path, shard_no)
+        _guild_by_no[shard_no] = guild_id
+        _paths[guild_id] = path
+        return path
+
+
+def _load_registry() -> None:
+    with get_conn() as conn:
+        rows = conn.execute("SELECT guild_id, shard_no FROM guild_shards").fetchall()
+    with _lock:
+        _check_state()
+        for gid, no in rows:
+            _guild_by_no[int(no)] = int(gid)
+
+
+def check_core_file() -> None:
+    """Refuse to run sharded on a core file that still holds guild tables."""
+    from .migrations import GLOBAL_TABLES
+    with get_conn() as conn:
+        names = [str(r[0]) for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+    leftover = sorted(n for n in names if n not in GLOBAL_TABLES and n != "schema_version" and not n.startswith("sqlite_"))
+    if leftover:
+        raise RuntimeError(
+            f"DB_SHARDING=1 but {core.DB_PATH} still has guild tables ({', '.join(leftover[:5])}, ...); "
+            "run tools/split_shards.py first"
+        )
+
+
+def guild_for_id(row_id: int) -> int | None:
+    """Guild whose file holds ``row_id``; None when not sharding or the id is unknown."""
+    if not core.SHARDING or row_id is None:
+        return None
+    _check_state()
+    no = int(row_id) // ID_BLOCK
+    gid = _guild_by_no.get(no)
+    if gid is None:
+        _load_registry()
+        gid = _guild_by_no.get(no)
+    return gid
+
+
+def guild_scopes() -> list[int | None]:
+    """Where a cross-guild sweep has to look: each guild file, or just the core file."""
+    if not core.SHARDING:
+        return [None]
+    with get_conn() as conn:
+        rows = conn.execute("SELECT guild_id FROM guild_shards ORDER BY shard_no ASC").fetchall()
+    return [int(r[0]) for r in rows]
+
+
+def list_shards() -> list[tuple[int, int, str]]:
+    """(guild_id, shard_no, path) for every registered guild file."""
+    with get_conn() as conn:
+        rows = conn.execute("SELECT guild_id, shard_no FROM guild_shards ORDER BY shard_no ASC").fetchall()
+    return [(int(g), int(n), _file_for(int(g))) for g, n in rows]
+
+
+__all__ = ['ID_BLOCK', 'sharding_enabled', 'shard_dir', 'shard_path', 'guild_for_id', 'guild_scopes', 'list_shards']
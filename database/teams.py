@@ -1,10 +1,11 @@
 from .core import get_conn
+from .guild_settings import _role_names, _update, get_guild_settings
 
 TEAM_ROOT_NAME = "__ROOT__"
 
 
 def _ensure_team_root(guild_id: int) -> int:
-    with get_conn() as conn:
+    with get_conn(guild_id) as conn:
         row = conn.execute("SELECT id FROM teams WHERE guild_id=? AND name=? AND parent_id IS NULL", (guild_id, TEAM_ROOT_NAME)).fetchone()
         if row:
             return int(row[0])
@@ -16,7 +17,7 @@ def _get_or_create_child(guild_id: int, parent_id: int, name: str) -> int:
     name = name.strip()
     if not name:
         raise ValueError("팀 이름이 비어 있습니다.")
-    with get_conn() as conn:
+    with get_conn(guild_id) as conn:
         row = conn.execute("SELECT id FROM teams WHERE guild_id=? AND name=? AND parent_id=?", (guild_id, name, parent_id)).fetchone()
         if row:
             return int(row[0])
@@ -36,7 +37,7 @@ def ensure_team_path(guild_id: int, path: str) -> int:
 
 
 def set_user_team(guild_id: int, user_id: int, team_id: int) -> None:
-    with get_conn() as conn:
+    with get_conn(guild_id) as conn:
         conn.execute(
             "INSERT INTO user_teams(guild_id, user_id, team_id) VALUES(?, ?, ?)\n             ON CONFLICT(guild_id, user_id) DO UPDATE SET team_id=excluded.team_id",
             (guild_id, user_id, team_id),
@@ -45,7 +46,7 @@ def set_user_team(guild_id: int, user_id: int, team_id: int) -> None:
 
 def clear_user_team(guild_id: int, user_id: int) -> None:
     """Remove user's team assignment (row delete)."""
-    with get_conn() as conn:
+    with get_conn(guild_id) as conn:
         conn.execute(
             "DELETE FROM user_teams WHERE guild_id=? AND user_id=?",
             (guild_id, user_id),
@@ -53,7 +54,7 @@ def clear_user_team(guild_id: int, user_id: int) -> None:
 
 
 def list_teams(guild_id: int):
-    with get_conn() as conn:
+    with get_conn(guild_id) as conn:
         cur = conn.execute(
             "SELECT id, name, parent_id FROM teams WHERE guild_id=? ORDER BY (parent_id IS NOT NULL), COALESCE(parent_id, 0), id ASC",
             (guild_id,),
@@ -62,21 +63,21 @@ def list_teams(guild_id: int):
 
 
 def list_team_members(guild_id: int, team_id: int):
-    with get_conn() as conn:
+    with get_conn(guild_id) as conn:
         cur = conn.execute("SELECT user_id FROM user_teams WHERE guild_id=? AND team_id=? ORDER BY user_id ASC", (guild_id, team_id))
         return [int(u) for (u,) in cur.fetchall()]
 
 
 def count_team_members(guild_id: int, team_id: int) -> int:
     """Count direct members assigned to a given team."""
-    with get_conn() as conn:
+    with get_conn(guild_id) as conn:
         row = conn.execute("SELECT COUNT(*) FROM user_teams WHERE guild_id=? AND team_id=?", (guild_id, team_id)).fetchone()
         return int(row[0]) if row else 0
 
 
 def count_team_subtree_members(guild_id: int, team_id: int) -> int:
     """Count members in the team including all descendant teams."""
-    with get_conn() as conn:
+    with get_conn(guild_id) as conn:
         to_visit = [int(team_id)]
         ids: list[int] = []
         while to_visit:
@@ -93,13 +94,13 @@ def count_team_subtree_members(guild_id: int, team_id: int) -> int:
 
 
 def get_team_parent(guild_id: int, team_id: int) -> int | None:
-    with get_conn() as conn:
+    with get_conn(guild_id) as conn:
         row = conn.execute("SELECT parent_id FROM teams WHERE guild_id=? AND id=?", (guild_id, team_id)).fetchone()
         return int(row[0]) if row and row[0] is not None else None
 
 
 def list_team_children(guild_id: int, parent_id: int) -> list[int]:
-    with get_conn() as conn:
+    with get_conn(guild_id) as conn:
         cur = conn.execute("SELECT id FROM teams WHERE guild_id=? AND parent_id=? ORDER BY id ASC", (guild_id, parent_id))
         return [int(i) for (i,) in cur.fetchall()]
 
@@ -122,7 +123,7 @@ def find_team_by_path(guild_id: int, path: str) -> int | None:
     tokens = [t for t in (path or "").split() if t]
     if not tokens:
         return None
-    with get_conn() as conn:
+    with get_conn(guild_id) as conn:
         # get root id
         root = conn.execute(
             "SELECT id FROM teams WHERE guild_id=? AND name=? AND parent_id IS NULL",
@@ -141,7 +142,7 @@ def find_team_by_path(guild_id: int, path: str) -> int | None:
 
 def get_descendant_team_ids(guild_id: int, team_id: int) -> list[int]:
     ids: list[int] = []
-    with get_conn() as conn:
+    with get_conn(guild_id) as conn:
         to_visit = [int(team_id)]
         while to_visit:
             cur = to_visit.pop()
@@ -155,7 +156,7 @@ def clear_membership_subtree(guild_id: int, team_id: int) -> int:
     ids = get_descendant_team_ids(guild_id, team_id)
     if not ids:
         return 0
-    with get_conn() as conn:
+    with get_conn(guild_id) as conn:
         q = ",".join(["?"] * len(ids))
         cur = conn.execute(
             f"DELETE FROM user_teams WHERE guild_id=? AND team_id IN ({q})",
@@ -174,7 +175,7 @@ def delete_empty_ancestors(guild_id: int, team_id: int) -> int:
     parent = get_team_parent(guild_id, team_id)
     while parent is not None:
         # stop at root
-        with get_conn() as conn:
+        with get_conn(guild_id) as conn:
             row = conn.execute("SELECT name, parent_id FROM teams WHERE guild_id=? AND id=?", (guild_id, parent)).fetchone()
         if not row:
             break
@@ -188,7 +189,7 @@ def delete_empty_ancestors(guild_id: int, team_id: int) -> int:
         if team_subtree_has_members(guild_id, parent):
             break
         # delete this parent and move up
-        with get_conn() as conn:
+        with get_conn(guild_id) as conn:
             conn.execute("DELETE FROM teams WHERE guild_id=? AND id=?", (guild_id, parent))
         deleted += 1
         parent = get_team_parent(guild_id, parent)
@@ -203,7 +204,7 @@ def delete_team_path_atomic(guild_id: int, path: str) -> tuple[int, int]:
     tokens = [t for t in (path or "").split() if t]
     if not tokens:
         return (0, 0)
-    with get_conn() as conn:
+    with get_conn(guild_id) as conn:
         conn.execute("BEGIN IMMEDIATE")
         # find root
         row = conn.execute(
@@ -297,7 +298,7 @@ def delete_team_path_atomic(guild_id: int, path: str) -> tuple[int, int]:
 
 def team_subtree_has_members(guild_id: int, team_id: int) -> bool:
     """Return True if any user is assigned to the given team or its descendants."""
-    with get_conn() as conn:
+    with get_conn(guild_id) as conn:
         # gather subtree ids via DFS
         to_visit = [int(team_id)]
         ids: list[int] = []
@@ -317,7 +318,7 @@ def team_subtree_has_members(guild_id: int, team_id: int) -> bool:
 
 def delete_team_subtree(guild_id: int, team_id: int) -> int:
     """Delete the team and all its descendant teams. Returns deleted row count."""
-    with get_conn() as conn:
+    with get_conn(guild_id) as conn:
         # collect subtree
         to_visit = [int(team_id)]
         ids: list[int] = []
@@ -340,7 +341,7 @@ def prune_empty_upwards(guild_id: int, team_id: int | None) -> int:
     if team_id is None:
         return 0
     deleted = 0
-    with get_conn() as conn:
+    with get_conn(guild_id) as conn:
         # fetch root id to protect
         row = conn.execute("SELECT id FROM teams WHERE guild_id=? AND name=? AND parent_id IS NULL", (guild_id, TEAM_ROOT_NAME)).fetchone()
         root_id = int(row[0]) if row else None
@@ -349,7 +350,7 @@ def prune_empty_upwards(guild_id: int, team_id: int | None) -> int:
         if root_id is not None and cur_id == root_id:
             break
         # if team no longer exists, stop
-        with get_conn() as conn:
+        with get_conn(guild_id) as conn:
             row = conn.execute("SELECT id, parent_id FROM teams WHERE guild_id=? AND id=?", (guild_id, cur_id)).fetchone()
         if not row:
             break
@@ -365,7 +366,7 @@ def prune_empty_upwards(guild_id: int, team_id: int | None) -> int:
     return deleted
 
 def get_user_team_id(guild_id: int, user_id: int) -> int | None:
-    with get_conn() as conn:
+    with get_conn(guild_id) as conn:
         row = conn.execute(
             "SELECT team_id FROM user_teams WHERE guild_id=? AND user_id=?",
             (guild_id, user_id),
@@ -378,7 +379,7 @@ def get_team_path_names(guild_id: int, team_id: int) -> list[str]:
 
     If the team_id is invalid or points to the synthetic root, returns [].
     """
-    with get_conn() as conn:
+    with get_conn(guild_id) as conn:
         # build upward then reverse
         names: list[str] = []
         cur_id = int(team_id)
@@ -403,25 +404,17 @@ def set_rank_roles(guild_id: int, role_names: list[str]) -> None:
     """Store the list of rank role names in guild_settings.rank_role_names (CSV)."""
     role_names = [r.strip() for r in role_names if r and r.strip()]
     csv = ",".join(role_names)
-    with get_conn() as conn:
+    with get_conn(guild_id) as conn:
         conn.execute(
             "INSERT INTO guild_settings(guild_id, rank_role_names) VALUES(?, ?)\n             ON CONFLICT(guild_id) DO UPDATE SET rank_role_names=excluded.rank_role_names",
             (guild_id, csv),
         )
+    _update(guild_id, rank_role_names=_role_names(csv))
 
 
 def get_rank_roles(guild_id: int) -> list[str]:
     """Get configured rank role names, or default list if not set."""
-    default = ["회장", "사장", "부장", "차장", "과장", "대리", "사수", "부사수", "신입"]
-    with get_conn() as conn:
-        row = conn.execute(
-            "SELECT rank_role_names FROM guild_settings WHERE guild_id=?",
-            (guild_id,),
-        ).fetchone()
-        if not row or row[0] is None or str(row[0]).strip() == "":
-            return default
-        names = [n.strip() for n in str(row[0]).split(",")]
-        return [n for n in names if n]
+    return list(get_guild_settings(guild_id).rank_role_names)
 
 
 __all__ = [
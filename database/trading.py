@@ -1,9 +1,14 @@
 from .core import get_conn, KST
-from .inventory import instrument_item, grant_item, discard_item
-from .activity import get_index_bounds, ensure_indices_for_day
+from .writebehind import enqueue_write, flush_if_pending
+from .economy import DEFAULT_BALANCE, held_funds
+from .inventory import _get_or_create_item, instrument_item
+from .activity import _read_snapshots, ensure_indices_for_day, get_index_snapshots
+from .price_cache import INDEX_SYMBOLS, current_version, last_etf_price, price_snapshot, prices_from_indices, publish_prices, remember_etf_price
 import time
 from datetime import datetime
 
+ORDER_GONE = "이미 처리된 주문입니다."
+
 INSTRUMENTS_DEFAULT = [
     ("IDX_CHAT", "채팅 지수", "INDEX", "chat"),
     ("IDX_VOICE", "통화 지수", "INDEX", "voice"),
@@ -29,83 +34,173 @@ def normalize_symbol(symbol: str) -> str:
 
 def get_symbol_price(guild_id: int, symbol: str, ts: int | None = None) -> float:
     symbol = normalize_symbol(symbol)
-    # Resolve current KST date and ensure indices exist for the day
+    if symbol != "ETF_ALL" and symbol not in dict(INDEX_SYMBOLS):
+        raise ValueError("Unknown symbol")
+    # Resolve current KST date; the minute's snapshot answers without I/O
     date_kst = datetime.fromtimestamp(ts, KST).strftime("%Y-%m-%d") if ts is not None else datetime.now(KST).strftime("%Y-%m-%d")
+    snap = price_snapshot(guild_id, date_kst)
+    if snap is not None:
+        return snap.prices[symbol]
+    # ensure indices exist for the day, then read all three at once and keep them
     try:
         ensure_indices_for_day(guild_id, date_kst)
     except Exception:
         pass
-    if symbol == "IDX_CHAT":
-        cur, _, _ = get_index_bounds(guild_id, date_kst, "chat")
-        return cur
-    if symbol == "IDX_VOICE":
-        cur, _, _ = get_index_bounds(guild_id, date_kst, "voice")
-        return cur
-    if symbol == "IDX_REACT":
-        cur, _, _ = get_index_bounds(guild_id, date_kst, "react")
-        return cur
-    if symbol == "ETF_ALL":
-        c1, _, _ = get_index_bounds(guild_id, date_kst, "chat")
-        c2, _, _ = get_index_bounds(guild_id, date_kst, "voice")
-        c3, _, _ = get_index_bounds(guild_id, date_kst, "react")
-        return (c1 + c2 + c3) / 3.0
-    raise ValueError("Unknown symbol")
+    seen = current_version()
+    rows = get_index_snapshots([guild_id], date_kst)
+    currents = {cat: rows[(guild_id, cat)][0] for _, cat in INDEX_SYMBOLS if (guild_id, cat) in rows}
+    if len(currents) < len(INDEX_SYMBOLS):
+        raise ValueError("Index not initialised")
+    publish_prices(guild_id, date_kst, int(time.time()), currents, seen)
+    return prices_from_indices(currents)[symbol]
 
 
-def trade_buy(guild_id: int, user_id: int, symbol: str, qty: int) -> tuple[int, float, int, int]:
+def peek_symbol_price(guild_id: int, symbol: str) -> float | None:
+    """Today's price from the minute snapshot without touching the database; None when not cached."""
+    snap = price_snapshot(guild_id, datetime.now(KST).strftime("%Y-%m-%d"))
+    return snap.prices.get(normalize_symbol(symbol)) if snap is not None else None
+
+
+def _fill(conn, guild_id: int, user_id: int, symbol: str, side: str, qty: int, price: float, ts: int, order_id: int | None) -> tuple[int, float, int, int]:
+    """One fill on ``conn`` inside the caller's transaction; raises ValueError without writing."""
     if qty <= 0:
         raise ValueError("Quantity must be positive")
-    price = float(get_symbol_price(guild_id, symbol))
     notional = int(round(price * qty))
-    ts = int(time.time())
-    with get_conn() as conn:
-        conn.execute("BEGIN IMMEDIATE")
-        cur = conn.execute("SELECT balance FROM balances WHERE user_id=?", (user_id,))
-        row = cur.fetchone()
-        bal = int(row[0]) if row else 0
-        if row is None:
-            bal = 1000
+    emo, name = instrument_item(symbol)
+    cur = conn.execute("SELECT balance FROM balances WHERE user_id=?", (user_id,))
+    row = cur.fetchone()
+    bal = int(row[0]) if row else None
+    if side == "BUY":
+        if bal is None:
+            bal = DEFAULT_BALANCE
             conn.execute("INSERT INTO balances(user_id, balance) VALUES(?, ?)", (user_id, bal))
-        if bal < notional:
+        if bal - held_funds(user_id) < notional:
             raise ValueError("잔액이 부족합니다.")
-        conn.execute("UPDATE balances SET balance=? WHERE user_id=?", (bal - notional, user_id))
-    emo, name = instrument_item(symbol)
-    new_qty = grant_item(user_id, name, emo, qty)
-    with get_conn() as conn:
-        conn.execute("INSERT INTO trades(ts, guild_id, user_id, symbol, side, qty, price, notional) VALUES(?, ?, ?, ?, 'BUY', ?, ?, ?)", (ts, guild_id, user_id, normalize_symbol(symbol), qty, price, notional))
-        new_bal = int(conn.execute("SELECT balance FROM balances WHERE user_id=?", (user_id,)).fetchone()[0])
+        new_bal = bal - notional
+        item_id = _get_or_create_item(conn, name, emo)
+        conn.execute(
+            "INSERT INTO inventory(user_id, item_id, qty) VALUES(?, ?, ?) ON CONFLICT(user_id, item_id) DO UPDATE SET qty=qty+excluded.qty",
+            (user_id, item_id, qty),
+        )
+        new_qty = int(conn.execute("SELECT qty FROM inventory WHERE user_id=? AND item_id=?", (user_id, item_id)).fetchone()[0])
+    elif side == "SELL":
+        row = conn.execute("SELECT id FROM items WHERE name=? AND emoji=?", (name, emo)).fetchone()
+        if not row:
+            raise ValueError("Item not found")
+        item_id = int(row[0])
+        row = conn.execute("SELECT qty FROM inventory WHERE user_id=? AND item_id=?", (user_id, item_id)).fetchone()
+        held = int(row[0]) if row else 0
+        if held < qty:
+            raise ValueError("Insufficient item quantity")
+        new_qty = held - qty
+        if new_qty == 0:
+            conn.execute("DELETE FROM inventory WHERE user_id=? AND item_id=?", (user_id, item_id))
+        else:
+            conn.execute("UPDATE inventory SET qty=? WHERE user_id=? AND item_id=?", (new_qty, user_id, item_id))
+        if bal is None:
+            bal = 0
+            conn.execute("INSERT INTO balances(user_id, balance) VALUES(?, ?)", (user_id, bal))
+        new_bal = bal + notional
+    else:
+        raise ValueError("주문 방향은 BUY 또는 SELL이어야 합니다.")
+    conn.execute("UPDATE balances SET balance=? WHERE user_id=?", (new_bal, user_id))
+    conn.execute(
+        "INSERT INTO trades(ts, guild_id, user_id, symbol, side, qty, price, notional) VALUES(?, ?, ?, ?, ?, ?, ?, ?)",
+        (ts, guild_id, user_id, normalize_symbol(symbol), side, qty, price, notional),
+    )
+    if order_id is not None:
+        cur = conn.execute(
+            "UPDATE orders SET status='FILLED', executed_ts=?, executed_price=? WHERE id=? AND status='OPEN'",
+            (ts, price, int(order_id)),
+        )
+        if cur.rowcount == 0:
+            raise ValueError(ORDER_GONE)
     return new_qty, price, notional, new_bal
 
 
+def execute_trades_batch(guild_id: int, fills, ts: int | None = None) -> list:
+    """Execute many fills of one guild in a single ``BEGIN IMMEDIATE``.
+
+    ``fills`` are (user_id, symbol, side, qty, order_id, price); ``order_id``
+    (marked FILLED with the trade, and only if still OPEN) and ``price`` (the
+    current price when None) may be None. Prices, balance checks, cash,
+    inventory, the trade rows and the order updates commit together. Each
+    fill runs under a savepoint, so one that fails (not enough money or
+    items) is rolled back alone. Returns, per fill, (qty held after, price,
+    notional, new balance) or the ValueError that stopped it.
+    """
+    ts = int(ts if ts is not None else time.time())
+    date_kst = datetime.fromtimestamp(ts, KST).strftime("%Y-%m-%d")
+    fills = [(int(u), normalize_symbol(sym), side, int(q), oid, px) for u, sym, side, q, oid, px in fills]
+    snap = price_snapshot(guild_id, date_kst)
+    seen = None
+    if snap is None and any(px is None for *_, px in fills):
+        # opening the day and flushing queued index writes take their own write locks
+        ensure_indices_for_day(guild_id, date_kst)
+        flush_if_pending()
+        seen = current_version()
+    out: list = []
+    with get_conn(guild_id) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        prices = snap.prices if snap is not None else None
+        if prices is None and seen is not None:
+            rows = _read_snapshots(conn, [guild_id], date_kst)
+            currents = {cat: rows[(guild_id, cat)][0] for _, cat in INDEX_SYMBOLS if (guild_id, cat) in rows}
+            prices = prices_from_indices(currents) if len(currents) == len(INDEX_SYMBOLS) else None
+        for user_id, symbol, side, qty, order_id, px in fills:
+            conn.execute("SAVEPOINT fill")
+            try:
+                if px is None:
+                    if prices is None or symbol not in prices:
+                        raise ValueError("Unknown symbol" if prices is not None else "Index not initialised")
+                    px = prices[symbol]
+                out.append(_fill(conn, guild_id, user_id, symbol, side, qty, float(px), ts, order_id))
+                conn.execute("RELEASE fill")
+            except ValueError as e:
+                conn.execute("ROLLBACK TO fill")
+                conn.execute("RELEASE fill")
+                out.append(e)
+    if seen is not None and prices is not None:
+        publish_prices(guild_id, date_kst, int(time.time()), {cat: prices[sym] for sym, cat in INDEX_SYMBOLS}, seen)
+    return out
+
+
+def execute_trade(guild_id: int, user_id: int, symbol: str, side: str, qty: int, order_id: int | None = None, price: float | None = None) -> tuple[int, float, int, int]:
+    """One fill in one transaction (see execute_trades_batch); raises its ValueError."""
+    res = execute_trades_batch(guild_id, [(user_id, symbol, side, qty, order_id, price)])[0]
+    if isinstance(res, ValueError):
+        raise res
+    return res
+
+
+def trade_buy(guild_id: int, user_id: int, symbol: str, qty: int) -> tuple[int, float, int, int]:
+    return execute_trade(guild_id, user_id, symbol, "BUY", qty)
+
+
 def trade_sell(guild_id: int, user_id: int, symbol: str, qty: int) -> tuple[int, float, int, int]:
-    if qty <= 0:
-        raise ValueError("Quantity must be positive")
-    price = float(get_symbol_price(guild_id, symbol))
-    proceeds = int(round(price * qty))
-    ts = int(time.time())
-    emo, name = instrument_item(symbol)
-    remaining = discard_item(user_id, name, emo, qty)
-    with get_conn() as conn:
-        cur = conn.execute("SELECT balance FROM balances WHERE user_id=?", (user_id,))
-        row = cur.fetchone()
-        bal = int(row[0]) if row else 0
-        if row is None:
-            conn.execute("INSERT INTO balances(user_id, balance) VALUES(?, ?)", (user_id, 0))
-        new_bal = bal + proceeds
-        conn.execute("UPDATE balances SET balance=? WHERE user_id=?", (new_bal, user_id))
-        conn.execute("INSERT INTO trades(ts, guild_id, user_id, symbol, side, qty, price, notional) VALUES(?, ?, ?, ?, 'SELL', ?, ?, ?)", (ts, guild_id, user_id, normalize_symbol(symbol), qty, price, proceeds))
-    return remaining, price, proceeds, new_bal
+    return execute_trade(guild_id, user_id, symbol, "SELL", qty)
 
 
 def get_last_etf_price(guild_id: int, symbol: str) -> float | None:
-    with get_conn() as conn:
+    known = last_etf_price(guild_id, normalize_symbol(symbol))
+    if known is not None:
+        return known
+    flush_if_pending()
+    with get_conn(guild_id) as conn:
         cur = conn.execute("SELECT price FROM etf_ticks WHERE guild_id=? AND symbol=? ORDER BY ts DESC LIMIT 1", (guild_id, normalize_symbol(symbol)))
         row = cur.fetchone()
-        return float(row[0]) if row else None
+        if row is None:
+            # raw ticks past the retention horizon are pruned; fall back to the last daily close
+            cur = conn.execute("SELECT close_px FROM etf_ticks_daily WHERE guild_id=? AND symbol=? ORDER BY bucket_ts DESC LIMIT 1", (guild_id, normalize_symbol(symbol)))
+            row = cur.fetchone()
+        if row is None:
+            return None
+        remember_etf_price(guild_id, normalize_symbol(symbol), float(row[0]), read_back=True)
+        return float(row[0])
 
 
 def record_etf_tick(guild_id: int, ts: int, symbol: str, price: float, delta: float) -> None:
-    with get_conn() as conn:
-        conn.execute("INSERT OR REPLACE INTO etf_ticks(guild_id, ts, symbol, price, delta) VALUES(?, ?, ?, ?, ?)", (guild_id, ts, normalize_symbol(symbol), float(price), float(delta)))
+    enqueue_write("INSERT OR REPLACE INTO etf_ticks(guild_id, ts, symbol, price, delta) VALUES(?, ?, ?, ?, ?)", (guild_id, ts, normalize_symbol(symbol), float(price), float(delta)), guild_id=guild_id)
+    remember_etf_price(guild_id, normalize_symbol(symbol), price)
 
-__all__ = ['ensure_instruments','normalize_symbol','get_symbol_price','trade_buy','trade_sell','get_last_etf_price','record_etf_tick']
+__all__ = ['ensure_instruments','normalize_symbol','get_symbol_price','peek_symbol_price','execute_trades_batch','execute_trade','trade_buy','trade_sell','get_last_etf_price','record_etf_tick']
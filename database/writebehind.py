@@ -0,0 +1,212 @@
+"""Group-commit queue for append-only, high-frequency writes.
+
+Tick rows, detection logs, bid logs and message counters do not need to be
+durable the instant they are produced. Instead of one committed transaction
+per row they are buffered here and written by a background flusher with one
+``executemany`` per statement inside a single transaction, either every
+``FLUSH_INTERVAL_MS`` or as soon as ``FLUSH_MAX_ROWS`` rows are waiting.
+
+Durability modes (``DB_DURABILITY`` or ``set_durability``):
+- ``batched`` (default): rows may be lost on a crash within one flush interval,
+  never on a clean shutdown (``shutdown_write_behind`` drains the queue).
+- ``strict``: every enqueued write commits immediately, like before.
+
+With sharding, rows are queued per guild and each guild file is flushed in
+its own transaction.
+"""
+
+import atexit
+import os
+import sqlite3
+import threading
+
+from . import core
+from .core import get_conn
+
+FLUSH_INTERVAL_MS = int(os.environ.get("DB_FLUSH_INTERVAL_MS", "200"))
+FLUSH_MAX_ROWS = int(os.environ.get("DB_FLUSH_MAX_ROWS", "5000"))
+# a row that keeps failing on its own (constraint, bad binding, missing table) is dropped after this many flushes
+FLUSH_MAX_ATTEMPTS = int(os.environ.get("DB_FLUSH_MAX_ATTEMPTS", "3"))
+DURABILITY_MODES = ("batched", "strict")
+
+_durability = os.environ.get("DB_DURABILITY", "batched")
+if _durability not in DURABILITY_MODES:
+    _durability = "batched"
+
+_pending: dict[tuple[int | None, str], list[tuple]] = {}
+_retry: list[tuple[int | None, str, tuple, int]] = []  # (guild, sql, params, failed attempts)
+_pending_rows = 0
+_inflight_rows = 0  # taken by a flush that has not committed yet
+_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_wakeup = threading.Event()
+_stop = threading.Event()
+_thread: threading.Thread | None = None
+
+
+def set_durability(mode: str) -> None:
+    global _durability
+    if mode not in DURABILITY_MODES:
+        raise ValueError(f"Unknown durability mode: {mode}")
+    if mode == "strict":
+        flush_pending_writes()
+    _durability = mode
+
+
+def get_durability() -> str:
+    return _durability
+
+
+def enqueue_write(sql: str, params: tuple, guild_id: int | None = None) -> None:
+    """Queue one parameterised statement; it is committed by the next flush.
+
+    ``guild_id`` routes the row to the guild's file when sharding.
+    """
+    global _pending_rows
+    if _durability == "strict":
+        with get_conn(guild_id) as conn:
+            conn.execute(sql, params)
+        return
+    key = (guild_id if core.SHARDING else None, sql)
+    with _lock:
+        _pending.setdefault(key, []).append(params)
+        _pending_rows += 1
+        full = _pending_rows >= FLUSH_MAX_ROWS
+    _ensure_flusher()
+    if full:
+        _wakeup.set()
+
+
+def pending_write_count() -> int:
+    return _pending_rows + _inflight_rows
+
+
+def flush_pending_writes() -> int:
+    """Write everything queued so far, one transaction per file. Returns rows written.
+
+    When a file's transaction fails on a lock the whole batch is queued again.
+    Any other failure is isolated by writing that file's rows one by one; rows
+    that still fail are retried alone on later flushes and dropped (and
+    reported) after ``FLUSH_MAX_ATTEMPTS``, so one bad row cannot stall the
+    queue. Raises while failed rows are still queued.
+    """
+    global _pending, _retry, _pending_rows, _inflight_rows
+    with _flush_lock:
+        with _lock:
+            batch, retry = _pending, _retry
+            _pending, _retry, _inflight_rows, _pending_rows = {}, [], _pending_rows, 0
+        if not batch and not retry:
+            return 0
+        try:
+            return _write_batch(batch, retry)
+        finally:
+            with _lock:
+                _inflight_rows = 0
+
+
+def _transient(e: Exception) -> bool:
+    msg = str(e).lower()
+    return isinstance(e, sqlite3.OperationalError) and ("locked" in msg or "busy" in msg)
+
+
+def _write_batch(batch: dict, retry: list) -> int:
+    global _pending, _retry, _pending_rows
+    by_guild: dict[int | None, list] = {}
+    for gid, sql, params, attempts in retry:
+        by_guild.setdefault(gid, []).append((sql, [params], attempts))
+    for (gid, sql), rows in batch.items():
+        by_guild.setdefault(gid, []).append((sql, rows, 0))
+    written = 0
+    requeue: dict[tuple[int | None, str], list[tuple]] = {}
+    failed: list[tuple[int | None, str, tuple, int]] = []
+    error = None
+    for gid, stmts in by_guild.items():
+        try:
+            with get_conn(gid) as conn:
+                for sql, rows, _ in stmts:
+                    conn.executemany(sql, rows)
+            written += sum(len(rows) for _, rows, _ in stmts)
+            continue
+        except Exception as e:
+            error = error or e
+            if _transient(e):
+                for sql, rows, attempts in stmts:
+                    if attempts:
+                        failed.extend((gid, sql, params, attempts) for params in rows)
+                    else:
+                        requeue.setdefault((gid, sql), []).extend(rows)
+                continue
+        # isolate the bad rows: each row in its own transaction
+        for sql, rows, attempts in stmts:
+            for params in rows:
+                try:
+                    with get_conn(gid) as conn:
+                        conn.execute(sql, params)
+                    written += 1
+                except Exception as e:
+                    if attempts + 1 >= FLUSH_MAX_ATTEMPTS:
+                        print(f"[db] write-behind dropped a row after {attempts + 1} attempts: {e}\n    {' '.join(sql.split())} {params!r}")
+                    else:
+                        failed.append((gid, sql, params, attempts + 1))
+    if requeue or failed:
+        # Put the failed rows back in front of anything queued meanwhile and retry next round
+        with _lock:
+            for key, rows in _pending.items():
+                requeue.setdefault(key, []).extend(rows)
+            _pending = requeue
+            _retry = failed + _retry
+            _pending_rows = sum(len(rows) for rows in requeue.values()) + len(_retry)
+        raise error
+    return written
+
+
+def flush_if_pending() -> None:
+    """Read-your-writes guard for readers of write-behind tables (cheap when idle).
+
+    Rows a running flush has taken but not committed still count, so a reader
+    arriving mid-flush waits for that commit instead of reading around it.
+    """
+    if _pending_rows or _inflight_rows:
+        flush_pending_writes()
+
+
+def _flusher() -> None:
+    interval = FLUSH_INTERVAL_MS / 1000.0
+    while not _stop.is_set():
+        _wakeup.wait(interval)
+        _wakeup.clear()
+        try:
+            flush_pending_writes()
+        except Exception as e:
+            print(f"[db] write-behind flush error: {e}")
+
+
+def _ensure_flusher() -> None:
+    global _thread
+    if _thread is not None and _thread.is_alive():
+        return
+    with _lock:
+        if _thread is not None and _thread.is_alive():
+            return
+        _stop.clear()
+        _thread = threading.Thread(target=_flusher, name="db-write-behind", daemon=True)
+        _thread.start()
+
+
+def shutdown_write_behind() -> int:
+    """Stop the flusher and drain the queue. Safe to call more than once."""
+    global _thread
+    _stop.set()
+    _wakeup.set()
+    t, _thread = _thread, None
+    if t is not None and t is not threading.current_thread():
+        t.join(timeout=10)
+    return flush_pending_writes()
+
+
+atexit.register(shutdown_write_behind)
+
+__all__ = [
+    'set_durability', 'get_durability', 'enqueue_write', 'pending_write_count',
+    'flush_pending_writes', 'flush_if_pending', 'shutdown_write_behind',
+]
@@ -0,0 +1,266 @@
+"""Replay recorded activity ticks through the index formula under other parameters.
+
+    python3 tools/backtest.py [--db PATH] [--days 7] [--guild ID]
+                              [--S 5,10,20] [--decay 0.0005,0.001] [--beta 0.5,0.8]
+                              [--chat-max 17] [--react-max 30] [--voice-max 8]
+                              [--w 0.073] [--w-voice 0.11] [--no-gap] [--sort vol] [--top 20] [--json out.json]
+
+Every comma-separated option is a grid axis; all combinations are replayed
+at once as one NumPy array per minute, over every guild and category of the
+chosen history. The replay follows ``minute_tick``: each guild and category
+starts from its recorded open, a new trading day reopens at the previous
+close with the 0.5x-2x band, and the 5-minute windows are taken from the
+earlier ticks exactly as the live rings see them.
+
+The per-minute chat, reaction and voice counts come from ``activity_ticks``
+(raw ticks are kept for ``DB_TICK_RETENTION_DAYS``). The average message gap
+is not recorded, so it is approximated as 60 s / messages in that minute
+(``--no-gap`` drops the gap bonus instead).
+
+Per parameter set it prints the volatility (std of the per-minute change),
+how often the ±1%/min clamp and the daily band were hit, and the drift (mean
+per-minute change and mean change over the whole replay), next to the same
+figures for the recorded live path (there, clamp% counts minutes that moved
+the full 1%). With the default parameters the replay reproduces the live
+path when the gap approximation holds. Needs NumPy.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import numpy as np
+except Exception:  # numpy is optional for the bot, required here
+    np = None
+
+import database as db  # noqa: E402
+from database import core, index_engine as ie  # noqa: E402
+
+PARAMS = ("S", "decay", "beta", "chat_max", "react_max", "voice_max", "w", "w_voice")
+
+
+def _floats(text: str) -> list[float]:
+    return [float(x) for x in text.split(",") if x.strip()]
+
+
+def _guilds(only: int | None) -> list[int]:
+    if only is not None:
+        return [only]
+    out: set[int] = set()
+    for scope in db.guild_scopes():
+        if scope is not None:
+            out.add(int(scope))
+            continue
+        with db.get_conn() as conn:
+            out.update(int(g) for (g,) in conn.execute("SELECT DISTINCT guild_id FROM activity_indices"))
+    return sorted(out)
+
+
+def _load(guilds: list[int], since: int) -> list[dict]:
+    """One series per guild and category: ts, date, counts, recorded values and the first open."""
+    series = []
+    for gid in guilds:
+        with db.get_conn(gid) as conn:
+            for k, cat in enumerate(ie.CATEGORIES):
+                rows = conn.execute(
+                    "SELECT ts, date, idx_value, chat_count, react_count, voice_count FROM activity_ticks "
+                    "WHERE guild_id=? AND category=? AND ts>=? ORDER BY ts",
+                    (gid, cat, since),
+                ).fetchall()
+                if not rows:
+                    continue
+                opens = dict(conn.execute(
+                    "SELECT date, open_idx FROM activity_indices WHERE guild_id=? AND category=? AND date>=?",
+                    (gid, cat, rows[0][1]),
+                ).fetchall())
+                series.append({
+                    "guild_id": gid, "cat": k,
+                    "ts": np.array([r[0] for r in rows], dtype=np.int64),
+                    "new_day": np.array([i == 0 or rows[i][1] != rows[i - 1][1] for i in range(len(rows))]),
+                    "live": np.array([r[2] for r in rows], dtype=np.float64),
+                    "live_open": np.array([float(opens.get(r[1], 100.0)) for r in rows], dtype=np.float64),
+                    "counts": np.array([r[3:6] for r in rows], dtype=np.float64),
+                })
+    return series
+
+
+def _windows(s: dict) -> tuple:
+    """Per tick: (chat, react, voice) sums of the last 5 minutes and of the same 5 minutes an hour earlier."""
+    ts, counts = s["ts"], s["counts"]
+    csum = np.vstack([np.zeros((1, 3)), np.cumsum(counts, axis=0)])
+    idx = np.arange(len(ts))
+    # current window: earlier ticks with ts - REL_WIN <= t (the tick being scored is not written yet)
+    lo = np.searchsorted(ts, ts - ie.REL_WIN, side="left")
+    cur = csum[idx] - csum[lo]
+    plo = np.searchsorted(ts, ts - ie.REL_GAP - ie.REL_WIN, side="left")
+    phi = np.searchsorted(ts, ts - ie.REL_GAP, side="right")
+    prev = csum[np.minimum(phi, idx)] - csum[np.minimum(plo, idx)]
+    return cur, prev
+
+
+def _stack(series: list[dict], no_gap: bool) -> dict:
+    """Pad every series to the longest one: arrays [N, T] (or [N, T, 3])."""
+    n, t = len(series), max(len(s["ts"]) for s in series)
+    out = {
+        "valid": np.zeros((n, t), dtype=bool),
+        "new_day": np.zeros((n, t), dtype=bool),
+        "counts": np.zeros((n, t, 3)),
+        "cur": np.zeros((n, t, 3)),
+        "prev": np.zeros((n, t, 3)),
+        "gap": np.full((n, t), 999.0),
+        "cat": np.array([s["cat"] for s in series]),
+        "open": np.array([s["live_open"][0] for s in series]),
+    }
+    for i, s in enumerate(series):
+        m = len(s["ts"])
+        cur, prev = _windows(s)
+        out["valid"][i, :m] = True
+        out["new_day"][i, :m] = s["new_day"]
+        out["counts"][i, :m] = s["counts"]
+        out["cur"][i, :m], out["prev"][i, :m] = cur, prev
+        if not no_gap:
+            chat = s["counts"][:, 0]
+            out["gap"][i, :m] = np.where(chat >= 1, 60.0 / np.maximum(chat, 1.0), 999.0)
+    return out
+
+
+def _replay(data: dict, grid: dict) -> dict:
+    """Run every parameter set (arrays of length P) over all series at once."""
+    n, t = data["valid"].shape
+    p = len(grid["S"])
+    w = np.asarray(ie.WEIGHTS)[data["cat"]]                               # [N, 3]
+    a, b, c = (w[:, j:j + 1] for j in range(3))                          # [N, 1]
+    scale = np.where(data["cat"][:, None] == 2, grid["w_voice"][None, :], grid["w"][None, :])  # [N, P]
+
+    level = np.repeat(data["open"][:, None], p, axis=1)                   # [N, P]
+    start = level.copy()
+    lower, upper = level * 0.5, level * 2.0
+    ret_sum = np.zeros(p)
+    ret_sq = np.zeros(p)
+    clamp_hits = np.zeros(p)
+    band_hits = np.zeros(p)
+    steps = 0
+    for i in range(t):
+        valid = data["valid"][:, i]
+        if not valid.any():
+            break
+        reopen = (data["new_day"][:, i] & (i > 0))[:, None]
+        lower = np.where(reopen, level * 0.5, lower)
+        upper = np.where(reopen, level * 2.0, upper)
+
+        cnt, gap = data["counts"][:, i], data["gap"][:, i:i + 1]
+        x_chat = np.minimum(cnt[:, 0:1] / grid["chat_max"], 1.0)        # [N, P]
+        x_react = np.minimum(cnt[:, 1:2] / grid["react_max"], 1.0)
+        x_voice = np.minimum(cnt[:, 2:3] / grid["voice_max"], 1.0)
+        gap_bonus = np.where(gap < 60.0, (60.0 - gap) / 60.0, 0.0)
+        base = 1.0 + scale * (a * x_chat + b * x_react + c * x_voice + 0.5 * gap_bonus)
+        cur, prev = data["cur"][:, i], data["prev"][:, i]
+        cur_w = a[:, 0] * cur[:, 0] + b[:, 0] * cur[:, 1] + c[:, 0] * cur[:, 2]
+        prev_w = a[:, 0] * prev[:, 0] + b[:, 0] * prev[:, 1] + c[:, 0] * prev[:, 2]
+        ratio = ((cur_w + 1.0) / (prev_w + 1.0))[:, None]
+        rel = np.maximum(ie.REL_MIN, np.minimum(ie.REL_MAX, 1.0 + grid["beta"] * (ratio - 1.0)))
+        raw = (base - 1.0) / grid["S"] * rel - grid["decay"]
+        pct = np.maximum(-ie.CLAMP, np.minimum(ie.CLAMP, raw))
+        new = np.minimum(np.maximum(level * (1.0 + pct), lower), upper)
+
+        v = valid[:, None]
+        r = np.where(v, new / level - 1.0, 0.0)
+        ret_sum += r.sum(axis=0)
+        ret_sq += (r * r).sum(axis=0)
+        clamp_hits += (v & (np.abs(raw) >= ie.CLAMP)).sum(axis=0)
+        band_hits += (v & ((new <= lower) | (new >= upper))).sum(axis=0)
+        steps += int(valid.sum())
+        level = np.where(v, new, level)
+    mean = ret_sum / steps
+    return {
+        "vol": np.sqrt(np.maximum(ret_sq / steps - mean * mean, 0.0)) * 100,
+        "clamp": clamp_hits / steps * 100,
+        "band": band_hits / steps * 100,
+        "drift": mean * 100,
+        "total": (level / start - 1.0).mean(axis=0) * 100,
+    }
+
+
+def _live(series: list[dict]) -> dict:
+    r, total = [], []
+    for s in series:
+        live, opens = s["live"], s["live_open"]
+        before = np.where(s["new_day"], opens, np.concatenate([[opens[0]], live[:-1]]))
+        r.append(live / before - 1.0)
+        total.append(live[-1] / opens[0] - 1.0)
+    r = np.concatenate(r)
+    return {
+        "vol": float(r.std() * 100),
+        "clamp": float((np.abs(r) >= ie.CLAMP - 1e-9).mean() * 100),
+        "band": None,
+        "drift": float(r.mean() * 100),
+        "total": float(np.mean(total) * 100),
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--db", help="database file (default: DB_PATH)")
+    ap.add_argument("--days", type=float, default=7.0, help="history to replay")
+    ap.add_argument("--guild", type=int)
+    ap.add_argument("--S", default=str(ie.S))
+    ap.add_argument("--decay", default=str(ie.DECAY))
+    ap.add_argument("--beta", default=str(ie.REL_BETA))
+    ap.add_argument("--chat-max", default=str(ie.CHAT_MAX))
+    ap.add_argument("--react-max", default=str(ie.REACT_MAX))
+    ap.add_argument("--voice-max", default=str(ie.VOICE_MAX))
+    ap.add_argument("--w", default=str(ie.SCALE[0]), help="chat/react category scaling")
+    ap.add_argument("--w-voice", default=str(ie.SCALE[2]), help="voice category scaling")
+    ap.add_argument("--no-gap", action="store_true", help="replay without the gap bonus")
+    ap.add_argument("--sort", choices=("vol", "clamp", "band", "drift", "total"), default="vol")
+    ap.add_argument("--top", type=int, default=20)
+    ap.add_argument("--json", help="also write every result to this file")
+    args = ap.parse_args()
+    if np is None:
+        sys.exit("NumPy is required: pip install numpy")
+    if args.db:
+        core.DB_PATH = args.db
+    db.init_db()
+
+    t0 = time.perf_counter()
+    series = _load(_guilds(args.guild), int(time.time() - args.days * 86400))
+    if not series:
+        sys.exit("no activity_ticks in that range")
+    data = _stack(series, args.no_gap)
+    axes = [_floats(getattr(args, name)) for name in PARAMS]
+    combos = list(itertools.product(*axes))
+    grid = {name: np.array([c[j] for c in combos]) for j, name in enumerate(PARAMS)}
+    stats = _replay(data, grid)
+    live = _live(series)
+    elapsed = time.perf_counter() - t0
+    minutes = int(data["valid"].sum())
+    print(f"{len(series)} series, {minutes:,} ticks, {len(combos)} parameter sets in {elapsed:.2f}s")
+
+    head = "  ".join(f"{name:>9}" for name in PARAMS)
+    print(f"{head}  {'vol%':>7} {'clamp%':>7} {'band%':>7} {'drift%':>9} {'total%':>8}")
+    fmt = lambda v, w, p: f"{v:>{w}.{p}f}" if v is not None else f"{'-':>{w}}"  # noqa: E731
+    print(f"{'live':>9}" + " " * (11 * (len(PARAMS) - 1))
+          + f"  {fmt(live['vol'], 7, 3)} {fmt(live['clamp'], 7, 2)} {fmt(live['band'], 7, 2)} {fmt(live['drift'], 9, 5)} {fmt(live['total'], 8, 2)}")
+    order = np.argsort(stats[args.sort])
+    for j in order[:args.top]:
+        row = "  ".join(f"{v:>9g}" for v in combos[j])
+        print(f"{row}  {stats['vol'][j]:>7.3f} {stats['clamp'][j]:>7.2f} {stats['band'][j]:>7.2f} {stats['drift'][j]:>9.5f} {stats['total'][j]:>8.2f}")
+
+    if args.json:
+        result = {
+            "series": len(series), "ticks": minutes, "live": live,
+            "runs": [dict(zip(PARAMS, combo), **{k: float(v[j]) for k, v in stats.items()}) for j, combo in enumerate(combos)],
+        }
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    core.close_pool()
+
+
+if __name__ == "__main__":
+    main()
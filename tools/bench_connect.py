@@ -0,0 +1,64 @@
+"""Micro-benchmark: connection overhead of database.get_conn with and without pooling.
+
+Builds a throw-away database with a large ``balances`` table and times
+``get_balance`` calls (one indexed lookup each, so the connection cost
+dominates) with the pool disabled (``POOL_SIZE=0``, the old
+connect-per-call path) and enabled.
+
+    python3 tools/bench_connect.py [--rows 1000000] [--calls 20000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database as db  # noqa: E402
+from database import core  # noqa: E402
+
+
+def _populate(rows: int) -> None:
+    db.init_db()
+    with db.get_conn() as conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO balances(user_id, balance) VALUES(?, ?)",
+            ((uid, random.randint(0, 1_000_000)) for uid in range(1, rows + 1)),
+        )
+
+
+def _run(label: str, pool_size: int, calls: int, rows: int) -> float:
+    core.close_pool()
+    core.POOL_SIZE = pool_size
+    uids = [random.randint(1, rows) for _ in range(calls)]
+    t0 = time.perf_counter()
+    for uid in uids:
+        db.get_balance(uid)
+    elapsed = time.perf_counter() - t0
+    per_call = elapsed / calls * 1e6
+    print(f"{label:<22} {calls:>8} calls  {elapsed:8.3f}s  {per_call:8.1f} us/call")
+    return per_call
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--calls", type=int, default=20_000)
+    args = ap.parse_args()
+
+    pool_size = core.POOL_SIZE or 4
+    with tempfile.TemporaryDirectory() as tmp:
+        core.DB_PATH = os.path.join(tmp, "bench.sqlite3")
+        print(f"populating {args.rows:,} balances rows …")
+        _populate(args.rows)
+        before = _run("connect-per-call", 0, args.calls, args.rows)
+        after = _run("pooled", pool_size, args.calls, args.rows)
+        print(f"speedup: {before / after:.1f}x")
+        core.close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""One activity-index minute for many guilds: scalar formula vs NumPy engine, and the full apply_minute_batch.
+
+    python3 tools/bench_index_tick.py [--guilds 10000] [--fixture ticks.json]
+
+Both scoring paths are checked against ``_original_minute``, a frozen copy of
+the per-category formula from the old ``cogs/activity_index.py`` minute_tick
+with its literal constants, so a regression shared by both paths still fails.
+``--fixture`` records the input set together with that formula's outputs on
+the first run; later runs replay it and compare against the recorded values.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database as db  # noqa: E402
+from database import core, index_engine  # noqa: E402
+
+DATE = "2024-01-02"
+
+
+def _fixture(guilds: int, rng: random.Random) -> dict:
+    def counts():
+        return [rng.choice([0, 0, rng.randint(0, 5), rng.randint(0, 40)]) for _ in range(3)]
+
+    def window():
+        return [[sum(counts()[m] for _ in range(5)) for m in range(3)] for _ in index_engine.CATEGORIES]
+
+    cur = [[round(rng.uniform(50, 200), 4) for _ in index_engine.CATEGORIES] for _ in range(guilds)]
+    return {
+        "counts": [counts() for _ in range(guilds)],
+        "gaps": [rng.choice([999.0, rng.uniform(0.5, 120.0)]) for _ in range(guilds)],
+        "cur_sums": [window() for _ in range(guilds)],
+        "prev_sums": [window() for _ in range(guilds)],
+        "current": cur,
+        "lower": [[v * rng.uniform(0.5, 1.0) for v in row] for row in cur],
+        "upper": [[v * rng.uniform(1.0, 1.005) for v in row] for row in cur],  # some rows hit the band
+    }
+
+
+def _original_minute(chat_c, react_c, voice_c, gap, cur_by_cat, prev_by_cat, current, lower, upper) -> list[float]:
+    """The pre-engine minute_tick scoring for one guild, kept verbatim. Do not edit."""
+    out = []
+    for i, cat in enumerate(('chat', 'react', 'voice')):
+        if cat == 'chat':
+            a, b, c = 1.0, 0.3, 0.3
+        elif cat == 'react':
+            a, b, c = 0.3, 1.0, 0.3
+        else:  # voice
+            a, b, c = 0.3, 0.3, 1.0
+        gap_bonus = 0.0
+        if gap < 60.0:
+            gap_bonus = (60.0 - gap) / 60.0  # 0..1
+        CHAT_MAX, REACT_MAX, VOICE_MAX = 17.0, 30.0, 8.0
+        x_chat = min(chat_c / CHAT_MAX, 1.0)
+        x_react = min(react_c / REACT_MAX, 1.0)
+        x_voice = min(voice_c / VOICE_MAX, 1.0)
+        if cat == 'voice':
+            W = 0.11
+        else:
+            W = 0.073
+        base_score = 1.0 + W * (a * x_chat + b * x_react + c * x_voice + 0.5 * gap_bonus)
+        REL_BETA = 0.8
+        cur_s, prev_s = cur_by_cat[i], prev_by_cat[i]
+        cur_w = a * cur_s[0] + b * cur_s[1] + c * cur_s[2]
+        prev_w = a * prev_s[0] + b * prev_s[1] + c * prev_s[2]
+        ratio = (cur_w + 1.0) / (prev_w + 1.0)
+        rel_factor = 1.0 + REL_BETA * (ratio - 1.0)
+        rel_factor = max(0.8, min(1.3, rel_factor))
+        S = 10.0
+        DECAY = 0.001
+        change_raw = (base_score - 1.0) / S
+        change_raw *= rel_factor
+        change_raw -= DECAY
+        change_pct = max(-0.01, min(0.01, change_raw))
+        new_val = current[i] * (1.0 + change_pct)
+        if new_val < lower[i]:
+            new_val = lower[i]
+        if new_val > upper[i]:
+            new_val = upper[i]
+        out.append(new_val)
+    return out
+
+
+def _expected(fx: dict) -> list[list[float]]:
+    return [
+        _original_minute(*fx["counts"][g], fx["gaps"][g], fx["cur_sums"][g], fx["prev_sums"][g],
+                         fx["current"][g], fx["lower"][g], fx["upper"][g])
+        for g in range(len(fx["counts"]))
+    ]
+
+
+def _mismatches(label: str, expected, got) -> int:
+    bad = sum(1 for r, g in zip(expected, got) for a, b in zip(r, g) if a != b)
+    print(f"{label:<34} {bad:9d}")
+    return bad
+
+
+def _timed(label: str, fn) -> object:
+    t0 = time.perf_counter()
+    out = fn()
+    print(f"{label:<34} {(time.perf_counter() - t0) * 1000:9.1f} ms")
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--guilds", type=int, default=10_000)
+    ap.add_argument("--fixture")
+    args = ap.parse_args()
+    rng = random.Random(1)
+    if args.fixture and os.path.exists(args.fixture):
+        with open(args.fixture, encoding="utf-8") as f:
+            fx = json.load(f)
+    else:
+        fx = _fixture(args.guilds, rng)
+        fx["expected"] = _expected(fx)
+        if args.fixture:
+            with open(args.fixture, "w", encoding="utf-8") as f:
+                json.dump(fx, f)
+    expected = fx.get("expected") or _expected(fx)
+    inputs = (fx["counts"], fx["gaps"], fx["cur_sums"], fx["prev_sums"], fx["current"], fx["lower"], fx["upper"])
+    print(f"{len(fx['counts']):,} guilds x {len(index_engine.CATEGORIES)} categories")
+
+    ref = _timed("scalar formula", lambda: index_engine._score_scalar(*inputs))
+    bad = _mismatches("scalar vs original formula", expected, ref)
+    if index_engine.np is None:
+        print("numpy not installed; the engine uses the scalar formula")
+    else:
+        got = _timed("numpy engine", lambda: index_engine._score_numpy(*inputs))
+        bad += _mismatches("numpy vs original formula", expected, got)
+    if bad:
+        sys.exit(1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        core.DB_PATH = os.path.join(tmp, "bench.sqlite3")
+        db.init_db()
+        guilds = range(1, len(fx["counts"]) + 1)
+        db.warm_activity_windows(guilds)
+        rows = [(g, *fx["counts"][g - 1], fx["gaps"][g - 1]) for g in guilds]
+        ts = int(time.time())
+        _timed("apply_minute_batch (day open)", lambda: db.apply_minute_batch(ts, rows, DATE))
+        for minute in range(1, 3):
+            _timed(f"apply_minute_batch (minute {minute + 1})", lambda: db.apply_minute_batch(ts + 60 * minute, rows, DATE))
+        db.shutdown_write_behind()
+        core.close_pool()
+
+
+if __name__ == "__main__":
+    main()
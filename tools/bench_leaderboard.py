@@ -0,0 +1,60 @@
+"""Rank lookups and deep pages: SQL (DB_RANK_INDEX=0 path) vs the in-memory rank index.
+
+    python3 tools/bench_leaderboard.py [--users 1000000] [--queries 200]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database as db  # noqa: E402
+from database import core, leaderboard  # noqa: E402
+
+
+def _timed(label: str, fn, calls) -> None:
+    t0 = time.perf_counter()
+    for args in calls:
+        fn(*args)
+    elapsed = time.perf_counter() - t0
+    print(f"{label:<34} {elapsed / len(calls) * 1000:9.3f} ms/call")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--users", type=int, default=1_000_000)
+    ap.add_argument("--queries", type=int, default=200)
+    args = ap.parse_args()
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory() as tmp:
+        core.DB_PATH = os.path.join(tmp, "bench.sqlite3")
+        db.init_db()
+        users = rng.sample(range(10 ** 17, 10 ** 18), args.users)
+        with db.get_conn() as conn:
+            conn.executemany("INSERT INTO balances(user_id, balance) VALUES(?, ?)", ((u, int(rng.paretovariate(1.2) * 1000)) for u in users))
+        sample = [(u,) for u in rng.sample(users, min(args.queries, len(users)))]
+        deep = [(rng.randrange(max(1, args.users - 10)), 10) for _ in range(args.queries)]
+
+        leaderboard.ENABLED = False
+        print(f"{args.users:,} users")
+        _timed("SQL get_rank", db.get_rank, sample[:20])
+        _timed("SQL rank_page (random offset)", db.rank_page, deep[:20])
+
+        leaderboard.ENABLED = True
+        t0 = time.perf_counter()
+        leaderboard.reload_rank_index()
+        print(f"{'index build':<34} {(time.perf_counter() - t0) * 1000:9.1f} ms")
+        _timed("index get_rank", db.get_rank, sample)
+        _timed("index rank_page (random offset)", db.rank_page, deep)
+        keys = [(bal, uid, 10) for uid, bal in (db.rank_page(o, 1)[0] for o, _ in deep)]
+        _timed("index rank_page_after", db.rank_page_after, keys)
+        _timed("index transfer (sync on commit)", db.transfer, [(a, b, 1) for (a,), (b,) in zip(sample, sample[1:])])
+        core.close_pool()
+
+
+if __name__ == "__main__":
+    main()
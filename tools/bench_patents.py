@@ -0,0 +1,78 @@
+"""Patent detection on one message: table scan + ``w in text`` (DB_PATENT_CACHE=0 path) vs the per-guild matcher.
+
+    python3 tools/bench_patents.py [--patents 50000] [--chars 2000] [--messages 200]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database as db  # noqa: E402
+from database import core, patent_cache  # noqa: E402
+
+GUILD = 1
+SYLLABLES = [chr(c) for c in range(0xAC00, 0xAC00 + 2000)]
+WEIGHTS = [1 / (i + 1) for i in range(len(SYLLABLES))]  # Zipf-like, as in real chat
+
+
+def _word(rng: random.Random) -> str:
+    return "".join(rng.choices(SYLLABLES, WEIGHTS, k=rng.randint(2, 6)))
+
+
+def _timed(label: str, fn, calls) -> None:
+    t0 = time.perf_counter()
+    for args in calls:
+        fn(*args)
+    elapsed = time.perf_counter() - t0
+    print(f"{label:<34} {elapsed / len(calls) * 1000:9.3f} ms/call")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--patents", type=int, default=50_000)
+    ap.add_argument("--chars", type=int, default=2000)
+    ap.add_argument("--messages", type=int, default=200)
+    args = ap.parse_args()
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory() as tmp:
+        core.DB_PATH = os.path.join(tmp, "bench.sqlite3")
+        db.init_db()
+        words = {_word(rng) for _ in range(args.patents)}
+        with db.get_conn(GUILD) as conn:
+            conn.executemany(
+                "INSERT INTO patents(guild_id, owner_id, word, price, created_ts) VALUES(?, ?, ?, ?, 0)",
+                ((GUILD, rng.randrange(1, 1000), w, 5000) for w in words),
+            )
+        chat, dense = [], []
+        filler, fw = SYLLABLES + list(" .,!?abc"), WEIGHTS + [0.3] * 8
+        for _ in range(args.messages):
+            chat.append((GUILD, "".join(rng.choices(filler, fw, k=args.chars))))
+            parts = []
+            while sum(map(len, parts)) < args.chars:
+                parts.append(_word(rng) if rng.random() < 0.7 else " ")
+            dense.append((GUILD, "".join(parts)[:args.chars]))
+
+        patent_cache.ENABLED = False
+        print(f"{len(words):,} patents, {args.chars}-char messages")
+        _timed("SQL + w in text", db.find_patent_hits, chat[:10])
+
+        patent_cache.ENABLED = True
+        t0 = time.perf_counter()
+        db.find_patent_hits(GUILD, "")
+        db.find_patent_hits(GUILD, "x")
+        print(f"{'matcher build':<34} {(time.perf_counter() - t0) * 1000:9.1f} ms")
+        _timed("matcher scan (chat-like text)", db.find_patent_hits, chat)
+        _timed("matcher scan (patent fragments)", db.find_patent_hits, dense)
+        new = [(GUILD, rng.randrange(1, 1000), w + "힣", 5000) for w in rng.sample(sorted(words), 50)]
+        _timed("add_patent (sync on commit)", db.add_patent, new)
+        _timed("matcher scan after adds", db.find_patent_hits, chat)
+        core.close_pool()
+
+
+if __name__ == "__main__":
+    main()
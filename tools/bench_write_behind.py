@@ -0,0 +1,48 @@
+"""Throughput of append-only writes: strict (commit per row) vs batched write-behind.
+
+    python3 tools/bench_write_behind.py [--rows 50000]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database as db  # noqa: E402
+from database import core  # noqa: E402
+
+
+def _drive(rows: int, offset: int) -> None:
+    for i in range(rows // 2):
+        ts = offset + i
+        db.record_etf_tick(i % 50, ts, "IDX_CHAT", 100.0, 0.0)
+        db.log_patent_detection(i % 50, i, 1, i, ["word"], 1, False)
+
+
+def _run(mode: str, rows: int, offset: int) -> None:
+    db.set_durability(mode)
+    t0 = time.perf_counter()
+    _drive(rows, offset)
+    db.flush_pending_writes()
+    elapsed = time.perf_counter() - t0
+    print(f"{mode:<8} {rows:>8} rows  {elapsed:8.3f}s  {rows / elapsed:>10,.0f} rows/s")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--rows", type=int, default=50_000)
+    args = ap.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        core.DB_PATH = os.path.join(tmp, "bench.sqlite3")
+        db.init_db()
+        _run("strict", min(args.rows, 5_000), 0)
+        _run("batched", args.rows, 1_000_000)
+        db.shutdown_write_behind()
+        core.close_pool()
+
+
+if __name__ == "__main__":
+    main()
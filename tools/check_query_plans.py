@@ -0,0 +1,145 @@
+"""Query-plan regression check for the database package.
+
+Collects every SQL statement literal in ``database/*.py``, runs
+``EXPLAIN QUERY PLAN`` for each against a freshly migrated schema and fails
+when a statement does a full ``SCAN`` of a table or of an index. The only
+scans let through are index-ordered walks of ``ORDER BY ... LIMIT`` queries,
+which stop after the limit, and the statements in ``ALLOWED_SCANS``. Run it
+before merging any change that adds or edits a query:
+
+    python3 tools/check_query_plans.py [-v]
+
+Exit status is 1 when a plan regresses.
+"""
+
+import argparse
+import ast
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Small, bounded tables where a full scan is the right plan.
+SMALL_TABLES = {"instruments", "schema_version", "sqlite_sequence"}
+
+# Statements that scan on purpose. Every other SCAN, of a table or an index, fails.
+ALLOWED_SCANS = {
+    # whole-table aggregates and loads done once at startup
+    "SELECT COUNT(*) FROM balances",
+    "SELECT user_id, balance FROM balances ORDER BY balance DESC, user_id ASC",
+    "SELECT DISTINCT guild_id FROM patent_participants",
+    # the shard registry: one row per guild, read whole
+    "SELECT guild_id, shard_no FROM guild_shards",
+    "SELECT guild_id FROM guild_shards ORDER BY shard_no ASC",
+    "SELECT guild_id, shard_no FROM guild_shards ORDER BY shard_no ASC",
+    # walks of partial indexes that hold only the rows asked for
+    "SELECT id, guild_id, from_user, to_user, amount, period_days, start_date, last_date FROM auto_transfers WHERE active=1",
+    "SELECT payer_id, owner_id, SUM(amount) FROM patent_royalties WHERE settled_at IS NULL GROUP BY payer_id, owner_id",
+    "UPDATE patent_royalties SET settled_at=? WHERE settled_at IS NULL",
+}
+
+# Files whose SQL is DDL or built dynamically from identifiers.
+SKIP_FILES = {"migrations.py"}
+
+# Statements only assembled at runtime (string concatenation), spelled out here
+# so their plans are covered too.
+EXTRA_STATEMENTS = [
+    ("auctions.py", "SELECT id, seller_id, name, emoji, qty, start_price, current_bid, current_bidder_id, end_at FROM auctions WHERE status='open' AND end_at > ? AND guild_id = ? ORDER BY end_at ASC LIMIT ? OFFSET ?"),
+    ("auctions.py", "SELECT COUNT(*) FROM auctions WHERE status='open' AND end_at > ? AND guild_id = ?"),
+    ("auctions.py", "SELECT COUNT(*) FROM auctions WHERE status='open' AND end_at > ? AND guild_id = ? AND (LOWER(name) LIKE ? OR emoji LIKE ?)"),
+]
+
+_SQL_START = re.compile(r"^\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\b")
+_SCAN = re.compile(r"^SCAN (\w+)(.*)$")
+_ORDERED_LIMIT = re.compile(r"\bORDER BY\b.*\bLIMIT\b", re.I)
+
+
+def _literal(node) -> str | None:
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    if isinstance(node, ast.JoinedStr):
+        # f-strings only interpolate placeholder lists such as IN ({q})
+        parts = []
+        for v in node.values:
+            if isinstance(v, ast.Constant):
+                parts.append(str(v.value))
+            else:
+                parts.append("?")
+        return "".join(parts)
+    return None
+
+
+def collect_statements() -> list[tuple[str, int, str]]:
+    out = []
+    pkg = os.path.join(ROOT, "database")
+    for fn in sorted(os.listdir(pkg)):
+        if not fn.endswith(".py") or fn in SKIP_FILES:
+            continue
+        tree = ast.parse(open(os.path.join(pkg, fn), encoding="utf-8").read())
+        fragments = {id(v) for n in ast.walk(tree) if isinstance(n, ast.JoinedStr) for v in n.values}
+        for node in ast.walk(tree):
+            if id(node) in fragments:
+                continue
+            sql = _literal(node)
+            if sql and _SQL_START.match(sql):
+                out.append((fn, node.lineno, " ".join(sql.split())))
+    out.extend((fn, 0, sql) for fn, sql in EXTRA_STATEMENTS)
+    return out
+
+
+def full_scans(conn, sql: str) -> tuple[list[str], list[str]]:
+    plan = conn.execute("EXPLAIN QUERY PLAN " + sql, [None] * sql.count("?")).fetchall()
+    details = [str(r[3]) for r in plan]
+    tables = {str(r[0]) for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    bad = []
+    for d in details:
+        m = _SCAN.match(d)
+        if not m:
+            continue
+        table, rest = m.group(1), m.group(2)
+        if table not in tables or table in SMALL_TABLES:
+            continue  # CTEs, VALUES lists, subquery results, tiny tables
+        if " USING " in rest and _ORDERED_LIMIT.search(sql):
+            continue  # index-ordered walk that stops at the LIMIT
+        bad.append(d)
+    return details, bad
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("-v", "--verbose", action="store_true", help="print every plan")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        from database import core
+        core.DB_PATH = os.path.join(tmp, "plans.sqlite3")
+        core.init_db()
+        conn = sqlite3.connect(core.DB_PATH)
+        failures = 0
+        statements = collect_statements()
+        for fn, line, sql in statements:
+            if sql in ALLOWED_SCANS:
+                continue
+            try:
+                details, bad = full_scans(conn, sql)
+            except sqlite3.Error as e:
+                print(f"ERROR {fn}:{line}: {e}\n    {sql}")
+                failures += 1
+                continue
+            if bad or args.verbose:
+                print(f"{'SCAN ' if bad else 'ok   '}{fn}:{line}: {sql}")
+                for d in details:
+                    print(f"        {d}")
+            failures += bool(bad)
+        conn.close()
+        core.close_pool()
+    print(f"{len(statements)} statements checked, {failures} with full table scans")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
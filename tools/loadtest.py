@@ -0,0 +1,570 @@
+"""Offline load test: the real cogs against a fake Discord gateway.
+
+    python3 tools/loadtest.py [--duration 30] [--rate 200] [--guilds 5] [--members 200]
+                              [--db PATH] [--sharding] [--always-open] [--json out.json] [-v]
+
+Loads every cog from ``cogs/`` into a ``commands.Bot`` that never logs in and
+whose guilds, members, channels and messages are local stand-ins. Synthetic
+traffic is generated open-loop at ``--rate`` events/s: messages (patent,
+activity and announcement listeners), reactions, voice joins/leaves and
+slash-command callbacks, plus one pass of every ``tasks.loop`` body each
+``--tick-interval`` seconds. Latency is measured from the moment an event was
+due, so a backed-up loop shows up as latency instead of a lower send rate.
+
+Reports throughput, p50/p99/max latency per event kind (per handler with
+``-v``), handler errors, and event-loop lag (how late a 50 ms sleep wakes up).
+Nothing touches the network; the database is a temporary file unless
+``--db`` points at a copy of a real one.
+
+The stand-ins only implement what the cogs use. ``isinstance`` checks against
+discord.py classes (e.g. announcement delivery to a ``TextChannel``) see them
+as foreign objects and skip that branch.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import traceback
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import discord  # noqa: E402
+from discord.ext import commands, tasks  # noqa: E402
+
+import database as db  # noqa: E402
+from database import core  # noqa: E402
+
+WORDS = ["안녕", "오늘", "점심", "뭐", "먹지", "게임", "하자", "회의", "끝", "좋아", "진짜", "그거", "내일", "주말", "ㅋㅋ"]
+PATENT_WORDS = ["사과", "바나나", "포도", "딸기", "수박", "고양이", "강아지", "치킨"]
+
+# Event mix: kind -> weight
+MIX = {"message": 70, "reaction": 15, "voice": 5, "command": 10}
+
+# Slash commands driven by the "command" event: qualified name -> kwargs factory
+COMMANDS = {
+    "돈 확인": lambda ctx: {},
+    "돈 순위": lambda ctx: {},
+    "송금": lambda ctx: {"받는사람": ctx.other, "금액": 1},
+    "출석 하기": lambda ctx: {},
+    "지수 확인": lambda ctx: {},
+    "투자 시세": lambda ctx: {},
+    "투자 매수": lambda ctx: {"종목": "ETF_ALL", "수량": 1},
+    "경매 목록": lambda ctx: {},
+    "특허 목록": lambda ctx: {},
+    "인벤토리": lambda ctx: {},
+}
+
+_ids = itertools.count(10 ** 17)
+
+
+def _snowflake() -> int:
+    return next(_ids)
+
+
+# ---------- stand-ins ----------
+
+class FakeMessage:
+    def __init__(self, channel, author, content: str = ""):
+        self.id = _snowflake()
+        self.channel = channel
+        self.guild = channel.guild
+        self.author = author
+        self.content = content
+        self.embeds = []
+        self.jump_url = f"https://discord.com/channels/{self.guild.id}/{channel.id}/{self.id}"
+
+    async def delete(self, *args, **kwargs):
+        return None
+
+    async def edit(self, *args, **kwargs):
+        return self
+
+    async def reply(self, content=None, **kwargs):
+        return await self.channel.send(content, **kwargs)
+
+    async def add_reaction(self, emoji):
+        return None
+
+    async def remove_reaction(self, emoji, member):
+        return None
+
+    async def clear_reactions(self):
+        return None
+
+
+class FakeChannel:
+    def __init__(self, guild, name: str, voice: bool = False):
+        self.id = _snowflake()
+        self.guild = guild
+        self.name = name
+        self.mention = f"<#{self.id}>"
+        self.voice = voice
+        self.sent = 0
+
+    async def send(self, content=None, **kwargs):
+        self.sent += 1
+        return FakeMessage(self, self.guild.me, content or "")
+
+    async def fetch_message(self, message_id: int):
+        raise LookupError(message_id)
+
+    def permissions_for(self, member):
+        return SimpleNamespace(send_messages=True, read_messages=True, manage_messages=True)
+
+
+class FakeMember:
+    def __init__(self, guild, name: str, bot: bool = False):
+        self.id = _snowflake()
+        self.guild = guild
+        self.name = name
+        self.display_name = name
+        self.global_name = name
+        self.mention = f"<@{self.id}>"
+        self.bot = bot
+        self.roles = []
+        self.top_role = None
+        self.guild_permissions = SimpleNamespace(administrator=False, manage_guild=False, manage_messages=False)
+        self.display_avatar = SimpleNamespace(url="")
+        self.avatar = None
+        self.voice = None
+
+    async def add_roles(self, *roles, **kwargs):
+        return None
+
+    async def remove_roles(self, *roles, **kwargs):
+        return None
+
+    async def send(self, content=None, **kwargs):
+        return None
+
+
+class FakeGuild:
+    def __init__(self, index: int, members: int):
+        self.id = _snowflake()
+        self.name = f"loadtest-{index}"
+        self.me = FakeMember(self, "bot", bot=True)
+        self.members = [FakeMember(self, f"user{index}-{i}") for i in range(members)]
+        self._members = {m.id: m for m in self.members + [self.me]}
+        self.text_channels = [FakeChannel(self, f"chat-{i}") for i in range(3)]
+        self.voice_channels = [FakeChannel(self, f"voice-{i}", voice=True) for i in range(2)]
+        self._channels = {c.id: c for c in self.text_channels + self.voice_channels}
+        self.roles = []
+        self.default_role = None
+        self.owner_id = self.members[0].id
+        self.member_count = len(self.members)
+
+    @property
+    def channels(self):
+        return list(self._channels.values())
+
+    def get_member(self, user_id: int):
+        return self._members.get(user_id)
+
+    def get_channel(self, channel_id: int):
+        return self._channels.get(channel_id)
+
+    def get_role(self, role_id: int):
+        return None
+
+    async def fetch_member(self, user_id: int):
+        return self._members.get(user_id)
+
+
+class _Response:
+    def __init__(self, interaction):
+        self._interaction = interaction
+        self._done = False
+
+    def is_done(self) -> bool:
+        return self._done
+
+    async def send_message(self, content=None, **kwargs):
+        self._done = True
+        self._interaction._message = FakeMessage(self._interaction.channel, self._interaction.guild.me, content or "")
+
+    async def defer(self, *args, **kwargs):
+        self._done = True
+
+    async def edit_message(self, *args, **kwargs):
+        self._done = True
+
+
+class _Followup:
+    def __init__(self, interaction):
+        self._interaction = interaction
+
+    async def send(self, content=None, **kwargs):
+        return FakeMessage(self._interaction.channel, self._interaction.guild.me, content or "")
+
+
+class FakeInteraction:
+    def __init__(self, client, guild, channel, user):
+        self.id = _snowflake()
+        self.client = client
+        self.guild = guild
+        self.guild_id = guild.id
+        self.channel = channel
+        self.channel_id = channel.id
+        self.user = user
+        self.response = _Response(self)
+        self.followup = _Followup(self)
+        self._message = None
+
+    async def original_response(self):
+        return self._message or FakeMessage(self.channel, self.guild.me)
+
+    async def edit_original_response(self, *args, **kwargs):
+        return await self.original_response()
+
+
+class LoadTestBot(commands.Bot):
+    """A bot that never connects; guilds and channels come from the stand-ins."""
+
+    def __init__(self, guilds: list[FakeGuild]):
+        super().__init__(command_prefix="!", intents=discord.Intents.all())
+        self.fake_guilds = guilds
+        self._fake_user = FakeMember(guilds[0], "loadtest-bot", bot=True)
+
+    @property
+    def guilds(self):
+        return list(self.fake_guilds)
+
+    @property
+    def user(self):
+        return self._fake_user
+
+    def get_guild(self, guild_id: int):
+        return next((g for g in self.fake_guilds if g.id == guild_id), None)
+
+    def get_channel(self, channel_id: int):
+        for g in self.fake_guilds:
+            ch = g.get_channel(channel_id)
+            if ch is not None:
+                return ch
+        return None
+
+    def get_user(self, user_id: int):
+        for g in self.fake_guilds:
+            m = g.get_member(user_id)
+            if m is not None:
+                return m
+        return None
+
+    async def fetch_user(self, user_id: int):
+        return self.get_user(user_id)
+
+    def is_ready(self) -> bool:
+        return True
+
+    async def wait_until_ready(self) -> None:
+        return None
+
+
+# ---------- measurement ----------
+
+class Stats:
+    def __init__(self):
+        self.samples: dict[str, list[float]] = {}
+        self.errors: dict[str, int] = {}
+        self.first_error: dict[str, str] = {}
+
+    def add(self, key: str, elapsed: float, error: str | None = None) -> None:
+        self.samples.setdefault(key, []).append(elapsed)
+        if error is not None:
+            self.errors[key] = self.errors.get(key, 0) + 1
+            self.first_error.setdefault(key, error)
+
+    def summary(self) -> dict:
+        return {k: {"count": len(v), "errors": self.errors.get(k, 0), **_percentiles(v)} for k, v in sorted(self.samples.items())}
+
+
+def _percentiles(values: list[float]) -> dict:
+    s = sorted(values)
+
+    def pct(q: float) -> float:
+        return s[min(len(s) - 1, int(q * len(s)))] * 1000 if s else 0.0
+
+    return {"p50_ms": pct(0.50), "p99_ms": pct(0.99), "max_ms": s[-1] * 1000 if s else 0.0}
+
+
+async def _call(stats: Stats, key: str, fn, *args, **kwargs) -> None:
+    t0 = time.perf_counter()
+    error = None
+    try:
+        await fn(*args, **kwargs)
+    except Exception as e:
+        error = "".join(traceback.format_exception_only(type(e), e)).strip()
+    stats.add(key, time.perf_counter() - t0, error)
+
+
+# ---------- traffic ----------
+
+class Traffic:
+    def __init__(self, bot: LoadTestBot, rng: random.Random, patent_hit: float):
+        self.bot = bot
+        self.rng = rng
+        self.patent_hit = patent_hit
+        self.handlers = Stats()
+        self.events = Stats()
+        self.listeners = {name: list(bot.extra_events.get(name, [])) for name in ("on_message", "on_reaction_add", "on_voice_state_update")}
+        self.commands = {}
+        for cmd in bot.tree.walk_commands():
+            if isinstance(cmd, discord.app_commands.Command) and cmd.qualified_name in COMMANDS:
+                self.commands[cmd.qualified_name] = cmd
+        self.missing = sorted(set(COMMANDS) - set(self.commands))
+        self.recent: list[FakeMessage] = []
+        self.in_voice: dict[int, FakeChannel] = {}
+
+    def _member(self, guild: FakeGuild) -> FakeMember:
+        return self.rng.choice(guild.members)
+
+    def _content(self) -> str:
+        words = self.rng.choices(WORDS, k=self.rng.randint(2, 8))
+        if self.rng.random() < self.patent_hit:
+            words.insert(self.rng.randrange(len(words) + 1), self.rng.choice(PATENT_WORDS))
+        return " ".join(words)
+
+    async def _dispatch(self, event: str, *args) -> None:
+        # discord.py runs each listener as its own task; do the same
+        await asyncio.gather(*(
+            _call(self.handlers, f"{event}:{fn.__qualname__}", fn, *args) for fn in self.listeners[event]
+        ))
+
+    async def message(self, guild: FakeGuild) -> None:
+        channel = guild.text_channels[0] if self.rng.random() < 0.8 else self.rng.choice(guild.text_channels)
+        msg = FakeMessage(channel, self._member(guild), self._content())
+        self.recent.append(msg)
+        if len(self.recent) > 256:
+            del self.recent[:128]
+        await self._dispatch("on_message", msg)
+
+    async def reaction(self, guild: FakeGuild) -> None:
+        msg = self.rng.choice(self.recent) if self.recent else FakeMessage(guild.text_channels[0], self._member(guild))
+        reaction = SimpleNamespace(message=msg, emoji=self.rng.choice(["👍", "😂", "➡️", "⬅️"]), count=1)
+        await self._dispatch("on_reaction_add", reaction, self._member(msg.guild))
+
+    async def voice(self, guild: FakeGuild) -> None:
+        member = self._member(guild)
+        current = self.in_voice.pop(member.id, None)
+        before = SimpleNamespace(channel=current)
+        if current is None:
+            channel = self.rng.choice(guild.voice_channels)
+            self.in_voice[member.id] = channel
+            after = SimpleNamespace(channel=channel)
+        else:
+            after = SimpleNamespace(channel=None)
+        await self._dispatch("on_voice_state_update", member, before, after)
+
+    async def command(self, guild: FakeGuild) -> None:
+        if not self.commands:
+            return
+        name = self.rng.choice(sorted(self.commands))
+        cmd = self.commands[name]
+        user = self._member(guild)
+        ctx = SimpleNamespace(guild=guild, user=user, other=self._member(guild))
+        interaction = FakeInteraction(self.bot, guild, guild.text_channels[0], user)
+        await _call(self.handlers, f"/{name}", cmd.callback, cmd.binding, interaction, **COMMANDS[name](ctx))
+
+
+def _task_loops(bot: commands.Bot) -> list[tuple[str, object]]:
+    out = []
+    for cog in bot.cogs.values():
+        for name, attr in vars(type(cog)).items():
+            if isinstance(attr, tasks.Loop):
+                out.append((f"loop:{type(cog).__name__}.{name}", getattr(cog, name)))
+    return out
+
+
+async def _lag_monitor(samples: list[float], stop: asyncio.Event, interval: float = 0.05) -> None:
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        t0 = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, loop.time() - t0 - interval))
+
+
+async def _tick_runner(loops, stats: Stats, interval: float, stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        for key, loop_obj in loops:
+            await _call(stats, key, loop_obj)
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+def _seed(guilds: list[FakeGuild], rng: random.Random) -> None:
+    for g in guilds:
+        db.set_main_chat_channel(g.id, g.text_channels[0].id)
+        db.add_announcement(g.id, "로드 테스트 공지 1")
+        db.add_announcement(g.id, "로드 테스트 공지 2")
+        for m in g.members:
+            db.join_patent_game(g.id, m.id)
+        for word in PATENT_WORDS:
+            owner = rng.choice(g.members)
+            db.add_patent(g.id, owner.id, word, db.patent_min_price(word))
+
+
+async def run(args) -> dict:
+    rng = random.Random(args.seed)
+    guilds = [FakeGuild(i, args.members) for i in range(args.guilds)]
+    bot = LoadTestBot(guilds)
+    for filename in sorted(os.listdir(os.path.join(ROOT, "cogs"))):
+        if filename.endswith(".py"):
+            try:
+                await bot.load_extension(f"cogs.{filename[:-3]}")
+            except Exception as e:
+                print(f"{filename[:-3]} cog 로드 실패: {e}")
+    loops = _task_loops(bot)
+    for _, loop_obj in loops:
+        if loop_obj.is_running():
+            loop_obj.cancel()  # started in a cog's __init__; the harness drives loop bodies itself
+    if args.always_open:
+        for cog in bot.cogs.values():
+            if hasattr(cog, "_is_trading"):
+                cog._is_trading = lambda now_kst: True
+    _seed(guilds, rng)
+
+    traffic = Traffic(bot, rng, args.patent_hit)
+    if traffic.missing:
+        print(f"명령어 없음(건너뜀): {', '.join(traffic.missing)}")
+    if args.tick_interval <= 0:
+        loops = []
+
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    lag: list[float] = []
+    monitor = asyncio.create_task(_lag_monitor(lag, stop))
+    ticker = asyncio.create_task(_tick_runner(loops, traffic.handlers, args.tick_interval, stop)) if loops else None
+
+    kinds, weights = zip(*MIX.items())
+    pending: set[asyncio.Task] = set()
+
+    async def one(kind: str, due: float) -> None:
+        guild = rng.choice(guilds)
+        error = None
+        try:
+            await getattr(traffic, kind)(guild)
+        except Exception as e:
+            error = repr(e)
+        traffic.events.add(kind, loop.time() - due, error)
+
+    start = loop.time()
+    end = start + args.duration
+    due = start
+    sent = 0
+    while due < end:
+        task = asyncio.create_task(one(rng.choices(kinds, weights)[0], due))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+        sent += 1
+        due += 1.0 / args.rate
+        delay = due - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+    sent_elapsed = loop.time() - start
+    if pending:
+        await asyncio.wait(set(pending), timeout=args.drain_timeout)
+    elapsed = loop.time() - start
+    stop.set()
+    await monitor
+    if ticker:
+        await ticker
+
+    events = traffic.events.summary()
+    completed = sum(v["count"] for v in events.values())
+    return {
+        "config": {k: v for k, v in vars(args).items() if k != "json"},
+        "sent": sent,
+        "completed": completed,
+        "unfinished": len(pending),
+        "send_seconds": sent_elapsed,
+        "elapsed_seconds": elapsed,
+        "throughput_per_s": completed / elapsed if elapsed else 0.0,
+        "events": events,
+        "handlers": traffic.handlers.summary(),
+        "handler_errors": dict(traffic.handlers.first_error),
+        "loop_lag": _percentiles(lag),
+        "announcements_sent": sum(c.sent for g in guilds for c in g.text_channels),
+        "db_aio": db.aio.get_stats() if hasattr(db.aio, "get_stats") else None,
+    }
+
+
+def _print_table(title: str, rows: dict) -> None:
+    print(f"\n{title:<44} {'count':>8} {'err':>5} {'p50ms':>8} {'p99ms':>8} {'maxms':>8}")
+    for key, r in rows.items():
+        print(f"{key[:44]:<44} {r['count']:>8} {r['errors']:>5} {r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f} {r['max_ms']:>8.2f}")
+
+
+def report(result: dict, verbose: bool) -> None:
+    print(f"\n{result['completed']:,}/{result['sent']:,} events in {result['elapsed_seconds']:.1f}s "
+          f"({result['throughput_per_s']:,.1f}/s), {result['unfinished']} unfinished")
+    _print_table("event", result["events"])
+    if verbose:
+        _print_table("handler", result["handlers"])
+    lag = result["loop_lag"]
+    print(f"\nevent-loop lag: p50 {lag['p50_ms']:.2f}ms  p99 {lag['p99_ms']:.2f}ms  max {lag['max_ms']:.2f}ms")
+    if result["handler_errors"]:
+        print("\nhandler errors (first of each):")
+        for key, err in result["handler_errors"].items():
+            print(f"  {key}: {err}")
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--duration", type=float, default=30.0, help="seconds of traffic")
+    ap.add_argument("--rate", type=float, default=200.0, help="events per second (open loop)")
+    ap.add_argument("--guilds", type=int, default=5)
+    ap.add_argument("--members", type=int, default=200, help="members per guild")
+    ap.add_argument("--patent-hit", type=float, default=0.2, help="share of messages containing a patented word")
+    ap.add_argument("--tick-interval", type=float, default=10.0, help="run every tasks.loop body this often (0: never)")
+    ap.add_argument("--always-open", action="store_true", help="treat the market as open regardless of the clock")
+    ap.add_argument("--drain-timeout", type=float, default=30.0, help="wait this long for in-flight events at the end")
+    ap.add_argument("--db", help="database file to use (default: a temporary one)")
+    ap.add_argument("--sharding", action="store_true", help="run with DB_SHARDING=1 (fresh database only)")
+    ap.add_argument("--profile", action="store_true", help="enable database profiling and print the slowest statements")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--json", help="also write the results to this file")
+    ap.add_argument("-v", "--verbose", action="store_true", help="per-handler breakdown")
+    args = ap.parse_args()
+
+    os.chdir(ROOT)
+    with tempfile.TemporaryDirectory() as tmp:
+        core.DB_PATH = os.path.abspath(args.db) if args.db else os.path.join(tmp, "loadtest.sqlite3")
+        if args.sharding:
+            core.SHARDING = True
+            os.environ.setdefault("DB_SHARD_DIR", os.path.join(tmp, "shards"))
+        if args.profile:
+            db.enable_profiling()
+        try:
+            result = asyncio.run(run(args))
+        finally:
+            db.aio.shutdown()
+            db.shutdown_write_behind()
+            core.close_pool()
+        if args.profile:
+            result["db_profile"] = db.get_profile()
+            db.disable_profiling()
+
+    report(result, args.verbose)
+    if args.profile:
+        stmts = sorted(result["db_profile"]["statements"].items(), key=lambda kv: -kv[1]["total_ms"])[:10]
+        print("\nslowest statements (total ms):")
+        for sql, m in stmts:
+            print(f"  {m['total_ms']:>9.1f}  {m['calls']:>7}  {sql[:90]}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
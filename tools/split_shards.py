@@ -0,0 +1,159 @@
+"""Move an unsharded database into per-guild files for ``DB_SHARDING=1``.
+
+    python3 tools/split_shards.py [--db data.sqlite3] [--shard-dir DIR] [--dry-run]
+
+Stop the bot first. The core file is backed up to ``<db>.pre-shard.bak``,
+every guild's rows are copied into its own file (see ``database/shards.py``),
+then the guild tables are dropped from the core file and it is vacuumed.
+
+Row ids are renumbered into the guild's id block (``shard_no * ID_BLOCK +
+old id``), including the columns that point at them (bids -> auction,
+team parents and memberships, auto-transfer logs), so ids shown to users
+before the split change. Auctions without a guild cannot be routed and are
+only kept in the backup.
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import core  # noqa: E402
+
+# Columns that hold another row's id: table -> columns renumbered with it.
+ID_REFS = {
+    "teams": ["parent_id"],
+    "user_teams": ["team_id"],
+    "auction_bids": ["auction_id"],
+    "auto_transfer_logs": ["auto_id"],
+}
+
+# Tables without guild_id, routed through the row they belong to.
+VIA_PARENT = {
+    "auction_bids": ("auctions", "auction_id"),
+    "auto_transfer_logs": ("auto_transfers", "auto_id"),
+}
+
+# Guild-agnostic bookkeeping copied into every guild file.
+COPY_ALL = {"tick_rollups"}
+
+
+def _columns(conn, schema: str, table: str) -> list[str]:
+    return [str(r[1]) for r in conn.execute(f"PRAGMA {schema}.table_info({table})")]
+
+
+def _guild_tables(conn) -> list[str]:
+    from database.migrations import GLOBAL_TABLES
+    names = [str(r[0]) for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name")]
+    return [n for n in names if n not in GLOBAL_TABLES and n != "schema_version" and not n.startswith("sqlite_")]
+
+
+def _select_list(conn, table: str) -> tuple[list[str], list[str]]:
+    """Target columns and the matching source expressions (ids shifted by :base)."""
+    cols = _columns(conn, "src", table)
+    autoinc = bool(conn.execute(
+        "SELECT 1 FROM src.sqlite_master WHERE type='table' AND name=? AND sql LIKE '%AUTOINCREMENT%'", (table,)
+    ).fetchone())
+    shifted = set(ID_REFS.get(table, [])) | ({"id"} if autoinc else set())
+    exprs = [f"t.{c} + :base" if c in shifted else f"t.{c}" for c in cols]
+    return cols, exprs
+
+
+def _copy_guild(path: str, src_path: str, guild_id: int, base: int, tables: list[str]) -> dict[str, int]:
+    counts = {}
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("ATTACH DATABASE ? AS src", (src_path,))
+        conn.execute("BEGIN")
+        for table in tables:
+            cols, exprs = _select_list(conn, table)
+            insert = f"INSERT OR REPLACE INTO main.{table}({', '.join(cols)}) SELECT {', '.join(exprs)} FROM src.{table} t"
+            if table in COPY_ALL:
+                cur = conn.execute(insert, {"base": base})
+            elif table in VIA_PARENT:
+                parent, fk = VIA_PARENT[table]
+                cur = conn.execute(insert + f" JOIN src.{parent} p ON p.id = t.{fk} WHERE p.guild_id = :gid", {"base": base, "gid": guild_id})
+            else:
+                cur = conn.execute(insert + " WHERE t.guild_id = :gid", {"base": base, "gid": guild_id})
+            counts[table] = cur.rowcount
+        conn.commit()
+    finally:
+        conn.close()
+    return counts
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--db", default=core.DB_PATH, help="core database file (default: DB_PATH)")
+    ap.add_argument("--shard-dir", help="where guild files go (default: DB_SHARD_DIR or <db dir>/shards)")
+    ap.add_argument("--dry-run", action="store_true", help="only report what would be moved")
+    args = ap.parse_args()
+
+    src_path = os.path.abspath(args.db)
+    if not os.path.exists(src_path):
+        print(f"{src_path} does not exist")
+        return 1
+    if args.shard_dir:
+        os.environ["DB_SHARD_DIR"] = args.shard_dir
+
+    core.DB_PATH = src_path
+    core.SHARDING = False
+    core.init_db()
+
+    with core.get_conn() as conn:
+        tables = _guild_tables(conn)
+        if not tables:
+            print("no guild tables left in the core file; already split")
+            return 1
+        if conn.execute("SELECT COUNT(*) FROM guild_shards").fetchone()[0]:
+            print("guild_shards is not empty; refusing to split twice")
+            return 1
+        guilds = set()
+        for table in tables:
+            if "guild_id" in _columns(conn, "main", table):
+                guilds.update(int(r[0]) for r in conn.execute(f"SELECT DISTINCT guild_id FROM {table} WHERE guild_id IS NOT NULL"))
+        orphans = int(conn.execute("SELECT COUNT(*) FROM auctions WHERE guild_id IS NULL").fetchone()[0])
+
+    print(f"{len(guilds)} guilds, {len(tables)} guild tables")
+    if orphans:
+        print(f"warning: {orphans} auctions have no guild and stay only in the backup")
+    if args.dry_run:
+        return 0
+
+    backup = src_path + ".pre-shard.bak"
+    with core.get_conn() as conn:
+        dst = sqlite3.connect(backup)
+        conn.backup(dst)
+        dst.close()
+    print(f"backup written to {backup}")
+
+    # From here on get_conn(guild_id) creates and migrates the guild files.
+    from database import shards
+    core.SHARDING = True
+    for gid in sorted(guilds):
+        path = shards.shard_path(gid)
+        with core.get_conn() as conn:
+            shard_no = int(conn.execute("SELECT shard_no FROM guild_shards WHERE guild_id=?", (gid,)).fetchone()[0])
+        core.close_pool()
+        counts = _copy_guild(path, src_path, gid, shard_no * shards.ID_BLOCK, tables)
+        moved = sum(n for t, n in counts.items() if t not in COPY_ALL)
+        print(f"guild {gid}: shard {shard_no}, {moved} rows -> {path}")
+
+    core.close_pool()
+    conn = sqlite3.connect(src_path)
+    try:
+        for table in tables:
+            conn.execute(f"DROP TABLE {table}")
+        conn.execute("DELETE FROM sqlite_sequence WHERE name NOT IN (SELECT name FROM sqlite_master WHERE type='table')")
+        conn.commit()
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+    print(f"dropped {len(tables)} guild tables from {src_path}; start the bot with DB_SHARDING=1")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())